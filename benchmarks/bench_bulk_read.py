@@ -0,0 +1,93 @@
+"""
+大量讀取效能測試
+
+產生一個 10 萬行的合成 news.jsonl，比較以下讀取方式的耗時：
+
+1. 舊做法：json.loads + Paper(**data)
+2. iter_papers：Paper.model_validate_json（完整驗證）
+3. iter_records：快速解碼 + PaperRecord（不驗證）
+4. latest_papers(20)：由檔案結尾反向讀取
+
+執行方式：python benchmarks/bench_bulk_read.py [--lines 100000]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 將專案根目錄加入 Python 路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import Config
+from src.core.models import Paper
+from src.services.storage_service import StorageService
+from src.utils.json_utils import JSON_BACKEND
+
+
+def build_synthetic_file(path: Path, lines: int) -> None:
+    """產生合成的 JSONL 資料檔"""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for i in range(lines):
+            record = {
+                "query": "AI",
+                "id": f"{2500 + i // 100000}.{i % 100000:05d}v1",
+                "url": f"http://arxiv.org/abs/2506.{i:05d}v1",
+                "title": f"Synthetic Paper Title Number {i} on Foundation Models",
+                "summary": "Recent advancements in multimodal large language models " * 8,
+                "authors": ["Alice Example", "Bob Example", "Carol Example"],
+                "published_date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                "timestamp": "2025-06-21T12:00:00",
+                "title_zh": f"合成論文標題 {i}",
+                "summary_zh": "這是一段用於效能測試的繁體中文摘要。" * 6,
+                "applications": ["應用一", "應用二", "應用三"],
+                "pitch": "這是一段向創投推銷的內容。" * 4,
+                "audio": f"docs/data/audios/2506.{i:05d}v1.wav",
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def legacy_load(path: Path) -> int:
+    """重構前 load_papers 的讀取方式"""
+    count = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                Paper(**json.loads(line))
+                count += 1
+    return count
+
+
+def timed(label: str, func) -> None:
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f} 秒  ({count} 筆)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大量讀取效能測試")
+    parser.add_argument("--lines", type=int, default=100000, help="合成資料的行數")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = Config()
+        config.NEWS_FILE = Path(tmp_dir) / "news.jsonl"
+        config.NEWS_INDEX_FILE = Path(tmp_dir) / "news.idx"
+        build_synthetic_file(config.NEWS_FILE, args.lines)
+        
+        storage = StorageService(config)
+        size_mb = config.NEWS_FILE.stat().st_size / 1024 / 1024
+        print(f"合成資料: {args.lines} 行, {size_mb:.1f} MB, JSON 後端: {JSON_BACKEND}")
+        
+        timed("json.loads + Paper(**data)", lambda: legacy_load(config.NEWS_FILE))
+        timed("iter_papers (model_validate_json)", lambda: sum(1 for _ in storage.iter_papers()))
+        timed("iter_records (快速解碼，不驗證)", lambda: sum(1 for _ in storage.iter_records()))
+        timed("latest_papers(20)", lambda: len(storage.latest_papers(20)))
+
+
+if __name__ == "__main__":
+    main()
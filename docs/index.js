@@ -1,28 +1,95 @@
-// 讀取 JSONL 檔案
-async function loadArticles() {
+// 加上建置時內嵌的內容版本，讓瀏覽器快取在內容變動時失效
+function assetUrl(path) {
+  const version = (window.ASSET_VERSIONS || {})[path];
+  return version ? `${path}?v=${version}` : path;
+}
+
+// 分頁資料位置（由更新程式匯出）
+const PAGES_INDEX_URL = "data/pages/index.json";
+
+// 已顯示的文章ID與尚未載入的分頁
+const loadedArticleIds = new Set();
+let pendingPages = [];
+
+// 讀取 JSONL 檔案（分頁資料不存在時的後備方案）
+async function loadArticlesFromJsonl() {
   try {
-    const response = await fetch("data/news.jsonl");
+    const response = await fetch(assetUrl("data/news.jsonl"));
     const text = await response.text();
     // 將 JSONL 文字分割成行並解析每一行，直接反轉順序
+    const seen = new Set();
     return text
       .trim()
       .split("\n")
       .map((line) => JSON.parse(line))
-      .reverse(); // 直接反轉陣列順序，最新的文章會在最前面
+      .reverse() // 直接反轉陣列順序，最新的文章會在最前面
+      .filter((article) => {
+        // 同一論文有多筆紀錄時（例如之後補上音訊），只保留最後寫入的一筆
+        if (seen.has(article.id)) {
+          return false;
+        }
+        seen.add(article.id);
+        return true;
+      });
   } catch (error) {
     console.error("載入文章失敗:", error);
     return [];
   }
 }
 
-// 建立音訊播放列表
+// 讀取首屏文章：優先使用分頁資料的 latest.json，只需下載少量資料
+async function loadArticles() {
+  try {
+    const response = await fetch(assetUrl(PAGES_INDEX_URL));
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}`);
+    }
+    const index = await response.json();
+    const latest = await (await fetch(assetUrl(index.latest.url))).json();
+    pendingPages = index.pages;
+    return latest.articles;
+  } catch (error) {
+    console.warn("分頁資料無法使用，改為載入完整資料:", error);
+    pendingPages = [];
+    return loadArticlesFromJsonl();
+  }
+}
+
+// 載入下一個分頁，回傳尚未顯示過的文章（由新到舊）
+async function loadNextPage() {
+  while (pendingPages.length > 0) {
+    const page = pendingPages.shift();
+    try {
+      const data = await (await fetch(assetUrl(page.url))).json();
+      const articles = data.articles.filter(
+        (article) => !loadedArticleIds.has(article.id)
+      );
+      if (articles.length > 0) {
+        return articles;
+      }
+    } catch (error) {
+      console.error(`載入分頁 ${page.url} 失敗:`, error);
+      return [];
+    }
+  }
+  return [];
+}
+
+// 取得文章音訊的網站相對路徑；音訊已封存或尚未產生時返回 null
+function getAudioUrl(article) {
+  if (!article.audio || !article.audio.startsWith("docs/")) {
+    return null;
+  }
+  return article.audio.slice("docs/".length);
+}
+
+// 建立音訊播放列表（只包含有音訊的文章）
 function createAudioList(articles) {
-  return articles.map((article) => {
+  return articles.filter(getAudioUrl).map((article) => {
     const authors = Array.isArray(article.authors)
       ? article.authors.join("、")
       : article.authors;
-    // 直接根據文章ID組合音檔相對路徑
-    const audioUrl = `data/audios/${article.id}.wav`;
+    const audioUrl = getAudioUrl(article);
     return {
       name: article.title_zh,
       artist: authors,
@@ -109,6 +176,8 @@ async function initializePage() {
   // 顯示文章
   const container = document.getElementById("articles-container");
   container.innerHTML = articles.map(createArticleHTML).join("");
+  articles.forEach((article) => loadedArticleIds.add(article.id));
+  setupLoadMore(ap);
 
   // 播放速度控制
   const defaultSpeed = 1.25;
@@ -174,10 +243,228 @@ async function initializePage() {
   ap.on("listswitch", updateCurrentArticle);
 }
 
+// 捲動到頁尾時延遲載入較舊的分頁
+function setupLoadMore(ap) {
+  const container = document.getElementById("articles-container");
+  const button = document.getElementById("load-more-btn");
+  if (pendingPages.length === 0) {
+    button.style.display = "none";
+    return;
+  }
+
+  let loading = false;
+  async function loadMore() {
+    if (loading) {
+      return;
+    }
+    loading = true;
+    button.textContent = "載入中...";
+
+    const articles = await loadNextPage();
+    articles.forEach((article) => loadedArticleIds.add(article.id));
+    container.insertAdjacentHTML(
+      "beforeend",
+      articles.map(createArticleHTML).join("")
+    );
+    const audios = createAudioList(articles);
+    if (audios.length > 0) {
+      ap.list.add(audios);
+    }
+    applyLanguage();
+
+    loading = false;
+    button.textContent = "載入更多";
+    if (pendingPages.length === 0) {
+      button.style.display = "none";
+      observer.disconnect();
+    }
+  }
+
+  button.style.display = "";
+  button.addEventListener("click", loadMore);
+  const observer = new IntersectionObserver((entries) => {
+    if (entries.some((entry) => entry.isIntersecting)) {
+      loadMore();
+    }
+  });
+  observer.observe(button);
+}
+
+// 搜尋索引位置（由更新程式產生）
+const SEARCH_INDEX_DIR = "data/search";
+const SEARCH_MAX_RESULTS = 20;
+let searchManifest = null;
+const searchDocPages = new Map();
+const searchShards = new Map();
+
+// 與更新程式相同的斷詞規則：英文以單字、中文以 bigram 為單位
+function tokenize(text) {
+  const tokens = [];
+  const pattern = /[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+/g;
+  for (const match of text.toLowerCase().matchAll(pattern)) {
+    const run = match[0];
+    if (/^[a-z0-9]+$/.test(run)) {
+      if (run.length >= 2) {
+        tokens.push(run);
+      }
+    } else if (run.length === 1) {
+      tokens.push(run);
+    } else {
+      for (let i = 0; i < run.length - 1; i++) {
+        tokens.push(run.slice(i, i + 2));
+      }
+    }
+  }
+  return [...new Set(tokens)];
+}
+
+// 詞所屬的索引分片（ASCII 以字元為鍵，其他字元以碼位為鍵）
+function shardKey(token) {
+  const code = token.codePointAt(0);
+  return code < 128 ? token[0] : `u${code.toString(16).padStart(4, "0")}`;
+}
+
+async function fetchSearchJSON(name) {
+  const response = await fetch(assetUrl(`${SEARCH_INDEX_DIR}/${name}`));
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}`);
+  }
+  return response.json();
+}
+
+// 索引 manifest 列出各分片與文件頁的版本，以 ?v= 取得可長期快取的檔案
+async function loadSearchManifest() {
+  if (!searchManifest) {
+    searchManifest = fetchSearchJSON("manifest.json").catch((error) => {
+      searchManifest = null;
+      throw error;
+    });
+  }
+  return searchManifest;
+}
+
+async function fetchSearchFile(name) {
+  const version = (await loadSearchManifest()).files[name];
+  if (!version) {
+    return null;
+  }
+  return fetchSearchJSON(`${name}?v=${version}`);
+}
+
+// 只下載查詢詞所在的分片，快取已下載的分片（manifest 中沒有的分片不下載）
+async function loadShard(key) {
+  if (!searchShards.has(key)) {
+    searchShards.set(
+      key,
+      fetchSearchFile(`terms-${key}.json`)
+        .then((data) => (data ? data.terms : {}))
+        .catch(() => ({}))
+    );
+  }
+  return searchShards.get(key);
+}
+
+// 只下載搜尋結果所在的文件頁
+async function loadDoc(doc) {
+  const pageSize = (await loadSearchManifest()).docs_page_size;
+  const page = Math.floor(doc / pageSize);
+  if (!searchDocPages.has(page)) {
+    searchDocPages.set(
+      page,
+      fetchSearchFile(`docs-${page}.json`).then((data) => (data ? data.docs : []))
+    );
+  }
+  return (await searchDocPages.get(page))[doc % pageSize];
+}
+
+// 搜尋包含所有查詢詞的論文，依權重總和排序
+async function searchArticles(query) {
+  const tokens = tokenize(query);
+  if (tokens.length === 0) {
+    return [];
+  }
+  // 索引無法使用時顯示錯誤，而不是找不到結果
+  await loadSearchManifest();
+
+  let scores = null;
+  for (const token of tokens) {
+    const terms = await loadShard(shardKey(token));
+    const postings = terms[token] || [];
+    const next = new Map();
+    for (const [doc, weight] of postings) {
+      if (scores === null || scores.has(doc)) {
+        next.set(doc, (scores ? scores.get(doc) : 0) + weight);
+      }
+    }
+    scores = next;
+    if (scores.size === 0) {
+      break;
+    }
+  }
+
+  const docs = await Promise.all(
+    [...scores.entries()]
+      .sort((a, b) => b[1] - a[1])
+      .slice(0, SEARCH_MAX_RESULTS)
+      .map(([doc]) => loadDoc(doc))
+  );
+  return docs.filter(Boolean);
+}
+
+// 建立搜尋結果項目（標題與連結來自索引資料，以 textContent／setAttribute 設定避免插入 HTML）
+function createSearchResult(doc) {
+  const item = document.createElement("li");
+  const link = document.createElement("a");
+  // 只接受 http(s) 連結
+  if (/^https?:\/\//i.test(doc.u || "")) {
+    link.setAttribute("href", doc.u);
+  }
+  link.setAttribute("target", "_blank");
+  link.textContent = doc.t || "";
+  const date = document.createElement("span");
+  date.className = "search-date";
+  date.textContent = doc.d || "";
+  item.append(link, date);
+  return item;
+}
+
+function setupSearch() {
+  const input = document.getElementById("search-input");
+  const results = document.getElementById("search-results");
+  let timer = null;
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(async () => {
+      const query = input.value.trim();
+      if (!query) {
+        results.innerHTML = "";
+        return;
+      }
+      try {
+        const docs = await searchArticles(query);
+        if (docs.length) {
+          results.replaceChildren(...docs.map(createSearchResult));
+        } else {
+          results.innerHTML = `<li class="search-empty">找不到相關論文</li>`;
+        }
+      } catch (error) {
+        console.error("搜尋失敗:", error);
+        results.innerHTML = `<li class="search-empty">搜尋索引無法使用</li>`;
+      }
+    }, 250);
+  });
+}
+
 // 切換中英文顯示
 let showingTranslation = true;
 function toggleAll() {
   showingTranslation = !showingTranslation;
+  applyLanguage();
+}
+
+// 依目前的語言設定顯示標題與摘要
+function applyLanguage() {
   const btn = document.getElementById("toggle-all-btn");
   document
     .querySelectorAll(".title-original")
@@ -195,4 +482,7 @@ function toggleAll() {
 }
 
 // 當頁面載入完成時初始化
-document.addEventListener("DOMContentLoaded", initializePage);
+document.addEventListener("DOMContentLoaded", () => {
+  setupSearch();
+  initializePage();
+});
@@ -4,30 +4,363 @@ AI News 主執行腳本
 重構後的主程式入口，使用新的服務導向架構。
 """
 
+import argparse
+import signal
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import List, NamedTuple, Optional
 
 # 將 src 加入 Python 路徑
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from src.core.config import Config
-from src.core.models import NewsUpdate
+from src.core.models import NewsUpdate, Paper
 from src.services.arxiv_service import ArxivService
 from src.services.translation_service import TranslationService
 from src.services.audio_service import AudioService
-from src.services.storage_service import StorageService
-from src.utils.logging_utils import setup_logging, get_logger
+from src.services.storage_service import StorageService, create_storage_service
+from src.services.site_export_service import SiteExportService
+from src.services.search_index_service import SearchIndexService
+from src.services.feed_service import FeedService
+from src.services.metrics_service import MetricsService
+from src.services.run_scheduler import RunScheduler
+from src.services.ranking_service import RankingService
+from src.services.reprocess_service import ReprocessService
+from src.services.audio_backfill_queue import AudioBackfillQueue
+from src.utils.logging_utils import setup_logging, get_logger, log_context
+from src.utils.metrics import get_run_metrics, reset_run_metrics
 
+logger = get_logger(__name__)
 
-def main():
+
+class Services(NamedTuple):
+    """更新使用的服務（常駐模式下跨週期重用，保留連線與記憶體中的索引）"""
+    
+    arxiv: ArxivService
+    translation: TranslationService
+    audio: AudioService
+    storage: StorageService
+    site_export: SiteExportService
+    search_index: SearchIndexService
+    feed: FeedService
+    audio_backfill: AudioBackfillQueue
+    ranking: Optional[RankingService] = None
+
+
+def create_services(config: Config) -> Services:
+    """初始化更新所需的服務"""
+    storage = create_storage_service(config)
+    return Services(
+        arxiv=ArxivService(config),
+        translation=TranslationService(config),
+        audio=AudioService(config),
+        storage=storage,
+        site_export=SiteExportService(config, storage),
+        search_index=SearchIndexService(config, storage),
+        feed=FeedService(config, storage),
+        audio_backfill=AudioBackfillQueue(config, storage),
+        ranking=RankingService(config, storage) if config.RANKING_ENABLED else None,
+    )
+
+
+def write_run_metrics(config: Config, stats: NewsUpdate, start_time: datetime) -> None:
+    """填入本次執行的指標並輸出（失敗不影響更新結果）"""
+    try:
+        duration = (datetime.now() - start_time).total_seconds()
+        stats.apply_metrics(get_run_metrics().snapshot(), duration)
+        MetricsService(config).write(stats)
+    except Exception as e:
+        logger.error(f"輸出執行指標失敗: {str(e)}")
+
+
+def process_paper(config: Config, services: Services, paper: Paper, writer) -> None:
+    """
+    翻譯論文並寫入資料（先發布文字，音訊由 backfill_audio 之後補上）
+    
+    Args:
+        config: 配置
+        services: 服務
+        paper: 論文
+        writer: storage.writer() 取得的寫入器
+    
+    Raises:
+        Exception: 任一步驟失敗時拋出
+    """
+    metrics = get_run_metrics()
+    usage = []
+    
+    # 翻譯論文
+    with metrics.stage("translate"):
+        translation = services.translation.translate_paper(paper.title, paper.summary, usage=usage)
+    
+    # 更新論文物件（尚無音訊）
+    paper.add_translation(translation, None)
+    paper.usage = usage
+    # 記錄產生內容的提示詞與模型版本，之後變更時只重新處理過時的論文（回退翻譯不記錄，視為過時）
+    if any(record.kind == "translation" and record.success for record in usage):
+        paper.set_versions(services.translation.versions())
+    
+    # 儲存論文資料
+    with metrics.stage("save"):
+        writer.write(paper)
+
+
+def backfill_audio(config: Config, services: Services, scheduler: RunScheduler,
+                   stop_event: Optional[threading.Event] = None) -> List[str]:
+    """
+    為已發布但還沒有音訊的論文合成語音（包含先前執行失敗或來不及處理的論文）
+    
+    論文由 AudioBackfillQueue 選出，失敗的論文記錄失敗次數，之後延後重試。
+    
+    Args:
+        config: 配置
+        services: 服務
+        scheduler: 執行排程，時間或預算不足時其餘論文留待下次執行
+        stop_event: 設定後不再開始合成新的論文
+    
+    Returns:
+        補上音訊的論文ID
+    """
+    reprocess = ReprocessService(config, services.storage, services.translation, services.audio)
+    pending = services.audio_backfill.select()
+    if not pending:
+        return []
+    
+    logger.info("為 %d 篇論文補上音訊", len(pending))
+    # 以附加新紀錄的方式寫入，不改寫整個資料檔
+    stats = reprocess.run(pending, translate=False, audio=True, workers=config.AUDIO_BACKFILL_WORKERS,
+                          scheduler=scheduler, stop_event=stop_event, append=True)
+    services.audio_backfill.record_results(stats["ids"], stats["failed_ids"])
+    return stats["ids"]
+
+
+def publish(services: Services, saved_papers: List[Paper], backfilled_ids: Optional[List[str]] = None) -> None:
+    """匯出網站分頁資料、搜尋索引與訂閱源（失敗不影響已儲存的論文）"""
+    metrics = get_run_metrics()
+    
+    try:
+        with metrics.stage("export_site"):
+            services.site_export.export()
+    except Exception as e:
+        logger.error(f"匯出網站分頁資料失敗: {str(e)}")
+    
+    try:
+        with metrics.stage("search_index"):
+            services.search_index.update(saved_papers)
+    except Exception as e:
+        logger.error(f"更新搜尋索引失敗: {str(e)}")
+    
+    if backfilled_ids:
+        try:
+            # 訂閱源只收錄有音訊的論文，補上音訊後才加入
+            with metrics.stage("feed"):
+                services.feed.update(filter(None, map(services.storage.get_paper_by_id, backfilled_ids)))
+        except Exception as e:
+            logger.error(f"更新訂閱源失敗: {str(e)}")
+    
+    if services.ranking is not None and saved_papers:
+        try:
+            with metrics.stage("ranking_model"):
+                services.ranking.update(saved_papers)
+        except Exception as e:
+            logger.error(f"更新排序模型失敗: {str(e)}")
+
+
+def run_update(config: Config, services: Services, scheduler: Optional[RunScheduler] = None,
+               stop_event: Optional[threading.Event] = None) -> NewsUpdate:
+    """
+    執行一次更新：抓取、排程、處理、保存並發布
+    
+    Args:
+        config: 配置
+        services: 服務
+        scheduler: 執行排程，預設依 Config 的時限與預算建立
+        stop_event: 設定後不再開始處理新論文，已處理的論文仍會保存並發布
+    
+    Returns:
+        本次更新的統計
+    """
+    start_time = datetime.now()
+    metrics = reset_run_metrics()
+    scheduler = scheduler or RunScheduler(config)
+    storage = services.storage
+    
+    stats = NewsUpdate(
+        total_fetched=0,
+        successfully_translated=0,
+        failed_translations=0,
+        audio_generated=0,
+        update_time=start_time.isoformat()
+    )
+    
+    # 載入已處理的論文ID
+    processed_ids = storage.open_processed_ids()
+    logger.info("已載入 %d 個已處理的論文ID", len(processed_ids))
+    
+    # 抓取新論文；啟用排序時多抓一些候選論文，只處理相關度最高的
+    ranking = services.ranking
+    max_per_query = scheduler.max_per_query
+    if ranking is not None:
+        max_per_query = max(max_per_query, config.RANKING_CANDIDATES_PER_QUERY)
+    
+    with metrics.stage("fetch"):
+        candidates = services.arxiv.fetch_papers(processed_ids, max_per_query)
+    
+    if ranking is not None and candidates:
+        # 有時限或預算時由排程決定數量，否則維持每次處理 查詢數 × PAPERS_PER_QUERY 篇
+        top_k = config.RANKING_TOP_K or (
+            None if scheduler.limited else len(config.ARXIV_QUERIES) * config.PAPERS_PER_QUERY
+        )
+        with metrics.stage("rank"):
+            candidates = ranking.rank(candidates, top_k)
+    
+    # 依時限與預算選出本次處理的論文
+    papers = scheduler.plan(candidates, ranked=ranking is not None)
+    stats.total_fetched = len(papers)
+    
+    if not papers:
+        if candidates:
+            logger.info("時限或預算不足，%d 篇新論文留待下次執行", len(candidates))
+        else:
+            logger.info("沒有新論文")
+    
+    saved_papers = []
+    
+    # 處理每篇論文（論文資料以群組提交方式批次寫入）
+    if papers:
+        with storage.writer() as writer:
+            for i, paper in enumerate(papers, 1):
+                # 預估時間或預算不足時停止接受新工作，未處理的論文留到下次執行
+                if (stop_event is not None and stop_event.is_set()) or not scheduler.can_start():
+                    logger.info("尚有 %d 篇論文留待下次執行", len(papers) - i + 1)
+                    break
+                
+                with log_context(paper_id=paper.id):
+                    logger.info("處理第 %d/%d 篇論文: %s...", i, len(papers), paper.title[:50])
+                    paper_start = time.perf_counter()
+                    
+                    try:
+                        process_paper(config, services, paper, writer)
+                        stats.successfully_translated += 1
+                        saved_papers.append(paper)
+                        
+                        logger.info(
+                            "成功處理論文: %s（%d tokens）", paper.title_zh,
+                            sum(record.total_tokens for record in paper.usage),
+                            extra={"duration": round(time.perf_counter() - paper_start, 3)}
+                        )
+                    
+                    except Exception as e:
+                        logger.error("處理論文 %s 失敗: %s", paper.id, e)
+                        stats.failed_translations += 1
+                    
+                    # 已嘗試處理的論文（包含失敗的）都記為已處理
+                    processed_ids.add(paper.id)
+    
+    # 儲存更新的已處理ID
+    if papers:
+        with metrics.stage("save_ids"):
+            storage.save_processed_ids(processed_ids)
+    
+    # 新論文排入補上音訊的佇列
+    if saved_papers:
+        services.audio_backfill.add(paper.id for paper in saved_papers)
+    
+    # 先發布文字，語音合成的速度或故障不會延遲或阻擋新論文上線
+    if saved_papers:
+        publish(services, saved_papers)
+    
+    # 再為還沒有音訊的論文合成語音，完成後更新網站資料與訂閱源
+    backfilled_ids = []
+    try:
+        backfilled_ids = backfill_audio(config, services, scheduler, stop_event)
+    except Exception as e:
+        logger.error(f"補上音訊失敗: {str(e)}")
+    stats.audio_generated = len(backfilled_ids)
+    if backfilled_ids:
+        publish(services, [], backfilled_ids)
+    
+    # 輸出統計
+    duration = (datetime.now() - start_time).total_seconds()
+    
+    logger.info("=== 更新統計 ===")
+    logger.info(f"總抓取論文數: {stats.total_fetched}")
+    logger.info(f"成功翻譯數: {stats.successfully_translated}")
+    logger.info(f"翻譯失敗數: {stats.failed_translations}")
+    logger.info(f"音訊生成數: {stats.audio_generated}")
+    logger.info(f"成功率: {stats.success_rate:.2%}")
+    logger.info(f"處理時間: {duration:.1f} 秒")
+    
+    write_run_metrics(config, stats, start_time)
+    return stats
+
+
+def serve(config: Config, services: Services, interval: int, stop_event: threading.Event) -> None:
+    """
+    常駐模式：每隔固定時間執行一次更新，直到收到停止訊號
+    
+    服務在各週期間重用，HTTP 連線、已處理ID集合與索引都保留在記憶體中。
+    
+    Args:
+        config: 配置
+        services: 服務
+        interval: 兩次更新開始之間的秒數
+        stop_event: 停止訊號
+    """
+    logger.info("常駐模式啟動，每 %d 秒檢查一次新論文", interval)
+    
+    while not stop_event.is_set():
+        cycle_start = time.monotonic()
+        try:
+            run_update(config, services, stop_event=stop_event)
+        except Exception as e:
+            logger.error(f"更新週期失敗: {str(e)}", exc_info=True)
+        
+        wait = max(0.0, interval - (time.monotonic() - cycle_start))
+        if not stop_event.is_set():
+            logger.info("下一次更新在 %.0f 秒後", wait)
+        stop_event.wait(wait)
+    
+    logger.info("常駐模式已停止")
+
+
+def install_stop_handlers(stop_event: threading.Event) -> None:
+    """收到 SIGTERM／SIGINT 時設定停止訊號，讓處理中的論文完成並保存後再結束"""
+    def handle(signum, frame):
+        if stop_event.is_set():
+            # 第二次收到訊號時立即結束
+            raise KeyboardInterrupt
+        logger.info("收到停止訊號 (%s)，完成處理中的論文後結束", signal.Signals(signum).name)
+        stop_event.set()
+    
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, handle)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="AI News 更新")
+    parser.add_argument("--serve", action="store_true", help="常駐模式，定期檢查新論文")
+    parser.add_argument("--interval", type=int, default=None,
+                        help="常駐模式的更新間隔秒數（預設為 Config.SERVE_INTERVAL_SECONDS）")
+    return parser
+
+
+def main(argv=None):
     """主執行函式"""
+    # 時限從程序啟動起算，包含初始化服務的時間
+    started_at = time.monotonic()
+    args = build_parser().parse_args(argv)
+    
     # 設置日誌
-    setup_logging()
-    logger = get_logger(__name__)
+    setup_logging(json_format=Config.LOG_FORMAT == "json")
     
     logger.info("=== AI News 更新開始 ===")
-    start_time = datetime.now()
+    
+    stop_event = threading.Event()
+    install_stop_handlers(stop_event)
     
     try:
         # 初始化配置
@@ -35,84 +368,18 @@ def main():
         config.validate()
         
         # 初始化服務
-        arxiv_service = ArxivService(config)
-        translation_service = TranslationService(config)
-        audio_service = AudioService(config) 
-        storage_service = StorageService(config)
-        
-        # 載入已處理的論文ID
-        processed_ids = storage_service.load_processed_ids()
-        logger.info(f"已載入 {len(processed_ids)} 個已處理的論文ID")
-        
-        # 抓取新論文
-        papers = arxiv_service.fetch_papers(processed_ids)
-        
-        if not papers:
-            logger.info("沒有新論文，結束更新")
-            return
-        
-        # 初始化統計
-        stats = NewsUpdate(
-            total_fetched=len(papers),
-            successfully_translated=0,
-            failed_translations=0,
-            audio_generated=0,
-            update_time=datetime.now().isoformat()
-        )
+        services = create_services(config)
         
-        # 處理每篇論文
-        for i, paper in enumerate(papers, 1):
-            logger.info(f"處理第 {i}/{len(papers)} 篇論文: {paper.title[:50]}...")
-            
-            try:
-                # 翻譯論文
-                translation = translation_service.translate_paper(paper.title, paper.summary)
-                stats.successfully_translated += 1
-                
-                # 生成音訊
-                audio_path = config.get_audio_path(paper.id)
-                audio_service.generate_audio(translation.get_audio_content(), audio_path)
-                stats.audio_generated += 1
-                
-                # 更新論文物件
-                # 確保路徑使用正斜線，避免 JavaScript 處理問題
-                relative_path = audio_path.relative_to(config.BASE_DIR)
-                web_friendly_path = str(relative_path).replace("\\", "/")
-                paper.add_translation(translation, web_friendly_path)
-                
-                # 儲存論文資料
-                storage_service.save_paper(paper)
-                
-                # 更新已處理ID
-                processed_ids.add(paper.id)
-                
-                logger.info(f"成功處理論文: {paper.title_zh}")
-                
-            except Exception as e:
-                logger.error(f"處理論文 {paper.id} 失敗: {str(e)}")
-                stats.failed_translations += 1
-                continue
-        
-        # 儲存更新的已處理ID
-        storage_service.save_processed_ids(processed_ids)
-        
-        # 輸出統計
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        
-        logger.info("=== 更新統計 ===")
-        logger.info(f"總抓取論文數: {stats.total_fetched}")
-        logger.info(f"成功翻譯數: {stats.successfully_translated}")
-        logger.info(f"翻譯失敗數: {stats.failed_translations}")
-        logger.info(f"音訊生成數: {stats.audio_generated}")
-        logger.info(f"成功率: {stats.success_rate:.2%}")
-        logger.info(f"處理時間: {duration:.1f} 秒")
+        if args.serve:
+            serve(config, services, args.interval or config.SERVE_INTERVAL_SECONDS, stop_event)
+        else:
+            run_update(config, services, RunScheduler(config, started_at=started_at), stop_event)
         logger.info("=== AI News 更新完成 ===")
-        
+    
     except Exception as e:
         logger.error(f"程式執行失敗: {str(e)}", exc_info=True)
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,279 @@
+"""
+AI News 資料管理腳本
+
+提供資料儲存相關的維護指令，例如 JSONL 與 SQLite 之間的匯入匯出。
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 將 src 加入 Python 路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.core.config import Config
+from src.core.exceptions import StorageError
+from src.services.backup_service import BackupService
+from src.services.sqlite_storage_service import SQLiteStorageService
+from src.services.sharded_storage_service import ShardedStorageService
+from src.services.site_export_service import SiteExportService
+from src.services.search_index_service import SearchIndexService
+from src.services.ranking_service import RankingService
+from src.services.reprocess_service import ReprocessService
+from src.services.run_scheduler import RunScheduler
+from src.services.feed_service import FeedService
+from src.services.site_build_service import SiteBuildService
+from src.services.storage_service import create_storage_service
+from src.utils.logging_utils import setup_logging, get_logger
+from src.utils.metrics import reset_run_metrics
+
+
+def cmd_import_jsonl(args: argparse.Namespace, config: Config) -> None:
+    """將 JSONL 資料匯入 SQLite 資料庫"""
+    storage = SQLiteStorageService(config, db_path=args.db)
+    try:
+        storage.import_jsonl(args.source, args.processed_ids)
+    finally:
+        storage.close()
+
+
+def cmd_export_jsonl(args: argparse.Namespace, config: Config) -> None:
+    """將 SQLite 資料庫匯出為 JSONL"""
+    storage = SQLiteStorageService(config, db_path=args.db)
+    try:
+        storage.export_jsonl(args.output)
+    finally:
+        storage.close()
+
+
+def cmd_shard(args: argparse.Namespace, config: Config) -> None:
+    """將 news.jsonl 切分為依發布日期的分片"""
+    if args.period:
+        config.SHARD_PERIOD = args.period
+    ShardedStorageService(config).import_jsonl(args.source)
+
+
+def cmd_merge_shards(args: argparse.Namespace, config: Config) -> None:
+    """將分片合併回單一 JSONL 檔案"""
+    ShardedStorageService(config).export_jsonl(args.output)
+
+
+def cmd_compact(args: argparse.Namespace, config: Config) -> None:
+    """移除目前儲存後端中重複的論文紀錄"""
+    storage = create_storage_service(config)
+    removed = storage.compact()
+    print(f"已移除 {removed} 筆重複紀錄")
+
+
+def cmd_prune_audio(args: argparse.Namespace, config: Config) -> None:
+    """依保留政策封存較舊的音訊"""
+    storage = create_storage_service(config)
+    stats = storage.prune_audio(keep_days=args.keep_days, keep_latest=args.keep_latest, dry_run=args.dry_run)
+    if stats["ids"]:
+        # 已發布的網站分頁與訂閱源項目不能再指向移出公開目錄的音訊（搜尋索引不含音訊，不需更新）
+        SiteExportService(config, storage).export()
+        FeedService(config, storage).remove_enclosures(stats["ids"])
+    action = "可封存" if args.dry_run else "已封存"
+    print(
+        f"{action} {stats['archived']} 個音訊檔，釋放 {stats['bytes_reclaimed'] / 1024 / 1024:.1f} MB"
+        f"（封存後 {stats['archive_bytes'] / 1024 / 1024:.1f} MB）"
+    )
+
+
+def cmd_export_site(args: argparse.Namespace, config: Config) -> None:
+    """匯出網站分頁資料"""
+    result = SiteExportService(config, create_storage_service(config)).export()
+    print(f"已匯出 {result['total']} 篇論文、{result['pages']} 個分頁（重寫 {result['written']} 個檔案）")
+
+
+def cmd_build_search(args: argparse.Namespace, config: Config) -> None:
+    """更新（或重新建立）搜尋索引"""
+    search_index = SearchIndexService(config, create_storage_service(config))
+    count = search_index.rebuild() if args.rebuild else search_index.sync()
+    print(f"搜尋索引已更新 {count} 篇論文")
+
+
+def cmd_build_ranking(args: argparse.Namespace, config: Config) -> None:
+    """更新（或重新建立）相關度排序模型"""
+    ranking = RankingService(config, create_storage_service(config))
+    count = ranking.rebuild() if args.rebuild else ranking.sync()
+    print(f"排序模型已加入 {count} 篇論文")
+
+
+def cmd_build_feed(args: argparse.Namespace, config: Config) -> None:
+    """重新產生 RSS／Podcast 訂閱源"""
+    count = FeedService(config, create_storage_service(config)).rebuild()
+    print(f"訂閱源已產生，共 {count} 個項目")
+
+
+def cmd_build_site(args: argparse.Namespace, config: Config) -> None:
+    """建置部署用的網站目錄"""
+    stats = SiteBuildService(config).build()
+    print(f"網站建置完成：寫入 {stats['written']} 個檔案，未變動 {stats['unchanged']} 個，移除 {stats['removed']} 個")
+
+
+def cmd_reprocess(args: argparse.Namespace, config: Config) -> None:
+    """以目前的提示詞、模型與語音設定重新處理既有論文"""
+    translate = args.mode in ("all", "translation")
+    audio = args.mode in ("all", "audio")
+    storage = create_storage_service(config)
+    service = ReprocessService(config, storage)
+    
+    records = service.select(since=args.since, until=args.until, query=args.query, model=args.model,
+                             translate=translate, audio=audio, force=args.force)
+    if args.limit:
+        records = records[:args.limit]
+    if args.dry_run:
+        for record in records:
+            print(f"{record.id}\t{record.published_date}\t{record.translation_model or '-'}\t{record.title}")
+        print(f"共 {len(records)} 篇論文需要重新處理")
+        return
+    
+    reset_run_metrics()
+    scheduler = RunScheduler(config, deadline_seconds=args.deadline, token_budget=args.token_budget,
+                             request_budget=args.request_budget)
+    run_key = {"since": args.since, "until": args.until, "query": args.query, "model": args.model,
+               "force": args.force, "limit": args.limit}
+    stats = service.run(records, translate=translate, audio=audio, workers=args.workers,
+                        scheduler=scheduler, run_key=run_key)
+    
+    if stats["updated"] and not args.no_publish:
+        # 內容有變動，更新網站分頁、搜尋索引與訂閱源
+        SiteExportService(config, storage).export()
+        SearchIndexService(config, storage).sync()
+        FeedService(config, storage).rebuild()
+    
+    print(
+        f"已重新處理 {stats['updated']} 篇論文，失敗 {stats['failed']} 篇，"
+        f"略過上次已完成的 {stats['skipped']} 篇，留待下次 {stats['remaining']} 篇"
+    )
+
+
+def _backup_service(config: Config) -> BackupService:
+    storage = create_storage_service(config)
+    if isinstance(storage, SQLiteStorageService):
+        raise StorageError("SQLite 後端不支援增量備份，請使用資料庫備份檔")
+    return BackupService(storage)
+
+
+def cmd_backup(args: argparse.Namespace, config: Config) -> None:
+    """建立增量（或完整）備份"""
+    record = _backup_service(config).create_backup(full=args.full)
+    print(f"已建立備份 {record['id']}（{record['type']}，{record['bytes']} bytes）")
+
+
+def cmd_list_backups(args: argparse.Namespace, config: Config) -> None:
+    """列出所有備份"""
+    for record in _backup_service(config).list_backups():
+        print(f"{record['id']}\t{record['created_at']}\t{record['type']}\t{record['bytes']} bytes")
+
+
+def cmd_restore(args: argparse.Namespace, config: Config) -> None:
+    """還原到指定時間點的備份"""
+    at = datetime.fromisoformat(args.at) if args.at else None
+    record = _backup_service(config).restore(at=at, backup_id=args.id, target_dir=args.target)
+    print(f"已還原備份 {record['id']}（{record['created_at']}）")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """建立命令列參數解析器"""
+    parser = argparse.ArgumentParser(description="AI News 資料管理工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = subparsers.add_parser("import-jsonl", help="將 news.jsonl 匯入 SQLite")
+    import_parser.add_argument("--source", type=Path, default=None, help="JSONL 檔案路徑")
+    import_parser.add_argument("--processed-ids", type=Path, default=None, help="已處理ID檔案路徑")
+    import_parser.add_argument("--db", type=Path, default=None, help="SQLite 資料庫路徑")
+    import_parser.set_defaults(func=cmd_import_jsonl)
+    
+    export_parser = subparsers.add_parser("export-jsonl", help="將 SQLite 匯出為 news.jsonl")
+    export_parser.add_argument("--output", type=Path, default=None, help="輸出 JSONL 檔案路徑")
+    export_parser.add_argument("--db", type=Path, default=None, help="SQLite 資料庫路徑")
+    export_parser.set_defaults(func=cmd_export_jsonl)
+    
+    shard_parser = subparsers.add_parser("shard", help="將 news.jsonl 切分為依發布日期的分片")
+    shard_parser.add_argument("--source", type=Path, default=None, help="JSONL 檔案路徑")
+    shard_parser.add_argument("--period", choices=["month", "week"], default=None, help="分片週期")
+    shard_parser.set_defaults(func=cmd_shard)
+    
+    merge_parser = subparsers.add_parser("merge-shards", help="將分片合併為單一 JSONL 檔案")
+    merge_parser.add_argument("--output", type=Path, default=None, help="輸出 JSONL 檔案路徑")
+    merge_parser.set_defaults(func=cmd_merge_shards)
+    
+    compact_parser = subparsers.add_parser("compact", help="移除重複的論文ID，保留最新紀錄")
+    compact_parser.set_defaults(func=cmd_compact)
+    
+    prune_parser = subparsers.add_parser("prune-audio", help="依保留政策將較舊的音訊移到壓縮封存區")
+    prune_parser.add_argument("--keep-days", type=int, default=None, help="保留最近幾天處理的論文音訊")
+    prune_parser.add_argument("--keep-latest", type=int, default=None, help="至少保留最新幾篇論文的音訊")
+    prune_parser.add_argument("--dry-run", action="store_true", help="只計算可釋放的空間，不實際搬移")
+    prune_parser.set_defaults(func=cmd_prune_audio)
+    
+    export_site_parser = subparsers.add_parser("export-site", help="匯出網站分頁資料")
+    export_site_parser.set_defaults(func=cmd_export_site)
+    
+    search_parser = subparsers.add_parser("build-search", help="更新網站搜尋索引")
+    search_parser.add_argument("--rebuild", action="store_true", help="刪除現有索引並重新建立")
+    search_parser.set_defaults(func=cmd_build_search)
+    
+    ranking_parser = subparsers.add_parser("build-ranking", help="更新論文相關度排序模型")
+    ranking_parser.add_argument("--rebuild", action="store_true", help="刪除現有模型並重新建立")
+    ranking_parser.set_defaults(func=cmd_build_ranking)
+    
+    feed_parser = subparsers.add_parser("build-feed", help="重新產生 RSS／Podcast 訂閱源")
+    feed_parser.set_defaults(func=cmd_build_feed)
+    
+    site_parser = subparsers.add_parser("build-site", help="建置部署用的網站目錄（_site）")
+    site_parser.set_defaults(func=cmd_build_site)
+    
+    reprocess_parser = subparsers.add_parser("reprocess", help="以目前的提示詞、模型與語音重新處理既有論文")
+    reprocess_parser.add_argument("--mode", choices=["all", "translation", "audio"], default="all",
+                                  help="重新翻譯並合成語音、只重新翻譯（仍會重新合成語音）或只重新合成語音")
+    reprocess_parser.add_argument("--since", default=None, help="只處理此日期（YYYY-MM-DD）之後發布的論文")
+    reprocess_parser.add_argument("--until", default=None, help="只處理此日期（YYYY-MM-DD）之前發布的論文")
+    reprocess_parser.add_argument("--query", default=None, help="只處理此查詢抓取的論文")
+    reprocess_parser.add_argument("--model", default=None,
+                                  help="只處理以此模型翻譯或合成的論文（none 表示沒有記錄版本的舊資料）")
+    reprocess_parser.add_argument("--force", action="store_true", help="忽略版本，符合條件的論文全部重新處理")
+    reprocess_parser.add_argument("--limit", type=int, default=None, help="最多處理幾篇論文")
+    reprocess_parser.add_argument("--workers", type=int, default=None, help="同時處理的論文數")
+    reprocess_parser.add_argument("--deadline", type=int, default=None, help="執行時限（秒）")
+    reprocess_parser.add_argument("--token-budget", type=int, default=None, help="token 預算")
+    reprocess_parser.add_argument("--request-budget", type=int, default=None, help="API 請求預算")
+    reprocess_parser.add_argument("--dry-run", action="store_true", help="只列出需要重新處理的論文")
+    reprocess_parser.add_argument("--no-publish", action="store_true", help="不更新網站分頁、搜尋索引與訂閱源")
+    reprocess_parser.set_defaults(func=cmd_reprocess)
+    
+    backup_parser = subparsers.add_parser("backup", help="建立增量備份")
+    backup_parser.add_argument("--full", action="store_true", help="強制建立完整備份")
+    backup_parser.set_defaults(func=cmd_backup)
+    
+    list_backups_parser = subparsers.add_parser("list-backups", help="列出所有備份")
+    list_backups_parser.set_defaults(func=cmd_list_backups)
+    
+    restore_parser = subparsers.add_parser("restore", help="還原到指定時間點的備份")
+    restore_parser.add_argument("--at", default=None, help="還原到此時間點（ISO 格式）之前最後一個備份")
+    restore_parser.add_argument("--id", default=None, help="備份ID")
+    restore_parser.add_argument("--target", type=Path, default=None, help="還原到其他目錄（預設覆寫目前資料）")
+    restore_parser.set_defaults(func=cmd_restore)
+    
+    return parser
+
+
+def main(argv=None):
+    """主執行函式"""
+    setup_logging(json_format=Config.LOG_FORMAT == "json")
+    logger = get_logger(__name__)
+    
+    args = build_parser().parse_args(argv)
+    
+    try:
+        args.func(args, Config())
+    except Exception as e:
+        logger.error(f"指令執行失敗: {str(e)}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
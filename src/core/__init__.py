@@ -8,12 +8,13 @@ __version__ = "2.0.0"
 __author__ = "AI News Team"
 
 from .config import Config
-from .models import Paper, PaperTranslation
+from .models import Paper, PaperRecord, PaperTranslation
 from .exceptions import AINewsException, TranslationError, AudioGenerationError
 
 __all__ = [
     "Config",
     "Paper", 
+    "PaperRecord",
     "PaperTranslation",
     "AINewsException",
     "TranslationError", 
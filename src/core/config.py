@@ -5,7 +5,7 @@
 """
 
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 
 
@@ -15,24 +15,124 @@ class Config:
     # API 配置
     GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
     
+    # 網站網址（訂閱源中的連結使用）
+    SITE_URL: str = os.getenv("SITE_URL", "https://noname414.github.io/AI_news2/")
+    
     # 檔案路徑配置
     BASE_DIR = Path(__file__).parent.parent.parent
     DATA_DIR = BASE_DIR / "docs" / "data"
     AUDIO_DIR = DATA_DIR / "audios"
     WEB_DIR = BASE_DIR / "web"
+    STATE_DIR = BASE_DIR / "state"  # 內部狀態檔案（不部署到網站）
     
     NEWS_FILE = DATA_DIR / "news.jsonl"
-    PROCESSED_IDS_FILE = DATA_DIR / "processed_ids.txt"
+    NEWS_INDEX_FILE = STATE_DIR / "news.idx"
+    PROCESSED_IDS_FILE = DATA_DIR / "processed_ids.txt"  # 排序快照
+    PROCESSED_IDS_LOG_FILE = DATA_DIR / "processed_ids.log"  # 新增ID的附加日誌
+    PROCESSED_IDS_BLOOM_FILE = STATE_DIR / "processed_ids.bloom"
+    PROCESSED_IDS_COMPACT_THRESHOLD: int = 256  # 日誌累積多少筆後合併進快照
+    
+    # 儲存後端配置（"jsonl"、"sqlite" 或 "sharded"）
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "jsonl")
+    SQLITE_DB_FILE = STATE_DIR / "news.db"
+    SHARDS_DIR = DATA_DIR / "shards"
+    SHARD_PERIOD: str = "month"  # "month" 或 "week"
+    WRITE_BATCH_SIZE: int = 32  # 群組提交每批的紀錄數量
+    FSYNC_WRITES: bool = True
+    
+    # 備份配置
+    BACKUP_DIR = STATE_DIR / "backups"
+    BACKUP_COMPRESSION: str = "gzip"  # "gzip" 或 "zstd"（需安裝 zstandard）
+    BACKUP_RETENTION: int = 30  # 保留最近幾個備份
+    BACKUP_FULL_EVERY: int = 10  # 每幾個備份建立一次完整備份
+    
+    # 網站分頁資料配置
+    SITE_PAGES_DIR = DATA_DIR / "pages"
+    SITE_PAGE_SIZE: int = 50  # 每個分頁的論文數量
+    SITE_LATEST_COUNT: int = 20  # 首屏 latest.json 的論文數量
+    SEARCH_INDEX_DIR = DATA_DIR / "search"
+    SEARCH_STATE_FILE = STATE_DIR / "search_state.json"
+    
+    # 音訊保留政策（較舊的音訊移到不部署的壓縮封存區）
+    AUDIO_ARCHIVE_DIR = Path(os.getenv("AUDIO_ARCHIVE_DIR", str(BASE_DIR / "archive" / "audios")))
+    AUDIO_KEEP_DAYS: int = 30  # 保留最近幾天處理的論文音訊
+    AUDIO_KEEP_LATEST: int = 100  # 至少保留最新幾篇論文的音訊
+    
+    # 網站建置配置（部署 SITE_BUILD_DIR 而非整個專案）
+    SITE_BUILD_DIR = BASE_DIR / "_site"
+    SITE_BUILD_STATE_FILE = STATE_DIR / "site_build.json"
+    
+    # RSS／Podcast 訂閱源配置
+    FEED_FILE = DATA_DIR / "feed.xml"
+    FEED_ARCHIVE_DIR = DATA_DIR / "feeds"
+    FEED_STATE_FILE = STATE_DIR / "feed_state.json"
+    FEED_WINDOW_SIZE: int = 50  # feed.xml 中的項目數量
+    FEED_ARCHIVE_SIZE: int = 100  # 每個封存訂閱源的項目數量
+    
+    # 日誌格式：text 或 json（JSON lines，包含 paper_id、stage、duration 欄位）
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    
+    # 執行指標配置
+    METRICS_DIR = STATE_DIR / "metrics"
+    METRICS_HISTORY_FILE = METRICS_DIR / "history.jsonl"
+    METRICS_HISTORY_LIMIT: int = 2000  # 歷史紀錄保留的執行次數
+    METRICS_REGRESSION_RATIO: float = 0.5  # 吞吐量低於近期中位數的此比例時發出警告
     
     # arXiv 搜尋配置
     ARXIV_QUERIES: List[str] = ["AI", "Foundation Model", "Diffusion Model"]
     MAX_RESULTS_PER_QUERY: int = 50
+    PAPERS_PER_QUERY: int = int(os.getenv("PAPERS_PER_QUERY", "1"))  # 每個查詢處理的新論文數
+    
+    # 執行排程配置（0 表示不限制）
+    RUN_DEADLINE_SECONDS: int = int(os.getenv("RUN_DEADLINE_SECONDS", "0"))  # 從啟動起算的執行時限
+    RUN_TOKEN_BUDGET: int = int(os.getenv("RUN_TOKEN_BUDGET", "0"))  # 每次執行可用的 token 數
+    RUN_REQUEST_BUDGET: int = int(os.getenv("RUN_REQUEST_BUDGET", "0"))  # 每次執行可用的 API 請求數
+    RUN_FINALIZE_SECONDS: int = 60  # 保留給儲存、匯出與索引的時間
+    SCHEDULER_MAX_PER_QUERY: int = 10  # 有時限或預算時，每個查詢最多抓取的候選論文數
+    SERVE_INTERVAL_SECONDS: int = int(os.getenv("SERVE_INTERVAL_SECONDS", "900"))  # 常駐模式的更新間隔
+    
+    # 外部呼叫錄製／重播（off、record 或 replay），用於以真實流量重現效能測試
+    CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+    CASSETTE_DIR = Path(os.getenv("CASSETTE_DIR", str(STATE_DIR / "cassettes" / "default")))
+    CASSETTE_REALTIME: bool = os.getenv("CASSETTE_REALTIME", "false").lower() == "true"  # 重播時依原始耗時等待
+    
+    # 相關度排序配置（以 BM25 挑選要翻譯的論文）
+    RANKING_ENABLED: bool = os.getenv("RANKING_ENABLED", "true").lower() == "true"
+    RANKING_MODEL_FILE = STATE_DIR / "ranking_model.json"
+    RANKING_CANDIDATES_PER_QUERY: int = 20  # 排序時每個查詢抓取的候選論文數
+    RANKING_TOP_K: int = int(os.getenv("RANKING_TOP_K", "0"))  # 0 表示沒有時限與預算時處理 查詢數 × PAPERS_PER_QUERY 篇
+    RANKING_PROFILE: List[str] = [
+        "large language model",
+        "foundation model",
+        "diffusion model",
+        "multimodal",
+        "reasoning",
+        "agent",
+        "retrieval augmented generation",
+        "alignment",
+        "text to speech",
+    ]
+    
+    # 既有論文重新處理配置（翻譯提示詞、模型或語音變更後使用）
+    REPROCESS_WORKERS: int = int(os.getenv("REPROCESS_WORKERS", "4"))  # 同時重新處理的論文數
+    REPROCESS_BATCH_SIZE: int = 10  # 每完成幾篇寫回一次資料
+    REPROCESS_STATE_FILE = STATE_DIR / "reprocess_state.json"  # 中斷後續傳的進度
+    AUDIO_BACKFILL_WORKERS: int = int(os.getenv("AUDIO_BACKFILL_WORKERS", "2"))  # 更新時同時補上音訊的論文數
+    AUDIO_BACKFILL_STATE_FILE = STATE_DIR / "audio_backfill.json"  # 等待補上音訊的論文與失敗紀錄
+    AUDIO_BACKFILL_MAX_ATTEMPTS: int = 5  # 補上音訊失敗幾次後不再嘗試
+    AUDIO_BACKFILL_RETRY_SECONDS: int = 3600  # 失敗後等待多久再重試，每次失敗加倍
     
     # Gemini 配置
     GEMINI_MODEL: str = "gemini-2.0-flash-001"
     TEMPERATURE: float = 0.7
     MAX_OUTPUT_TOKENS: int = 2000
     
+    # Gemini 連線配置（同一 API 金鑰的服務共用一個客戶端與連線池）
+    GEMINI_POOL_SIZE: int = int(os.getenv("GEMINI_POOL_SIZE", "8"))  # 最大連線數，應不少於同時進行的請求數
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))  # 單次請求逾時
+    GEMINI_KEEPALIVE_SECONDS: float = 60.0  # 閒置連線保留時間
+    GEMINI_WARMUP_CONNECTIONS: int = int(os.getenv("GEMINI_WARMUP_CONNECTIONS", "0"))  # 啟動時預先建立的連線數（0 表示不預熱）
+    
     # 語音合成配置
     TTS_LANGUAGE: str = "zh-tw"
     GEMINI_TTS_MODEL: str = "gemini-2.5-flash-preview-tts"
@@ -40,6 +140,15 @@ class Config:
     TTS_SAMPLE_RATE: int = 24000
     TTS_CHANNELS: int = 1
     TTS_SAMPLE_WIDTH: int = 2
+    # 額外的語音版本（版本名稱 → voice 語音名稱、style 朗讀指示），與預設語音共用同一份翻譯與旁白文字；
+    # 可用環境變數設定語音，例如 TTS_VARIANTS="puck=Puck,charon=Charon"，
+    # 語速等朗讀方式以 style 加在旁白前，例如 {"slow": {"voice": "Kore", "style": "請用緩慢、清楚的語速朗讀："}}
+    TTS_VARIANTS: Dict[str, Dict[str, str]] = {
+        name.strip(): {"voice": voice.strip()}
+        for name, _, voice in (item.partition("=") for item in os.getenv("TTS_VARIANTS", "").split(","))
+        if name.strip() and voice.strip()
+    }
+    TTS_MAX_WORKERS: int = int(os.getenv("TTS_MAX_WORKERS", "4"))  # 同一篇論文同時合成的語音版本數
     
     # 網站配置
     SITE_TITLE: str = "最新 arXiv AI 論文"
@@ -57,6 +166,13 @@ class Config:
         cls.AUDIO_DIR.mkdir(exist_ok=True)
     
     @classmethod
-    def get_audio_path(cls, paper_id: str) -> Path:
-        """取得音訊檔案路徑"""
-        return cls.AUDIO_DIR / f"{paper_id}.wav" 
\ No newline at end of file
+    def get_audio_path(cls, paper_id: str, variant: Optional[str] = None) -> Path:
+        """取得音訊檔案路徑（variant 為 TTS_VARIANTS 的版本名稱，None 表示預設語音）"""
+        if variant:
+            return cls.AUDIO_DIR / f"{paper_id}.{variant}.wav"
+        return cls.AUDIO_DIR / f"{paper_id}.wav"
+    
+    @classmethod
+    def to_web_path(cls, path: Path) -> str:
+        """取得相對於專案根目錄的路徑（使用正斜線，避免 JavaScript 處理問題）"""
+        return path.relative_to(cls.BASE_DIR).as_posix()
@@ -51,4 +51,11 @@ class ConfigurationError(AINewsException):
     """配置相關異常"""
     
     def __init__(self, message: str = "配置錯誤", details: str = None):
-        super().__init__(message, details) 
\ No newline at end of file
+        super().__init__(message, details)
+
+
+class CassetteError(AINewsException):
+    """外部呼叫錄製／重播相關異常"""
+    
+    def __init__(self, message: str = "卡帶錄製或重播失敗", details: str = None):
+        super().__init__(message, details)
@@ -5,10 +5,49 @@
 """
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
+class UsageRecord(BaseModel):
+    """單次 Gemini API 呼叫的用量紀錄（重試的用量合併計入同一筆）"""
+    
+    kind: str = Field(description="呼叫類型：translation 或 tts")
+    model: str = Field(description="使用的模型")
+    prompt_tokens: int = Field(default=0, description="輸入 token 數")
+    output_tokens: int = Field(default=0, description="輸出 token 數")
+    total_tokens: int = Field(default=0, description="總 token 數")
+    input_chars: int = Field(default=0, description="輸入文字的字元數")
+    audio_bytes: int = Field(default=0, description="生成的音訊位元組數")
+    audio_seconds: float = Field(default=0.0, description="生成的音訊長度（秒）")
+    latency_seconds: float = Field(default=0.0, description="API 呼叫耗時（秒，包含重試）")
+    retries: int = Field(default=0, description="重試次數")
+    success: bool = Field(default=True, description="是否成功")
+    
+    def add_response(self, response: Any) -> None:
+        """累加回應中 usage_metadata 的 token 數（缺少時略過）"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.prompt_tokens += usage.prompt_token_count or 0
+        self.output_tokens += usage.candidates_token_count or 0
+        self.total_tokens += usage.total_token_count or 0
+    
+    def totals(self) -> Dict[str, float]:
+        """供每次執行彙總的數值欄位"""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "input_chars": self.input_chars,
+            "audio_bytes": self.audio_bytes,
+            "audio_seconds": self.audio_seconds,
+            "latency_seconds": self.latency_seconds,
+            "retries": self.retries,
+            "failures": 0 if self.success else 1,
+        }
+
+
 class Paper(BaseModel):
     """arXiv 論文資料模型"""
     
@@ -27,9 +66,17 @@ class Paper(BaseModel):
     applications: Optional[List[str]] = Field(default=None, description="應用場景")
     pitch: Optional[str] = Field(default=None, description="推銷內容")
     audio: Optional[str] = Field(default=None, description="音訊檔案路徑")
+    audio_variants: Optional[Dict[str, str]] = Field(default=None, description="其他語音版本的音訊路徑（版本名稱 → 路徑）")
+    
+    # 處理紀錄
+    usage: Optional[List[UsageRecord]] = Field(default=None, description="各次 API 呼叫的用量")
+    translation_model: Optional[str] = Field(default=None, description="翻譯使用的模型")
+    prompt_version: Optional[str] = Field(default=None, description="翻譯提示詞的版本")
+    tts_model: Optional[str] = Field(default=None, description="語音合成使用的模型")
+    tts_voice: Optional[str] = Field(default=None, description="預設語音的名稱")
     
-    def add_translation(self, translation: 'PaperTranslation', audio_path: str) -> None:
-        """新增翻譯結果到論文物件"""
+    def add_translation(self, translation: 'PaperTranslation', audio_path: Optional[str] = None) -> None:
+        """新增翻譯結果到論文物件（音訊可之後再補上）"""
         self.title_zh = translation.title_zh
         self.summary_zh = translation.summary_zh
         self.applications = translation.applications
@@ -37,12 +84,47 @@ class Paper(BaseModel):
         self.audio = audio_path
         self.timestamp = datetime.now().isoformat()
     
+    def set_versions(self, versions: Dict[str, str]) -> None:
+        """記錄產生內容的模型與提示詞版本（TranslationService.versions()、AudioService.versions()）"""
+        for name, value in versions.items():
+            setattr(self, name, value)
+    
     @property
     def is_translated(self) -> bool:
         """檢查是否已翻譯"""
         return self.title_zh is not None
 
 
+class PaperRecord:
+    """輕量的論文紀錄
+    
+    供大量讀取自行寫入的可信資料使用，欄位與 Paper 相同但不經過 pydantic 驗證；
+    需要驗證時再呼叫 to_paper()。
+    """
+    
+    __slots__ = tuple(Paper.model_fields)
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PaperRecord':
+        """從解碼後的 JSON 物件建立紀錄"""
+        return cls(**data)
+    
+    def to_dict(self) -> dict:
+        """轉換為字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def to_paper(self) -> Paper:
+        """執行完整驗證並轉換為 Paper"""
+        return Paper(**self.to_dict())
+    
+    def __repr__(self) -> str:
+        return f"PaperRecord(id={self.id!r}, title={self.title!r})"
+
+
 class PaperTranslation(BaseModel):
     """論文翻譯結果的結構化模型"""
     
@@ -77,9 +159,46 @@ class NewsUpdate(BaseModel):
     audio_generated: int = Field(description="成功生成音訊的論文數量")
     update_time: str = Field(description="更新時間")
     
+    # 執行指標（由 RunMetrics 填入）
+    duration_seconds: float = Field(default=0.0, description="執行時間（秒）")
+    retries: int = Field(default=0, description="API 重試次數")
+    bytes_written: int = Field(default=0, description="寫入的資料位元組數")
+    audio_seconds: float = Field(default=0.0, description="生成的音訊總長度（秒）")
+    peak_memory_bytes: Optional[int] = Field(default=None, description="記憶體使用峰值")
+    stage_latency: Dict[str, Dict] = Field(default_factory=dict, description="各階段延遲直方圖")
+    caches: Dict[str, Dict] = Field(default_factory=dict, description="各快取的命中統計")
+    counters: Dict[str, float] = Field(default_factory=dict, description="其他計數器")
+    usage: Dict[str, Dict] = Field(default_factory=dict, description="依呼叫類型與模型彙總的 API 用量")
+    
     @property
     def success_rate(self) -> float:
         """計算成功率"""
         if self.total_fetched == 0:
             return 0.0
-        return self.successfully_translated / self.total_fetched 
\ No newline at end of file
+        return self.successfully_translated / self.total_fetched
+    
+    @property
+    def papers_per_minute(self) -> float:
+        """每分鐘處理的論文數（吞吐量）"""
+        if self.duration_seconds <= 0:
+            return 0.0
+        return self.successfully_translated / self.duration_seconds * 60
+    
+    def apply_metrics(self, snapshot: dict, duration_seconds: float) -> None:
+        """
+        填入 RunMetrics.snapshot() 的結果
+        
+        Args:
+            snapshot: 指標快照
+            duration_seconds: 執行時間（秒）
+        """
+        counters = snapshot.get("counters", {})
+        self.duration_seconds = round(float(duration_seconds), 3)
+        self.retries = int(counters.get("translation_retries", 0))
+        self.bytes_written = int(counters.get("bytes_written", 0) + counters.get("audio_bytes_written", 0))
+        self.audio_seconds = round(counters.get("audio_seconds", 0.0), 3)
+        self.peak_memory_bytes = snapshot.get("peak_memory_bytes")
+        self.stage_latency = snapshot.get("stages", {})
+        self.caches = snapshot.get("caches", {})
+        self.counters = counters
+        self.usage = snapshot.get("usage", {}) 
\ No newline at end of file
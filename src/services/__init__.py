@@ -7,11 +7,36 @@
 from .arxiv_service import ArxivService
 from .translation_service import TranslationService
 from .audio_service import AudioService
-from .storage_service import StorageService
+from .storage_service import StorageService, create_storage_service
+from .sqlite_storage_service import SQLiteStorageService
+from .sharded_storage_service import ShardedStorageService
+from .site_export_service import SiteExportService
+from .search_index_service import SearchIndexService
+from .feed_service import FeedService
+from .site_build_service import SiteBuildService
+from .metrics_service import MetricsService
+from .run_scheduler import RunScheduler
+from .ranking_service import RankingService
+from .reprocess_service import ReprocessService
+from .audio_backfill_queue import AudioBackfillQueue
+from .gemini_client import get_gemini_client
 
 __all__ = [
     "ArxivService",
     "TranslationService", 
     "AudioService",
-    "StorageService"
+    "StorageService",
+    "SQLiteStorageService",
+    "ShardedStorageService",
+    "SiteExportService",
+    "SearchIndexService",
+    "FeedService",
+    "SiteBuildService",
+    "MetricsService",
+    "RunScheduler",
+    "RankingService",
+    "ReprocessService",
+    "AudioBackfillQueue",
+    "create_storage_service",
+    "get_gemini_client"
 ] 
\ No newline at end of file
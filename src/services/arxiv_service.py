@@ -5,13 +5,17 @@ arXiv 論文抓取服務
 """
 
 import arxiv
-from typing import List, Set
+import time
+from contextlib import closing
+from typing import Dict, Iterator, List, Optional, Set
 from datetime import datetime
 
 from ..core.config import Config
 from ..core.models import Paper
 from ..core.exceptions import ArxivFetchError
+from ..utils.cassette import open_cassette
 from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
 
 logger = get_logger(__name__)
 
@@ -22,80 +26,126 @@ class ArxivService:
     def __init__(self, config: Config = None):
         self.config = config or Config()
         self.client = arxiv.Client()
+        self.cassette = open_cassette(self.config.CASSETTE_DIR, self.config.CASSETTE_MODE,
+                                      self.config.CASSETTE_REALTIME)
     
-    def fetch_papers(self, processed_ids: Set[str]) -> List[Paper]:
+    def fetch_papers(self, processed_ids: Set[str], max_per_query: Optional[int] = None) -> List[Paper]:
         """
         抓取新論文
         
         Args:
-            processed_ids: 已處理的論文ID集合
-            
+            processed_ids: 已處理的論文ID集合（不會被修改）
+            max_per_query: 每個查詢最多抓取的新論文數，預設為 Config.PAPERS_PER_QUERY
+        
         Returns:
-            新論文列表
-            
+            新論文列表（各查詢內由新到舊）
+        
         Raises:
             ArxivFetchError: 抓取失敗時拋出
         """
         papers = []
+        # 同一篇論文可能出現在多個查詢中，只保留第一次出現的
+        seen: Set[str] = set()
+        limit = max_per_query or self.config.PAPERS_PER_QUERY
         
         try:
             for query in self.config.ARXIV_QUERIES:
-                logger.info(f"正在抓取 {query} 相關論文...")
-                query_papers = self._fetch_papers_by_query(query, processed_ids)
+                logger.info("正在抓取 %s 相關論文...", query)
+                query_papers = self._fetch_papers_by_query(query, processed_ids, seen, limit)
                 papers.extend(query_papers)
                 
                 if query_papers:
-                    logger.info(f"從 {query} 抓取到 {len(query_papers)} 篇新論文")
-                
+                    logger.info("從 %s 抓取到 %d 篇新論文", query, len(query_papers))
+        
         except Exception as e:
             raise ArxivFetchError(f"抓取論文時發生錯誤", str(e))
         
-        logger.info(f"總共抓取到 {len(papers)} 篇新論文")
+        logger.info("總共抓取到 %d 篇新論文", len(papers))
         return papers
     
-    def _fetch_papers_by_query(self, query: str, processed_ids: Set[str]) -> List[Paper]:
+    def _fetch_papers_by_query(self, query: str, processed_ids: Set[str], seen: Set[str],
+                               limit: int) -> List[Paper]:
         """
         根據查詢字串抓取論文
         
         Args:
             query: 搜尋關鍵字
             processed_ids: 已處理的論文ID集合
-            
+            seen: 本次已抓取的論文ID（會加入新抓取的ID）
+            limit: 最多抓取的新論文數
+        
         Returns:
             論文列表
         """
         papers = []
+        metrics = get_run_metrics()
         
+        with closing(self._search(query)) as results:
+            for result in results:
+                paper_id = result["id"]
+                
+                # 跳過已處理的論文
+                processed = paper_id in processed_ids
+                metrics.cache("processed_ids", hit=processed)
+                if processed or paper_id in seen:
+                    continue
+                
+                papers.append(Paper(query=query, **result))
+                seen.add(paper_id)
+                
+                if len(papers) >= limit:
+                    break
+        
+        return papers
+    
+    def _search(self, query: str) -> Iterator[Dict]:
+        """
+        依提交日期由新到舊列出搜尋結果
+        
+        啟用錄製時，記錄實際讀取到的結果與耗時；重播時直接回放錄製的結果。
+        
+        Args:
+            query: 搜尋關鍵字
+        
+        Yields:
+            論文欄位（id、url、title、summary、authors、published_date）
+        """
         search = arxiv.Search(
             query=f'"{query}"',
             max_results=self.config.MAX_RESULTS_PER_QUERY,
             sort_by=arxiv.SortCriterion.SubmittedDate
         )
+        request = {"query": search.query, "max_results": search.max_results, "sort_by": "submittedDate"}
         
-        for result in self.client.results(search):
-            paper_id = result.get_short_id()
-            
-            # 跳過已處理的論文
-            if paper_id in processed_ids:
-                continue
-            
-            paper = Paper(
-                query=query,
-                id=paper_id,
-                url=result.entry_id,
-                title=result.title,
-                summary=result.summary,
-                authors=[author.name for author in result.authors],
-                published_date=result.published.strftime("%Y-%m-%d")
-            )
-            
-            papers.append(paper)
-            processed_ids.add(paper_id)
-            
-            # 每個查詢只抓取一篇新論文
-            break
+        if self.cassette.mode == "replay":
+            results, _ = self.cassette.replay("arxiv", request)
+            yield from results
+            return
         
-        return papers
+        consumed = []
+        started = time.perf_counter()
+        recording = self.cassette.mode == "record"
+        try:
+            for result in self.client.results(search):
+                item = {
+                    "id": result.get_short_id(),
+                    "url": result.entry_id,
+                    "title": result.title,
+                    "summary": result.summary,
+                    "authors": [author.name for author in result.authors],
+                    "published_date": result.published.strftime("%Y-%m-%d"),
+                }
+                consumed.append(item)
+                yield item
+        except GeneratorExit:
+            # 呼叫端讀取足夠的結果後關閉，只記錄實際讀取的部分，重播時讀取到相同位置即可
+            if recording:
+                self.cassette.record("arxiv", request, consumed, time.perf_counter() - started)
+            raise
+        
+        # 搜尋失敗時例外直接往外拋出，不會被錄製成較短的正常結果
+        if recording:
+            self.cassette.record("arxiv", request, consumed, time.perf_counter() - started)
     
     def validate_paper(self, paper: Paper) -> bool:
         """
@@ -103,7 +153,7 @@ class ArxivService:
         
         Args:
             paper: 論文物件
-            
+        
         Returns:
             驗證是否通過
         """
@@ -111,11 +161,11 @@ class ArxivService:
         
         for field in required_fields:
             if not getattr(paper, field, None):
-                logger.warning(f"論文 {paper.id} 缺少必要欄位: {field}")
+                logger.warning("論文 %s 缺少必要欄位: %s", paper.id, field)
                 return False
         
         if len(paper.summary) < 50:
-            logger.warning(f"論文 {paper.id} 摘要過短")
+            logger.warning("論文 %s 摘要過短", paper.id)
             return False
         
         return True 
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+補上音訊的論文佇列
+
+更新流程先發布只有文字的論文，之後再補上語音。這裡以小型狀態檔記錄等待補上音訊的論文：
+- 新儲存的論文由 add 加入，補音訊時只讀取佇列中的論文，不需掃描全部資料
+- 每篇論文記錄失敗次數與最後一次失敗的時間，失敗後等待的時間逐次加倍，超過次數上限後不再嘗試
+- 從未嘗試的論文排在一再失敗的論文之前
+
+沒有狀態檔時（第一次使用）才掃描一次既有資料，找出已翻譯但還沒有音訊的論文。
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..core.models import PaperRecord
+from ..utils.file_utils import atomic_write_json, safe_read_json
+from ..utils.logging_utils import get_logger
+from .storage_service import StorageService
+
+logger = get_logger(__name__)
+
+
+class AudioBackfillQueue:
+    """等待補上音訊的論文與各自的失敗紀錄"""
+    
+    STATE_VERSION = 1
+    
+    def __init__(self, config: Config = None, storage: Optional[StorageService] = None):
+        self.config = config or Config()
+        self.storage = storage or StorageService(self.config)
+        self.state_file = self.config.AUDIO_BACKFILL_STATE_FILE
+        self.max_attempts = max(1, self.config.AUDIO_BACKFILL_MAX_ATTEMPTS)
+        self.retry_seconds = self.config.AUDIO_BACKFILL_RETRY_SECONDS
+    
+    def add(self, paper_ids: Iterable[str]) -> None:
+        """
+        將新儲存（尚無音訊）的論文加入佇列
+        
+        Args:
+            paper_ids: 論文ID
+        
+        Raises:
+            StorageError: 寫入狀態檔失敗時拋出
+        """
+        papers = self._load()
+        for paper_id in paper_ids:
+            papers.setdefault(paper_id, {"attempts": 0, "last_error": None})
+        self._save(papers)
+    
+    def select(self) -> List[PaperRecord]:
+        """
+        選出這次要補上音訊的論文
+        
+        略過超過失敗次數上限或仍在等待重試的論文，並移除已有音訊或已不存在的論文。
+        
+        Returns:
+            論文紀錄，從未嘗試的論文在前，其餘依失敗次數由少到多（次數相同時依加入順序）
+        
+        Raises:
+            StorageError: 寫入狀態檔失敗時拋出
+        """
+        papers = self._load()
+        now = time.time()
+        selected, exhausted = [], 0
+        
+        for paper_id, entry in sorted(papers.items(), key=lambda item: item[1]["attempts"]):
+            if entry["attempts"] >= self.max_attempts:
+                exhausted += 1
+                continue
+            # 失敗後等待的時間逐次加倍
+            backoff = self.retry_seconds * 2 ** (entry["attempts"] - 1)
+            if entry["attempts"] and now - entry["last_error"] < backoff:
+                continue
+            
+            paper = self.storage.get_paper_by_id(paper_id)
+            if paper is None or paper.audio:
+                # 論文已有音訊（例如由 reprocess 補上）或已不存在
+                del papers[paper_id]
+                continue
+            selected.append(PaperRecord.from_dict(paper.model_dump()))
+        
+        if exhausted:
+            logger.warning("%d 篇論文補上音訊的失敗次數已達上限（%d 次），不再嘗試", exhausted, self.max_attempts)
+        
+        self._save(papers)
+        return selected
+    
+    def record_results(self, succeeded: Iterable[str], failed: Iterable[str]) -> None:
+        """
+        記錄補上音訊的結果：成功的論文移出佇列，失敗的論文累加失敗次數
+        
+        Args:
+            succeeded: 已補上音訊的論文ID
+            failed: 合成失敗的論文ID
+        
+        Raises:
+            StorageError: 寫入狀態檔失敗時拋出
+        """
+        papers = self._load()
+        for paper_id in succeeded:
+            papers.pop(paper_id, None)
+        
+        now = time.time()
+        for paper_id in failed:
+            entry = papers.setdefault(paper_id, {"attempts": 0, "last_error": None})
+            entry["attempts"] += 1
+            entry["last_error"] = now
+        
+        self._save(papers)
+    
+    def _load(self) -> Dict[str, Dict]:
+        if self.state_file.exists():
+            try:
+                state = safe_read_json(self.state_file)
+                if state.get("version") == self.STATE_VERSION:
+                    return state["papers"]
+            except Exception as e:
+                logger.warning(f"補上音訊的佇列無法讀取，將重新掃描資料: {str(e)}")
+        return self._scan()
+    
+    def _scan(self) -> Dict[str, Dict]:
+        """掃描全部資料，找出已翻譯但還沒有音訊的論文（重複ID以最後寫入的紀錄為準）"""
+        latest: Dict[str, PaperRecord] = {}
+        for record in self.storage.iter_records():
+            latest.pop(record.id, None)
+            latest[record.id] = record
+        
+        papers = {
+            record.id: {"attempts": 0, "last_error": None}
+            for record in latest.values()
+            if record.title_zh and not record.audio
+        }
+        logger.info("已建立補上音訊的佇列，共 %d 篇論文", len(papers))
+        return papers
+    
+    def _save(self, papers: Dict[str, Dict]) -> None:
+        try:
+            atomic_write_json(self.state_file, {"version": self.STATE_VERSION, "papers": papers}, indent=None)
+        except OSError as e:
+            error_msg = f"寫入補上音訊的佇列失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
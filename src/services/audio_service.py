@@ -4,15 +4,22 @@
 使用 Gemini Text-to-Speech 生成中文語音檔案。
 """
 
-from google import genai
 from google.genai import types
+import contextvars
 import wave
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional
 
 from ..core.config import Config
 from ..core.exceptions import AudioGenerationError
+from ..core.models import UsageRecord
+from ..utils.cassette import open_cassette
+from .gemini_client import get_gemini_client
 from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
 
 logger = get_logger(__name__)
 
@@ -27,7 +34,9 @@ class AudioService:
         if not self.config.GEMINI_API_KEY:
             raise AudioGenerationError("GEMINI_API_KEY 環境變數未設定")
         
-        self.client = genai.Client(api_key=self.config.GEMINI_API_KEY)
+        self.client = get_gemini_client(self.config)
+        self.cassette = open_cassette(self.config.CASSETTE_DIR, self.config.CASSETTE_MODE,
+                                      self.config.CASSETTE_REALTIME)
     
     def _save_wave_file(self, filename: str, pcm_data: bytes, channels: int = None, 
                        rate: int = None, sample_width: int = None) -> None:
@@ -46,72 +55,198 @@ class AudioService:
         rate = rate or self.config.TTS_SAMPLE_RATE
         sample_width = sample_width or self.config.TTS_SAMPLE_WIDTH
         
-        with wave.open(filename, "wb") as wf:
+        # 先寫入暫存檔再取代，重新生成時不會留下寫到一半的音訊
+        tmp_filename = f"{filename}.tmp"
+        with wave.open(tmp_filename, "wb") as wf:
             wf.setnchannels(channels)
             wf.setsampwidth(sample_width)
             wf.setframerate(rate)
             wf.writeframes(pcm_data)
+        os.replace(tmp_filename, filename)
     
-    def generate_audio(self, text: str, output_path: Path) -> None:
+    def generate_audio(self, text: str, output_path: Path,
+                       usage: Optional[List[UsageRecord]] = None, voice: Optional[str] = None) -> None:
         """
         生成音訊檔案
         
         Args:
             text: 要轉換的文字
             output_path: 輸出檔案路徑
-            
+            usage: 若提供，將本次呼叫的用量紀錄附加到此列表
+            voice: 語音名稱，預設為 Config.GEMINI_TTS_VOICE
+        
         Raises:
             AudioGenerationError: 音訊生成失敗時拋出
         """
         try:
-            logger.info(f"正在使用 Gemini TTS 生成音訊檔案: {output_path.name}")
+            logger.info("正在使用 Gemini TTS 生成音訊檔案: %s", output_path.name)
             
             # 確保輸出目錄存在
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
             # 使用 Gemini TTS 生成語音
-            response = self.client.models.generate_content(
-                model=self.config.GEMINI_TTS_MODEL,
-                contents=text,
-                config=types.GenerateContentConfig(
-                    response_modalities=["AUDIO"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=self.config.GEMINI_TTS_VOICE,
-                            )
-                        )
-                    ),
-                )
-            )
+            record = UsageRecord(kind="tts", model=self.config.GEMINI_TTS_MODEL, input_chars=len(text))
+            started = time.perf_counter()
+            response = self._synthesize(text, voice or self.config.GEMINI_TTS_VOICE)
+            record.latency_seconds = round(time.perf_counter() - started, 3)
+            record.add_response(response)
             
             # 提取音訊資料
-            if (response.candidates and 
-                response.candidates[0].content and 
-                response.candidates[0].content.parts and
-                response.candidates[0].content.parts[0].inline_data):
-                
-                pcm_data = response.candidates[0].content.parts[0].inline_data.data
+            inline_data = self._inline_data(response)
+            if inline_data is not None and inline_data.data:
+                pcm_data = inline_data.data
                 
                 # 儲存為 WAV 檔案
                 self._save_wave_file(str(output_path), pcm_data)
                 
-                logger.info(f"音訊檔案生成成功: {output_path}")
+                bytes_per_second = self.config.TTS_SAMPLE_RATE * self.config.TTS_CHANNELS * self.config.TTS_SAMPLE_WIDTH
+                record.audio_bytes = output_path.stat().st_size
+                record.audio_seconds = round(len(pcm_data) / bytes_per_second, 3)
+                
+                metrics = get_run_metrics()
+                metrics.incr("audio_seconds", record.audio_seconds)
+                metrics.incr("audio_bytes_written", record.audio_bytes)
+                metrics.record_usage(record.kind, record.model, record.totals())
+                if usage is not None:
+                    usage.append(record)
+                
+                logger.info("音訊檔案生成成功: %s", output_path)
             else:
                 raise AudioGenerationError("無法從 Gemini API 回應中提取音訊資料")
-            
+        
         except Exception as e:
             error_msg = f"生成音訊檔案失敗: {str(e)}"
             logger.error(error_msg)
             raise AudioGenerationError(error_msg, str(e))
     
+    def versions(self) -> Dict[str, str]:
+        """目前的語音合成模型與預設語音（記錄在 Paper 上）"""
+        return {"tts_model": self.config.GEMINI_TTS_MODEL, "tts_voice": self.config.GEMINI_TTS_VOICE}
+    
+    def generate_variants(self, text: str, paper_id: str,
+                          usage: Optional[List[UsageRecord]] = None) -> Dict[Optional[str], Path]:
+        """
+        以同一份旁白文字同時生成預設語音與 Config.TTS_VARIANTS 的各語音版本
+        
+        Args:
+            text: 旁白文字（各版本共用，只需準備一次）
+            paper_id: 論文ID，用於決定各版本的音訊路徑
+            usage: 若提供，依版本順序附加各次呼叫的用量紀錄
+        
+        Returns:
+            版本名稱 → 音訊檔案路徑（預設語音的名稱為 None）；生成失敗的額外版本不會出現在結果中
+        
+        Raises:
+            AudioGenerationError: 預設語音生成失敗時拋出
+        """
+        jobs = {None: (self.config.GEMINI_TTS_VOICE, text)}
+        for name, variant in self.config.TTS_VARIANTS.items():
+            jobs[name] = (variant.get("voice") or self.config.GEMINI_TTS_VOICE, f"{variant.get('style', '')}{text}")
+        
+        def run(name, voice, narration, records):
+            output_path = self.config.get_audio_path(paper_id, name)
+            self.generate_audio(narration, output_path, usage=records, voice=voice)
+            return output_path
+        
+        records = {name: [] for name in jobs}
+        if len(jobs) == 1:
+            paths = {None: run(None, *jobs[None], records[None])}
+        else:
+            workers = max(1, min(len(jobs), self.config.TTS_MAX_WORKERS))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as executor:
+                # 複製目前的日誌上下文，讓各執行緒的日誌帶有相同的論文ID
+                futures = {
+                    name: executor.submit(contextvars.copy_context().run, run, name, voice, narration, records[name])
+                    for name, (voice, narration) in jobs.items()
+                }
+            
+            paths = {}
+            default_error = None
+            for name, future in futures.items():
+                try:
+                    paths[name] = future.result()
+                except AudioGenerationError as e:
+                    if name is None:
+                        default_error = e
+                        continue
+                    get_run_metrics().incr("audio_variant_failures")
+                    logger.warning("語音版本 %s 生成失敗，略過: %s", name, e)
+            
+            if default_error is not None:
+                # 論文不會記錄任何音訊，刪除已寫入的其他版本，避免留下沒有紀錄指向的檔案
+                for path in paths.values():
+                    path.unlink(missing_ok=True)
+                raise default_error
+        
+        if usage is not None:
+            for name in jobs:
+                usage.extend(records[name])
+        
+        return paths
+    
+    def _synthesize(self, text: str, voice: str) -> types.GenerateContentResponse:
+        """呼叫 Gemini TTS 合成語音（啟用卡帶時錄製或重播，音訊以二進位內容另存）"""
+        request = {
+            "model": self.config.GEMINI_TTS_MODEL,
+            "voice": voice,
+            "text": text,
+        }
+        return self.cassette.call(
+            "tts", request,
+            lambda: self.client.models.generate_content(
+                model=self.config.GEMINI_TTS_MODEL,
+                contents=text,
+                config=types.GenerateContentConfig(
+                    response_modalities=["AUDIO"],
+                    speech_config=types.SpeechConfig(
+                        voice_config=types.VoiceConfig(
+                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                                voice_name=voice,
+                            )
+                        )
+                    ),
+                )
+            ),
+            encode=self._encode_response,
+            decode=self._decode_response,
+        )
+    
+    @staticmethod
+    def _inline_data(response: types.GenerateContentResponse) -> Optional[types.Blob]:
+        if (response.candidates and
+            response.candidates[0].content and
+            response.candidates[0].content.parts and
+            response.candidates[0].content.parts[0].inline_data):
+            return response.candidates[0].content.parts[0].inline_data
+        return None
+    
+    def _encode_response(self, response: types.GenerateContentResponse):
+        """將回應拆成 JSON 內容與音訊資料，避免以 base64 存入 JSON"""
+        inline_data = self._inline_data(response)
+        audio = inline_data.data if inline_data else None
+        if inline_data:
+            inline_data.data = None
+        try:
+            payload = response.model_dump(mode="json", exclude_none=True, exclude={"sdk_http_response"})
+        finally:
+            if inline_data:
+                inline_data.data = audio
+        return payload, audio
+    
+    def _decode_response(self, payload: dict, audio: Optional[bytes]) -> types.GenerateContentResponse:
+        response = types.GenerateContentResponse.model_validate(payload)
+        inline_data = self._inline_data(response)
+        if inline_data is not None:
+            inline_data.data = audio
+        return response
+    
     def validate_audio_file(self, file_path: Path) -> bool:
         """
         驗證音訊檔案是否有效
         
         Args:
             file_path: 音訊檔案路徑
-            
+        
         Returns:
             檔案是否有效
         """
@@ -119,7 +254,7 @@ class AudioService:
             return False
         
         if file_path.stat().st_size < 1000:  # 檔案過小
-            logger.warning(f"音訊檔案過小: {file_path}")
+            logger.warning("音訊檔案過小: %s", file_path)
             return False
         
         return True
@@ -130,7 +265,7 @@ class AudioService:
         
         Args:
             text_file_pairs: (文字, 檔案路徑) 配對列表
-            
+        
         Returns:
             成功生成的檔案路徑列表
         """
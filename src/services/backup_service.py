@@ -0,0 +1,338 @@
+"""
+增量備份服務
+
+每次備份只保存上次備份之後附加到資料檔的內容，以 gzip（或 zstd）壓縮，
+並以 manifest 記錄備份鏈，可還原到任一備份時間點。
+音訊檔以內容雜湊存放在共用的內容定址區，同一份音訊只會保存一次。
+"""
+
+import gzip
+import hashlib
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..core.exceptions import StorageError
+from ..utils.file_utils import atomic_write_bytes, atomic_write_json, safe_read_json
+from ..utils.logging_utils import get_logger
+
+try:
+    import zstandard
+except ImportError:  # zstandard 為選用依賴
+    zstandard = None
+
+logger = get_logger(__name__)
+
+
+# 用於判斷資料檔是否只有附加內容的尾端指紋長度
+TAIL_FINGERPRINT_SIZE = 4096
+
+
+class BackupService:
+    """增量備份服務"""
+    
+    MANIFEST_VERSION = 1
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.config = storage.config
+        self.backup_dir = self.config.BACKUP_DIR
+        self.audio_store = self.backup_dir / "audio"
+        self.manifest_file = self.backup_dir / "manifest.json"
+        self.compression = self._resolve_compression(self.config.BACKUP_COMPRESSION)
+    
+    @staticmethod
+    def _resolve_compression(name: str) -> str:
+        if name == "zstd" and zstandard is None:
+            logger.warning("未安裝 zstandard，備份改用 gzip 壓縮")
+            return "gzip"
+        return name
+    
+    def _load_manifest(self) -> Dict:
+        if self.manifest_file.exists():
+            manifest = safe_read_json(self.manifest_file)
+            if manifest.get("version") == self.MANIFEST_VERSION:
+                return manifest
+            logger.warning("備份 manifest 版本不符，將建立新的備份鏈")
+        return {"version": self.MANIFEST_VERSION, "backups": [], "state": {"files": {}, "audio": {}}}
+    
+    def list_backups(self) -> List[Dict]:
+        """列出所有備份（由舊到新）"""
+        return self._load_manifest()["backups"]
+    
+    def create_backup(self, full: bool = False) -> Dict:
+        """
+        建立一個備份
+        
+        Args:
+            full: 是否強制建立完整備份（開始新的備份鏈）
+        
+        Returns:
+            備份紀錄
+        
+        Raises:
+            StorageError: 備份失敗時拋出
+        """
+        try:
+            manifest = self._load_manifest()
+            backups = manifest["backups"]
+            state = manifest["state"]
+            
+            chain_length = 0
+            for backup in reversed(backups):
+                chain_length += 1
+                if backup["type"] == "full":
+                    break
+            
+            if not backups or chain_length >= self.config.BACKUP_FULL_EVERY:
+                full = True
+            
+            backup_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+            record = {
+                "id": backup_id,
+                "created_at": datetime.now().isoformat(),
+                "type": "full" if full else "incremental",
+                "files": [],
+                "audio": {},
+                "audio_removed": [],
+                "bytes": 0,
+            }
+            
+            file_state = {} if full else dict(state["files"])
+            for path in self.storage._backup_files():
+                entry = self._backup_file(backup_id, path, file_state, full)
+                if entry is not None:
+                    record["files"].append(entry)
+                    record["bytes"] += entry["stored_bytes"]
+            
+            audio_state = self._backup_audio(record, state["audio"], full)
+            
+            backups.append(record)
+            manifest["state"] = {"files": file_state, "audio": audio_state}
+            self._apply_retention(manifest)
+            atomic_write_json(self.manifest_file, manifest)
+        
+        except (OSError, ValueError) as e:
+            error_msg = f"資料備份失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(
+            f"已建立{'完整' if full else '增量'}備份 {backup_id}："
+            f"{len(record['files'])} 個資料檔、{len(record['audio'])} 個新音訊、{record['bytes']} bytes"
+        )
+        return record
+    
+    def _backup_file(self, backup_id: str, path: Path, file_state: Dict, full: bool) -> Optional[Dict]:
+        """備份單一資料檔，只保存上次備份後附加的內容"""
+        if not path.exists():
+            return None
+        
+        rel = self._relative(path)
+        size = path.stat().st_size
+        previous = file_state.get(rel)
+        
+        with open(path, "rb") as f:
+            start = 0
+            if not full and previous is not None and size >= previous["end"]:
+                if self._tail_fingerprint(f, previous["end"]) == previous["tail"]:
+                    start = previous["end"]
+            
+            if previous is not None and start == size and not full:
+                return None  # 沒有新內容
+            
+            f.seek(start)
+            data = f.read(size - start)
+            tail = self._tail_fingerprint(f, size)
+        
+        archive_name = f"{backup_id}-{path.name}{self._suffix()}"
+        compressed = self._compress(data)
+        atomic_write_bytes(self.backup_dir / archive_name, compressed)
+        
+        file_state[rel] = {"end": size, "tail": tail}
+        return {
+            "path": rel,
+            "mode": "append" if start else "full",
+            "start": start,
+            "end": size,
+            "archive": archive_name,
+            "stored_bytes": len(compressed),
+        }
+    
+    def _backup_audio(self, record: Dict, audio_state: Dict, full: bool) -> Dict:
+        """以內容雜湊保存新的或變更過的音訊檔"""
+        audio_dir = self.config.AUDIO_DIR
+        new_state = {}
+        
+        current = {path.name: path for path in audio_dir.glob("*.wav")} if audio_dir.exists() else {}
+        
+        for name, path in sorted(current.items()):
+            stat = path.stat()
+            cached = audio_state.get(name)
+            if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+                digest = cached["sha256"]
+            else:
+                digest = self._hash_file(path)
+            
+            new_state[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            
+            if full or cached is None or cached["sha256"] != digest:
+                record["audio"][name] = digest
+                blob = self.audio_store / f"{digest}.wav"
+                if not blob.exists():
+                    blob.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(path, blob)
+                    record["bytes"] += stat.st_size
+        
+        if not full:
+            record["audio_removed"] = sorted(set(audio_state) - set(current))
+        
+        return new_state
+    
+    def restore(self, at: Optional[datetime] = None, backup_id: Optional[str] = None,
+                target_dir: Optional[Path] = None) -> Dict:
+        """
+        還原到指定時間點的備份
+        
+        Args:
+            at: 還原到此時間點之前最後一個備份，預設為最新備份
+            backup_id: 指定備份ID（優先於 at）
+            target_dir: 還原目標根目錄，預設為專案根目錄
+        
+        Returns:
+            被還原的備份紀錄
+        
+        Raises:
+            StorageError: 找不到備份或還原失敗時拋出
+        """
+        backups = self.list_backups()
+        candidates = [
+            backup for backup in backups
+            if (backup_id is None or backup["id"] == backup_id)
+            and (at is None or datetime.fromisoformat(backup["created_at"]) <= at)
+        ]
+        if not candidates:
+            raise StorageError("找不到符合條件的備份")
+        
+        target = candidates[-1]
+        chain = self._chain_for(backups, target)
+        root = target_dir or self.config.BASE_DIR
+        
+        try:
+            files: Dict[str, bytearray] = {}
+            audio: Dict[str, str] = {}
+            
+            for backup in chain:
+                for entry in backup["files"]:
+                    data = self._decompress((self.backup_dir / entry["archive"]).read_bytes())
+                    if entry["mode"] == "full":
+                        files[entry["path"]] = bytearray(data)
+                    else:
+                        content = files.setdefault(entry["path"], bytearray())
+                        if len(content) != entry["start"]:
+                            raise ValueError(f"備份鏈不連續: {entry['path']}")
+                        content.extend(data)
+                audio.update(backup["audio"])
+                for name in backup.get("audio_removed", []):
+                    audio.pop(name, None)
+            
+            for rel, content in files.items():
+                atomic_write_bytes(root / rel, bytes(content))
+            
+            if target_dir is None:
+                # 還原時間點之後才出現的資料檔（例如新的分片）一併移除
+                for path in self.storage._backup_files():
+                    if path.exists() and self._relative(path) not in files:
+                        path.unlink()
+            
+            audio_dir = root / self._relative(self.config.AUDIO_DIR)
+            audio_dir.mkdir(parents=True, exist_ok=True)
+            for name, digest in audio.items():
+                destination = audio_dir / name
+                if not destination.exists() or self._hash_file(destination) != digest:
+                    shutil.copy2(self.audio_store / f"{digest}.wav", destination)
+        
+        except (OSError, ValueError) as e:
+            error_msg = f"資料還原失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        if target_dir is None:
+            self.storage._after_restore()
+        
+        logger.info(f"已還原備份 {target['id']}（{target['created_at']}），共 {len(files)} 個資料檔、{len(audio)} 個音訊")
+        return target
+    
+    @staticmethod
+    def _chain_for(backups: List[Dict], target: Dict) -> List[Dict]:
+        """取得從完整備份到目標備份的備份鏈"""
+        index = backups.index(target)
+        start = index
+        while start > 0 and backups[start]["type"] != "full":
+            start -= 1
+        return backups[start:index + 1]
+    
+    def _apply_retention(self, manifest: Dict) -> None:
+        """只保留最近 BACKUP_RETENTION 個備份（以及它們依賴的備份鏈）"""
+        backups = manifest["backups"]
+        retention = max(1, self.config.BACKUP_RETENTION)
+        if len(backups) <= retention:
+            return
+        
+        # 從最舊的保留備份往前找到它所屬備份鏈的起點
+        keep_from = len(backups) - retention
+        while keep_from > 0 and backups[keep_from]["type"] != "full":
+            keep_from -= 1
+        
+        expired, manifest["backups"] = backups[:keep_from], backups[keep_from:]
+        if not expired:
+            return
+        
+        for backup in expired:
+            for entry in backup["files"]:
+                (self.backup_dir / entry["archive"]).unlink(missing_ok=True)
+        
+        referenced = {digest for backup in manifest["backups"] for digest in backup["audio"].values()}
+        referenced.update(item["sha256"] for item in manifest["state"]["audio"].values())
+        for blob in self.audio_store.glob("*.wav"):
+            if blob.stem not in referenced:
+                blob.unlink()
+        
+        logger.info(f"已依保留政策刪除 {len(expired)} 個舊備份")
+    
+    def _relative(self, path: Path) -> str:
+        try:
+            return path.resolve().relative_to(self.config.BASE_DIR.resolve()).as_posix()
+        except ValueError:
+            return path.name
+    
+    @staticmethod
+    def _tail_fingerprint(f, end: int) -> str:
+        start = max(0, end - TAIL_FINGERPRINT_SIZE)
+        f.seek(start)
+        return hashlib.sha256(f.read(end - start)).hexdigest()
+    
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _suffix(self) -> str:
+        return ".zst" if self.compression == "zstd" else ".gz"
+    
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data, compresslevel=6)
+    
+    @staticmethod
+    def _decompress(data: bytes) -> bytes:
+        if data[:4] == b"\x28\xb5\x2f\xfd":  # zstd 魔術字
+            if zstandard is None:
+                raise ValueError("還原 zstd 備份需要安裝 zstandard")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
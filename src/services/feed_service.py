@@ -0,0 +1,325 @@
+"""
+RSS／Podcast 訂閱源產生服務
+
+每篇論文只在第一次出現時渲染為 ``<item>`` 片段，片段中已包含音訊的
+位元組長度與播放時間，之後直接重用快取的片段而不再讀取音訊檔。
+輸出內容：
+- ``feed.xml``：最新 FEED_WINDOW_SIZE 篇論文的訂閱源
+- ``feeds/archive-NNNN.xml``：每 FEED_ARCHIVE_SIZE 篇一個的封存訂閱源（RFC 5005），寫滿後不再改動
+
+唯一的例外是音訊移出公開目錄時（prune-audio），以 remove_enclosures 移除項目中失效的音訊連結。
+"""
+
+import re
+import wave
+from datetime import datetime
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape, quoteattr, unescape
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..utils.file_utils import atomic_write_bytes, atomic_write_json, safe_read_json
+from ..utils.logging_utils import get_logger
+from .storage_service import StorageService
+
+logger = get_logger(__name__)
+
+_ITEM_PATTERN = re.compile(r"<item>.*?</item>", re.DOTALL)
+_GUID_PATTERN = re.compile(r'<guid isPermaLink="false">arxiv-(.*?)</guid>')
+_ENCLOSURE_PATTERN = re.compile(r"<enclosure [^>]*/><itunes:duration>[^<]*</itunes:duration>")
+
+
+class FeedService:
+    """增量產生 RSS 與 Podcast 訂閱源"""
+    
+    STATE_VERSION = 1
+    FEED_TITLE = "arXiv AI 論文摘要"
+    FEED_DESCRIPTION = "每小時更新的 arXiv AI 論文中文摘要與語音導讀。"
+    
+    def __init__(self, config: Config = None, storage: Optional[StorageService] = None):
+        self.config = config or Config()
+        self.storage = storage or StorageService(self.config)
+        self.site_url = self.config.SITE_URL.rstrip("/") + "/"
+        self.site_root = self.config.DATA_DIR.parent
+        self.window_size = max(1, self.config.FEED_WINDOW_SIZE)
+        self.archive_size = max(1, self.config.FEED_ARCHIVE_SIZE)
+        self.state_file = self.config.FEED_STATE_FILE
+    
+    def update(self, papers: Iterable) -> int:
+        """
+        將新儲存的論文加入訂閱源；尚未產生過訂閱源時改為處理全部資料
+        
+        Args:
+            papers: 論文（Paper、PaperRecord 或 dict），由舊到新
+        
+        Returns:
+            新增的項目數量
+        """
+        state = self._load_state()
+        if state is None:
+            return self.rebuild()
+        return self._add(state, papers)
+    
+    def rebuild(self) -> int:
+        """
+        依全部資料重新產生訂閱源與封存訂閱源
+        
+        Returns:
+            項目數量
+        """
+        for path in self.config.FEED_ARCHIVE_DIR.glob("archive-*.xml"):
+            path.unlink()
+        return self._add(self._new_state(), self._unique_records())
+    
+    def _unique_records(self) -> List[Dict]:
+        """依寫入順序取得論文，重複ID以最後寫入的紀錄為準"""
+        latest: Dict[str, Dict] = {}
+        for record in self.storage.iter_records():
+            data = record.to_dict()
+            latest.pop(data["id"], None)
+            latest[data["id"]] = data
+        return list(latest.values())
+    
+    def _add(self, state: Dict, papers: Iterable) -> int:
+        """渲染新論文的項目並寫出受影響的訂閱源"""
+        items = state["items"]
+        known = {item["id"] for item in items}
+        added = 0
+        
+        try:
+            for paper in papers:
+                data = paper if isinstance(paper, dict) else (
+                    paper.to_dict() if hasattr(paper, "to_dict") else paper.model_dump()
+                )
+                # 訂閱源的項目寫出後不再改動，等音訊生成後才加入；音訊已移出公開目錄的論文不加入
+                if not data.get("id") or data["id"] in known or not self._published(data.get("audio")):
+                    continue
+                
+                items.append({"id": data["id"], "xml": self.render_item(data)})
+                known.add(data["id"])
+                state["unarchived"] += 1
+                added += 1
+                
+                # 累積滿一個封存單位就寫出封存訂閱源，之後不再改動
+                if state["unarchived"] == self.archive_size:
+                    state["archives"] += 1
+                    self._write_archive(state["archives"], items[-self.archive_size:])
+                    state["unarchived"] = 0
+            
+            if not added and self.config.FEED_FILE.exists():
+                return 0
+            
+            # 只保留組成最新訂閱源與下一個封存單位需要的片段
+            keep = max(self.window_size, state["unarchived"])
+            state["items"] = items[-keep:]
+            
+            self._write_feed(state)
+            atomic_write_json(self.state_file, state, indent=None)
+        
+        except OSError as e:
+            error_msg = f"產生訂閱源失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(f"訂閱源已新增 {added} 個項目（封存 {state['archives']} 個）")
+        return added
+    
+    def render_item(self, data: Dict) -> str:
+        """
+        將論文渲染為 RSS ``<item>`` 片段
+        
+        Args:
+            data: 論文資料
+        
+        Returns:
+            XML 片段
+        """
+        authors = data.get("authors") or []
+        if isinstance(authors, list):
+            authors = "、".join(authors)
+        
+        description = data.get("summary_zh") or data.get("summary") or ""
+        applications = data.get("applications") or []
+        if applications:
+            description += "\n\n生活化應用場景：\n" + "\n".join(f"- {app}" for app in applications)
+        
+        parts = [
+            "<item>",
+            f"<title>{escape(data.get('title_zh') or data.get('title') or '')}</title>",
+            f"<link>{escape(data.get('url') or '')}</link>",
+            f"<guid isPermaLink=\"false\">arxiv-{escape(data['id'])}</guid>",
+            f"<pubDate>{self._pub_date(data)}</pubDate>",
+            f"<description>{escape(description)}</description>",
+            f"<itunes:author>{escape(authors)}</itunes:author>",
+        ]
+        
+        enclosure = self._enclosure(data.get("audio"))
+        if enclosure is not None:
+            url, length, duration = enclosure
+            parts.append(f"<enclosure url={quoteattr(url)} length=\"{length}\" type=\"audio/wav\"/>")
+            parts.append(f"<itunes:duration>{duration}</itunes:duration>")
+        
+        parts.append("</item>")
+        return "".join(parts)
+    
+    def remove_enclosures(self, paper_ids: Iterable[str]) -> int:
+        """
+        移除指定論文項目中的音訊連結（音訊移出公開目錄後使用）
+        
+        項目保留在訂閱源與封存訂閱源中，只移除會變成失效連結的 ``<enclosure>``；
+        只有含有這些論文的封存訂閱源會被改寫。
+        
+        Args:
+            paper_ids: 音訊已移出公開目錄的論文ID
+        
+        Returns:
+            改寫的項目數量（同時出現在 feed.xml 與封存訂閱源的項目分別計算）
+        
+        Raises:
+            StorageError: 寫入訂閱源失敗時拋出
+        """
+        paper_ids = set(paper_ids)
+        state = self._load_state()
+        if not paper_ids or state is None:
+            return 0
+        
+        removed = 0
+        
+        def strip(xml: str) -> str:
+            nonlocal removed
+            match = _GUID_PATTERN.search(xml)
+            if match is None or unescape(match.group(1)) not in paper_ids:
+                return xml
+            stripped = _ENCLOSURE_PATTERN.sub("", xml)
+            if stripped != xml:
+                removed += 1
+            return stripped
+        
+        try:
+            for path in sorted(self.config.FEED_ARCHIVE_DIR.glob("archive-*.xml")):
+                content = path.read_text(encoding="utf-8")
+                stripped = _ITEM_PATTERN.sub(lambda match: strip(match.group(0)), content)
+                if stripped != content:
+                    atomic_write_bytes(path, stripped.encode("utf-8"))
+            
+            window_changed = False
+            for item in state["items"]:
+                xml = strip(item["xml"])
+                if xml != item["xml"]:
+                    item["xml"] = xml
+                    window_changed = True
+            
+            if window_changed:
+                self._write_feed(state)
+                atomic_write_json(self.state_file, state, indent=None)
+        
+        except OSError as e:
+            error_msg = f"移除訂閱源音訊連結失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(f"已移除 {removed} 個訂閱源項目的音訊連結")
+        return removed
+    
+    def _published(self, audio: Optional[str]) -> bool:
+        """音訊是否位於公開目錄中（封存區的音訊不會部署，不能作為訂閱源的連結）"""
+        if not audio:
+            return False
+        path = (self.config.BASE_DIR / audio).resolve()
+        return path.is_relative_to(self.site_root.resolve()) and path.exists()
+    
+    def _enclosure(self, audio: Optional[str]) -> Optional[tuple]:
+        """取得音訊網址、位元組長度與播放時間（只在第一次渲染時讀取檔案）"""
+        if not self._published(audio):
+            return None
+        
+        path = self.config.BASE_DIR / audio
+        
+        try:
+            with wave.open(str(path), "rb") as wav:
+                seconds = int(round(wav.getnframes() / wav.getframerate()))
+        except (wave.Error, EOFError, ZeroDivisionError) as e:
+            logger.warning(f"無法讀取音訊長度: {path} - {str(e)}")
+            seconds = 0
+        
+        duration = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        return self._url(path), path.stat().st_size, duration
+    
+    def _url(self, path: Path) -> str:
+        try:
+            return self.site_url + path.relative_to(self.site_root).as_posix()
+        except ValueError:
+            return self.site_url + path.name
+    
+    @staticmethod
+    def _pub_date(data: Dict) -> str:
+        for value in (data.get("timestamp"), data.get("published_date")):
+            if not value:
+                continue
+            try:
+                return format_datetime(datetime.fromisoformat(value).astimezone())
+            except ValueError:
+                continue
+        return format_datetime(datetime.now().astimezone())
+    
+    def _archive_path(self, number: int) -> Path:
+        return self.config.FEED_ARCHIVE_DIR / f"archive-{number:04d}.xml"
+    
+    def _write_archive(self, number: int, items: List[Dict]) -> None:
+        links = [
+            ("current", self._url(self.config.FEED_FILE)),
+            ("self", self._url(self._archive_path(number))),
+        ]
+        if number > 1:
+            links.append(("prev-archive", self._url(self._archive_path(number - 1))))
+        
+        atomic_write_bytes(self._archive_path(number), self._render_channel(items, links, archive=True))
+    
+    def _write_feed(self, state: Dict) -> None:
+        links = [("self", self._url(self.config.FEED_FILE))]
+        if state["archives"]:
+            links.append(("prev-archive", self._url(self._archive_path(state["archives"]))))
+        
+        items = state["items"][-self.window_size:]
+        atomic_write_bytes(self.config.FEED_FILE, self._render_channel(items, links))
+    
+    def _render_channel(self, items: List[Dict], links: List[tuple], archive: bool = False) -> bytes:
+        """組合頻道資訊與項目片段（由新到舊）"""
+        header = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"'
+            ' xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"'
+            ' xmlns:fh="http://purl.org/syndication/history/1.0">',
+            "<channel>",
+            f"<title>{escape(self.FEED_TITLE)}</title>",
+            f"<link>{escape(self.site_url)}</link>",
+            f"<description>{escape(self.FEED_DESCRIPTION)}</description>",
+            "<language>zh-tw</language>",
+            f"<lastBuildDate>{format_datetime(datetime.now().astimezone())}</lastBuildDate>",
+            f"<itunes:author>{escape(self.FEED_TITLE)}</itunes:author>",
+            '<itunes:category text="Technology"/>',
+            "<itunes:explicit>false</itunes:explicit>",
+        ]
+        header.extend(f"<atom:link rel=\"{rel}\" href={quoteattr(href)}/>" for rel, href in links)
+        if archive:
+            header.append("<fh:archive/>")
+        
+        body = [item["xml"] for item in reversed(items)]
+        footer = ["</channel>", "</rss>", ""]
+        return "\n".join(header + body + footer).encode("utf-8")
+    
+    def _new_state(self) -> Dict:
+        return {"version": self.STATE_VERSION, "archives": 0, "unarchived": 0, "items": []}
+    
+    def _load_state(self) -> Optional[Dict]:
+        if not self.state_file.exists():
+            return None
+        try:
+            state = safe_read_json(self.state_file)
+            if state.get("version") == self.STATE_VERSION:
+                return state
+        except Exception as e:
+            logger.warning(f"訂閱源狀態無法讀取，將重新產生: {str(e)}")
+        return None
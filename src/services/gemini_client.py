@@ -0,0 +1,96 @@
+"""
+共用的 Gemini 客戶端
+
+翻譯與語音合成服務原本各自建立 genai.Client，各有一個連線池，第一次呼叫都要重新建立 TLS 連線。
+這裡依 API 金鑰在整個程序中共用同一個客戶端：
+- 連線池大小、閒置連線保留時間與逾時可依同時進行的請求數調整
+- 可選擇在背景預先建立連線（與 arXiv 抓取同時進行），降低第一批請求的延遲
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import httpx
+from google import genai
+from google.genai import types
+
+from ..core.config import Config
+from ..core.exceptions import ConfigurationError
+from ..utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+_clients: Dict[str, genai.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def get_gemini_client(config: Config = None) -> genai.Client:
+    """
+    取得共用的 Gemini 客戶端（同一 API 金鑰只建立一次）
+    
+    Args:
+        config: 配置，第一次建立客戶端時決定連線池與逾時設定
+    
+    Returns:
+        Gemini 客戶端
+    
+    Raises:
+        ConfigurationError: 未設定 GEMINI_API_KEY 時拋出
+    """
+    config = config or Config()
+    api_key = config.GEMINI_API_KEY
+    if not api_key:
+        raise ConfigurationError("GEMINI_API_KEY 未設定")
+    
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _create_client(config)
+            _clients[api_key] = client
+            
+            # 重播卡帶時不會連線到 Gemini，不需要預熱
+            if config.GEMINI_WARMUP_CONNECTIONS > 0 and config.CASSETTE_MODE != "replay":
+                threading.Thread(
+                    target=_warm_up, args=(client, config), name="gemini-warmup", daemon=True
+                ).start()
+        return client
+
+
+def _create_client(config: Config) -> genai.Client:
+    """建立具有指定連線池與逾時設定的客戶端"""
+    pool_size = max(1, config.GEMINI_POOL_SIZE)
+    http_options = types.HttpOptions(
+        # HttpOptions 的逾時單位為毫秒
+        timeout=int(config.GEMINI_TIMEOUT_SECONDS * 1000),
+        client_args={
+            "limits": httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=config.GEMINI_KEEPALIVE_SECONDS,
+            ),
+        },
+    )
+    logger.info(
+        "建立 Gemini 客戶端（連線池 %d、逾時 %.0f 秒、閒置連線保留 %.0f 秒）",
+        pool_size, config.GEMINI_TIMEOUT_SECONDS, config.GEMINI_KEEPALIVE_SECONDS
+    )
+    return genai.Client(api_key=config.GEMINI_API_KEY, http_options=http_options)
+
+
+def _warm_up(client: genai.Client, config: Config) -> None:
+    """同時送出數個輕量請求（查詢模型資訊），預先建立連線池中的連線"""
+    connections = min(config.GEMINI_WARMUP_CONNECTIONS, max(1, config.GEMINI_POOL_SIZE))
+    started = time.perf_counter()
+    
+    def ping(_):
+        client.models.get(model=config.GEMINI_MODEL)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="gemini-warmup") as executor:
+            list(executor.map(ping, range(connections)))
+        logger.info("已預熱 %d 個 Gemini 連線，耗時 %.2f 秒", connections, time.perf_counter() - started)
+    except Exception as e:
+        # 預熱失敗不影響實際請求，實際請求會自行建立連線
+        logger.warning(f"預熱 Gemini 連線失敗: {str(e)}")
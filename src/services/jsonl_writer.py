@@ -0,0 +1,231 @@
+"""
+JSONL 批次寫入器
+
+將多筆論文紀錄累積後一次附加到 JSONL 檔案，每批只呼叫一次 fsync，
+並確保中斷的寫入不會在檔案中留下半行 JSON。
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ..core.models import Paper
+from ..core.exceptions import StorageError
+from ..utils.json_utils import fast_loads, JSONDecodeError
+from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
+from .paper_index import PaperIndex
+
+logger = get_logger(__name__)
+
+
+class JsonlWriter:
+    """群組提交的 JSONL 寫入器
+    
+    使用方式::
+        
+        with JsonlWriter(path) as writer:
+            writer.write(paper)
+    
+    離開 context 時會寫出剩餘的緩衝資料並關閉檔案。
+    """
+    
+    def __init__(self, path: Path, index: Optional[PaperIndex] = None,
+                 batch_size: int = 32, fsync: bool = True):
+        self.path = path
+        self.index = index
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+        self._buffer: List[tuple] = []
+        self._fd: Optional[int] = None
+        self.records_written = 0
+        self.bytes_written = 0
+    
+    def __enter__(self) -> "JsonlWriter":
+        self.open()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # 已完整序列化的紀錄即使發生例外也寫出，避免遺失已完成的工作
+        try:
+            self.flush()
+        finally:
+            self.close()
+    
+    def open(self) -> None:
+        """開啟檔案並修復上次中斷留下的不完整尾端"""
+        if self._fd is not None:
+            return
+        
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            self._fd = os.open(self.path, flags, 0o644)
+            self._repair_tail()
+        except OSError as e:
+            error_msg = f"開啟資料檔失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+    
+    def close(self) -> None:
+        """關閉檔案"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    
+    def write(self, paper: Paper) -> None:
+        """
+        將論文加入寫入緩衝，緩衝滿時自動寫出
+        
+        Args:
+            paper: 論文物件
+        """
+        line = (json.dumps(paper.model_dump(), ensure_ascii=False) + "\n").encode("utf-8")
+        self._buffer.append((paper.id, paper.published_date, line))
+        
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> None:
+        """
+        以單次寫入附加所有緩衝紀錄並 fsync
+        
+        Raises:
+            StorageError: 寫入失敗時拋出（檔案會回復到寫入前的狀態）
+        """
+        if not self._buffer:
+            return
+        
+        self.open()
+        
+        batch, self._buffer = self._buffer, []
+        data = b"".join(line for _, _, line in batch)
+        start = os.fstat(self._fd).st_size
+        
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+            if self.fsync:
+                os.fsync(self._fd)
+        except OSError as e:
+            # 截斷回寫入前的大小，避免留下半行資料
+            try:
+                os.ftruncate(self._fd, start)
+            except OSError:
+                pass
+            error_msg = f"寫入論文資料失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        self.records_written += len(batch)
+        self.bytes_written += len(data)
+        get_run_metrics().incr("bytes_written", len(data))
+        logger.debug("已批次寫入 %d 筆論文資料 (%d bytes)", len(batch), len(data))
+        
+        self._update_index(batch, start)
+    
+    def _update_index(self, batch: List[tuple], start: int) -> None:
+        """將剛寫入的紀錄加入位移索引（索引可自動重建，失敗只記錄警告）"""
+        if self.index is None:
+            return
+        
+        try:
+            offset = start
+            for paper_id, published_date, line in batch:
+                self.index.add(paper_id, offset, len(line), published_date)
+                offset += len(line)
+        except Exception as e:
+            logger.warning(f"更新論文索引失敗: {str(e)}")
+    
+    def _repair_tail(self) -> None:
+        """若檔案結尾不是換行，截斷到最後一個完整行"""
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            return
+        
+        with open(self.path, "rb") as f:
+            position = size
+            block_size = 4096
+            while position > 0:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                block = f.read(read_size)
+                if position + read_size == size and block.endswith(b"\n"):
+                    return
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    keep = position + newline + 1
+                    break
+            else:
+                keep = 0
+        
+        logger.warning(f"資料檔尾端有不完整的紀錄，截斷 {size - keep} bytes: {self.path}")
+        os.ftruncate(self._fd, keep)
+
+
+def compact_jsonl(path: Path) -> Tuple[int, int]:
+    """
+    移除 JSONL 檔案中重複ID的紀錄，每個ID只保留最後一筆
+    
+    以兩次串流掃描完成：第一次只記錄每個ID最後出現的行號，
+    第二次寫出保留的行並以原子方式取代原檔。無法解析的行會原樣保留。
+    
+    Args:
+        path: JSONL 檔案路徑
+        
+    Returns:
+        (保留的紀錄數, 移除的紀錄數)
+        
+    Raises:
+        StorageError: 壓縮失敗時拋出
+    """
+    last_line = {}
+    
+    try:
+        with open(path, "rb") as f:
+            for line_num, line in enumerate(f):
+                try:
+                    paper_id = fast_loads(line).get("id") if line.strip() else None
+                except (JSONDecodeError, AttributeError):
+                    paper_id = None
+                if paper_id is not None:
+                    last_line[paper_id] = line_num
+        
+        keep = set(last_line.values())
+        kept = removed = 0
+        tmp_file = path.with_name(path.name + ".tmp")
+        
+        with open(path, "rb") as src, open(tmp_file, "wb") as dst:
+            for line_num, line in enumerate(src):
+                if not line.strip():
+                    continue
+                if line_num in keep or not _has_id(line):
+                    dst.write(line if line.endswith(b"\n") else line + b"\n")
+                    kept += 1
+                else:
+                    removed += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+        
+        if removed:
+            os.replace(tmp_file, path)
+        else:
+            tmp_file.unlink()
+        
+        return kept, removed
+        
+    except OSError as e:
+        error_msg = f"壓縮資料檔失敗: {str(e)}"
+        logger.error(error_msg)
+        raise StorageError(error_msg, str(e))
+
+
+def _has_id(line: bytes) -> bool:
+    try:
+        return fast_loads(line).get("id") is not None
+    except (JSONDecodeError, AttributeError):
+        return False
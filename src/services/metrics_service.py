@@ -0,0 +1,212 @@
+"""
+執行指標輸出服務
+
+每次更新結束時輸出機器可讀的執行指標：
+- ``last_run.json``：完整的 NewsUpdate 統計（含各階段延遲直方圖與快取命中率）
+- ``last_run.prom``：Prometheus 文字格式，可交給 node_exporter textfile collector 或 pushgateway
+- ``history.jsonl``：每次執行一行的歷史紀錄，用於比較吞吐量是否退化
+"""
+
+import json
+import statistics
+from typing import Dict, List, Optional
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..core.models import NewsUpdate
+from ..utils.file_utils import atomic_write_bytes, iter_lines_reverse
+from ..utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class MetricsService:
+    """執行指標輸出與歷史比較"""
+    
+    PREFIX = "ainews"
+    # 與近期執行比較時使用的歷史筆數
+    COMPARE_RUNS = 20
+    
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        self.metrics_dir = self.config.METRICS_DIR
+        self.history_file = self.config.METRICS_HISTORY_FILE
+        self.history_limit = max(1, self.config.METRICS_HISTORY_LIMIT)
+    
+    def write(self, stats: NewsUpdate) -> None:
+        """
+        輸出本次執行的指標並比較近期吞吐量
+        
+        Args:
+            stats: 本次執行的統計
+        
+        Raises:
+            StorageError: 寫入失敗時拋出
+        """
+        record = stats.model_dump()
+        record["success_rate"] = round(stats.success_rate, 4)
+        record["papers_per_minute"] = round(stats.papers_per_minute, 3)
+        
+        # 先讀取歷史再附加本次紀錄，比較時不包含本次執行
+        history = self.recent_runs(self.COMPARE_RUNS)
+        
+        try:
+            atomic_write_bytes(
+                self.metrics_dir / "last_run.json",
+                json.dumps(record, ensure_ascii=False, indent=2).encode("utf-8"),
+            )
+            atomic_write_bytes(self.metrics_dir / "last_run.prom", self.render_prometheus(record).encode("utf-8"))
+            self._append_history(record)
+        
+        except OSError as e:
+            error_msg = f"寫入執行指標失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        self.compare(record, history)
+    
+    def render_prometheus(self, record: Dict) -> str:
+        """
+        將指標轉為 Prometheus 文字格式
+        
+        Args:
+            record: ``write`` 產生的指標紀錄
+        
+        Returns:
+            Prometheus exposition 格式的文字
+        """
+        prefix = self.PREFIX
+        lines: List[str] = []
+        
+        gauges = [
+            ("papers_fetched", record["total_fetched"], "本次抓取的論文數"),
+            ("papers_translated", record["successfully_translated"], "成功翻譯的論文數"),
+            ("papers_failed", record["failed_translations"], "處理失敗的論文數"),
+            ("audio_generated", record["audio_generated"], "成功生成音訊的論文數"),
+            ("success_ratio", record["success_rate"], "成功率"),
+            ("run_duration_seconds", record["duration_seconds"], "執行時間"),
+            ("papers_per_minute", record["papers_per_minute"], "吞吐量"),
+            ("retries", record["retries"], "API 重試次數"),
+            ("bytes_written", record["bytes_written"], "寫入的位元組數"),
+            ("audio_seconds", record["audio_seconds"], "生成的音訊長度"),
+            ("peak_memory_bytes", record["peak_memory_bytes"], "記憶體使用峰值"),
+        ]
+        for name, value, description in gauges:
+            if value is None:
+                continue
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {self._number(value)}")
+        
+        stages = record.get("stage_latency") or {}
+        if stages:
+            name = f"{prefix}_stage_duration_seconds"
+            lines.append(f"# HELP {name} 各階段耗時")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in stages.items():
+                for bound, count in histogram["buckets"].items():
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {self._number(histogram["sum"])}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram["count"]}')
+        
+        caches = record.get("caches") or {}
+        if caches:
+            for kind in ("hits", "misses"):
+                name = f"{prefix}_cache_{kind}_total"
+                lines.append(f"# HELP {name} 快取{'命中' if kind == 'hits' else '未命中'}次數")
+                lines.append(f"# TYPE {name} counter")
+                for cache, values in caches.items():
+                    lines.append(f'{name}{{cache="{cache}"}} {values[kind]}')
+        
+        usage = record.get("usage") or {}
+        if usage:
+            series = [
+                ("api_calls_total", "calls", "API 呼叫次數"),
+                ("api_prompt_tokens_total", "prompt_tokens", "輸入 token 數"),
+                ("api_output_tokens_total", "output_tokens", "輸出 token 數"),
+                ("api_input_chars_total", "input_chars", "輸入字元數"),
+                ("api_latency_seconds_total", "latency_seconds", "API 呼叫耗時"),
+                ("api_retries_total", "retries", "API 重試次數"),
+            ]
+            for suffix, field, description in series:
+                name = f"{prefix}_{suffix}"
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+                for key, totals in usage.items():
+                    kind, _, model = key.partition(":")
+                    lines.append(f'{name}{{kind="{kind}",model="{model}"}} {self._number(totals.get(field, 0))}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def recent_runs(self, limit: int) -> List[Dict]:
+        """
+        讀取最近的執行紀錄（由新到舊）
+        
+        Args:
+            limit: 最多讀取的筆數
+        
+        Returns:
+            執行紀錄列表
+        """
+        runs = []
+        if not self.history_file.exists():
+            return runs
+        
+        for line in iter_lines_reverse(self.history_file):
+            if len(runs) >= limit:
+                break
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+        return runs
+    
+    def compare(self, record: Dict, history: List[Dict]) -> Optional[float]:
+        """
+        將本次吞吐量與近期執行的中位數比較，明顯退化時發出警告
+        
+        Args:
+            record: 本次的指標紀錄
+            history: 近期的執行紀錄
+        
+        Returns:
+            本次吞吐量相對於中位數的比例，無法比較時返回 None
+        """
+        if not record.get("successfully_translated"):
+            return None
+        
+        previous = [run["papers_per_minute"] for run in history if run.get("papers_per_minute")]
+        if not previous:
+            return None
+        
+        median = statistics.median(previous)
+        ratio = record["papers_per_minute"] / median
+        message = (
+            f"吞吐量 {record['papers_per_minute']:.2f} 篇/分鐘，"
+            f"近 {len(previous)} 次執行的中位數為 {median:.2f}（{ratio:.0%}）"
+        )
+        if ratio < self.config.METRICS_REGRESSION_RATIO:
+            logger.warning(f"吞吐量明顯下降：{message}")
+        else:
+            logger.info(message)
+        return ratio
+    
+    def _append_history(self, record: Dict) -> None:
+        """附加一行歷史紀錄，超過保留筆數時截斷最舊的紀錄"""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.history_file, "ab") as f:
+            f.write(line)
+        
+        # 允許多出 10% 再截斷，避免每次執行都重寫整個檔案
+        if self.history_file.stat().st_size < len(line) * self.history_limit:
+            return
+        lines = self.history_file.read_bytes().splitlines(keepends=True)
+        if len(lines) > self.history_limit * 1.1:
+            atomic_write_bytes(self.history_file, b"".join(lines[-self.history_limit:]))
+    
+    @staticmethod
+    def _number(value) -> str:
+        if isinstance(value, float):
+            return repr(round(value, 6))
+        return str(value)
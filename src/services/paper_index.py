@@ -0,0 +1,299 @@
+"""
+論文位移索引
+
+為 news.jsonl 維護一個側邊索引檔，記錄每篇論文 ID 對應的位元組位移、長度與發布日期，
+讓單篇查詢可以直接 seek 到該筆紀錄，日期範圍查詢則以排序後的日期索引二分搜尋，
+都不需要解析整個檔案。
+"""
+
+import bisect
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class PaperIndex:
+    """news.jsonl 的位元組位移索引
+    
+    索引檔為純文字格式，第一行為版本標頭，其後每行為
+    ``論文ID<TAB>位移<TAB>長度<TAB>發布日期``。新增紀錄時只需附加一行；
+    若索引與資料檔不同步，會自動補齊或重建。
+    """
+    
+    HEADER = "#paper-index v2"
+    
+    def __init__(self, data_file: Path, index_file: Path):
+        self.data_file = data_file
+        self.index_file = index_file
+        self._entries: Dict[str, Tuple[int, int, str]] = {}
+        # 依 (發布日期, 位移) 排序的日期索引，第一次範圍查詢時才建立
+        self._by_date: Optional[List[Tuple[str, int, str]]] = None
+        self._indexed_size = 0
+        self._loaded = False
+    
+    def __len__(self) -> int:
+        self._ensure_synced()
+        return len(self._entries)
+    
+    def __contains__(self, paper_id: str) -> bool:
+        self._ensure_synced()
+        return paper_id in self._entries
+    
+    def has_superseded_records(self) -> bool:
+        """
+        資料檔中是否有被同一ID較新紀錄取代的舊紀錄（或無法索引的行）
+        
+        每個ID只索引最新的一筆，索引的長度總和小於資料檔大小時表示有其他行。
+        """
+        self._ensure_synced()
+        return sum(entry[1] for entry in self._entries.values()) != self._indexed_size
+    
+    def lookup(self, paper_id: str) -> Optional[bytes]:
+        """
+        取得論文紀錄的原始 JSON 位元組
+        
+        Args:
+            paper_id: 論文ID
+        
+        Returns:
+            該筆紀錄的 JSON 位元組，找不到時返回None
+        """
+        self._ensure_synced()
+        
+        entry = self._entries.get(paper_id)
+        if entry is None:
+            return None
+        
+        raw = self._read_entry(entry)
+        if self._record_key(raw)[0] != paper_id:
+            # 資料檔被改寫但大小恰好相同，重建後再試一次
+            logger.warning(f"索引紀錄不符，重建索引: {paper_id}")
+            self.rebuild()
+            entry = self._entries.get(paper_id)
+            if entry is None:
+                return None
+            raw = self._read_entry(entry)
+        
+        return raw
+    
+    def add(self, paper_id: str, offset: int, length: int, published_date: str = "") -> None:
+        """
+        記錄一筆剛附加到資料檔的紀錄
+        
+        Args:
+            paper_id: 論文ID
+            offset: 紀錄在資料檔中的起始位移
+            length: 紀錄長度（包含換行字元）
+            published_date: 發布日期（YYYY-MM-DD）
+        """
+        self._ensure_loaded()
+        
+        if offset != self._indexed_size:
+            # 有其他寫入者附加過資料，交給同步流程掃描補齊
+            self._ensure_synced()
+            return
+        
+        self._set_entry(paper_id, (offset, length, published_date))
+        self._indexed_size = offset + length
+        self._append_lines([(paper_id, offset, length, published_date)])
+    
+    def items(self) -> Iterator[Tuple[str, Tuple[int, int, str]]]:
+        """依資料檔順序列出所有 (論文ID, (位移, 長度, 發布日期))"""
+        self._ensure_synced()
+        return iter(sorted(self._entries.items(), key=lambda item: item[1][0]))
+    
+    def between(self, start_date: str, end_date: str) -> List[bytes]:
+        """
+        以二分搜尋取得發布日期在範圍內的紀錄
+        
+        Args:
+            start_date: 起始日期（含），YYYY-MM-DD
+            end_date: 結束日期（含），YYYY-MM-DD
+        
+        Returns:
+            依發布日期排序的紀錄 JSON 位元組列表
+        """
+        self._ensure_synced()
+        
+        if self._by_date is None:
+            self._by_date = sorted(
+                (published_date, offset, paper_id)
+                for paper_id, (offset, _, published_date) in self._entries.items()
+            )
+        
+        lo = bisect.bisect_left(self._by_date, (start_date,))
+        # "\uffff" 大於任何日期字串後綴，讓結束日期當天的紀錄都包含在內
+        hi = bisect.bisect_right(self._by_date, (end_date + "\uffff",))
+        
+        records = []
+        if lo >= hi:
+            return records
+        
+        with open(self.data_file, "rb") as f:
+            for _, _, paper_id in self._by_date[lo:hi]:
+                offset, length, _ = self._entries[paper_id]
+                f.seek(offset)
+                records.append(f.read(length))
+        
+        return records
+    
+    def _set_entry(self, paper_id: str, entry: Tuple[int, int, str]) -> None:
+        """更新單筆索引，同步維護已建立的日期索引"""
+        previous = self._entries.get(paper_id)
+        self._entries[paper_id] = entry
+        
+        if self._by_date is None:
+            return
+        
+        if previous is not None:
+            key = (previous[2], previous[0], paper_id)
+            position = bisect.bisect_left(self._by_date, key)
+            if position < len(self._by_date) and self._by_date[position] == key:
+                del self._by_date[position]
+        
+        bisect.insort(self._by_date, (entry[2], entry[0], paper_id))
+    
+    def rebuild(self) -> None:
+        """掃描整個資料檔並重寫索引"""
+        self._entries = {}
+        self._by_date = None
+        self._indexed_size = 0
+        new_entries = self._scan_from(0)
+        self._write_index()
+        self._loaded = True
+        logger.info(f"已重建論文索引，共 {len(new_entries)} 筆紀錄")
+    
+    def invalidate(self) -> None:
+        """資料檔被整體改寫後呼叫，下次使用時重建索引"""
+        self._entries = {}
+        self._by_date = None
+        self._indexed_size = 0
+        self._loaded = False
+        try:
+            self.index_file.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def _ensure_loaded(self) -> None:
+        """從磁碟載入索引檔"""
+        if self._loaded:
+            return
+        
+        self._entries = {}
+        self._by_date = None
+        self._indexed_size = 0
+        
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    if f.readline().rstrip("\n") != self.HEADER:
+                        raise ValueError("索引版本不符")
+                    for line in f:
+                        paper_id, offset, length, published_date = line.rstrip("\n").split("\t")
+                        offset, length = int(offset), int(length)
+                        self._entries[paper_id] = (offset, length, published_date)
+                        self._indexed_size = max(self._indexed_size, offset + length)
+            except Exception as e:
+                logger.warning(f"索引檔無法使用，將重建: {str(e)}")
+                self.rebuild()
+                return
+        
+        self._loaded = True
+    
+    def _ensure_synced(self) -> None:
+        """確保索引涵蓋資料檔的全部內容"""
+        self._ensure_loaded()
+        
+        data_size = self.data_file.stat().st_size if self.data_file.exists() else 0
+        
+        if data_size == self._indexed_size:
+            return
+        
+        if data_size < self._indexed_size or not self._ends_with_newline(self._indexed_size):
+            logger.info("論文索引與資料檔不同步，重新建立索引")
+            self.rebuild()
+            return
+        
+        # 資料檔只有附加新內容，掃描尾端即可
+        new_entries = self._scan_from(self._indexed_size)
+        self._append_lines(new_entries)
+        logger.debug(f"論文索引已補齊 {len(new_entries)} 筆紀錄")
+    
+    def _scan_from(self, start: int) -> list:
+        """從指定位移開始掃描資料檔，更新記憶體中的索引"""
+        new_entries = []
+        
+        if not self.data_file.exists():
+            return new_entries
+        
+        with open(self.data_file, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                length = len(line)
+                if not line.endswith(b"\n"):
+                    # 尚未寫完的尾端行不納入索引
+                    break
+                paper_id, published_date = self._record_key(line)
+                if paper_id is not None:
+                    self._set_entry(paper_id, (offset, length, published_date))
+                    new_entries.append((paper_id, offset, length, published_date))
+                offset += length
+        
+        self._indexed_size = offset
+        return new_entries
+    
+    def _ends_with_newline(self, position: int) -> bool:
+        """檢查資料檔在指定位移前一個位元組是否為換行"""
+        if position == 0:
+            return True
+        with open(self.data_file, "rb") as f:
+            f.seek(position - 1)
+            return f.read(1) == b"\n"
+    
+    def _read_entry(self, entry: Tuple[int, int, str]) -> bytes:
+        offset, length, _ = entry
+        with open(self.data_file, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+    
+    @staticmethod
+    def _record_key(raw: bytes) -> Tuple[Optional[str], str]:
+        """解析紀錄中的論文ID與發布日期，無法解析時ID為None"""
+        raw = raw.strip()
+        if not raw:
+            return None, ""
+        try:
+            data = json.loads(raw)
+            return data.get("id"), data.get("published_date") or ""
+        except (ValueError, AttributeError):
+            return None, ""
+    
+    def _append_lines(self, entries: list) -> None:
+        if not entries:
+            return
+        if not self.index_file.exists():
+            self._write_index()
+            return
+        with open(self.index_file, "a", encoding="utf-8") as f:
+            f.writelines(
+                f"{paper_id}\t{offset}\t{length}\t{published_date}\n"
+                for paper_id, offset, length, published_date in entries
+            )
+    
+    def _write_index(self) -> None:
+        """以原子方式重寫整個索引檔"""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix(self.index_file.suffix + ".tmp")
+        
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(self.HEADER + "\n")
+            for paper_id, (offset, length, published_date) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+                f.write(f"{paper_id}\t{offset}\t{length}\t{published_date}\n")
+        
+        os.replace(tmp_file, self.index_file)
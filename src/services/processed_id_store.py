@@ -0,0 +1,250 @@
+"""
+已處理論文ID儲存
+
+以「排序快照 + 附加日誌」的方式保存已處理的論文ID：
+新ID只附加到日誌檔，累積到一定數量後再壓縮合併進排序快照。
+查詢時先經過磁碟上的布隆過濾器，再以二分搜尋確認快照內容，
+不需要將全部ID載入記憶體。
+"""
+
+import hashlib
+import heapq
+import mmap
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+from ..core.exceptions import StorageError
+from ..utils.bloom_filter import BloomFilter
+from ..utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class ProcessedIdStore:
+    """已處理論文ID集合
+    
+    介面與 set 相容（``in``、``add``、``len``、迭代），
+    可直接傳給 ArxivService.fetch_papers 使用。
+    """
+    
+    def __init__(self, snapshot_file: Path, log_file: Path, bloom_file: Path,
+                 compact_threshold: int = 256):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.bloom_file = bloom_file
+        self.compact_threshold = compact_threshold
+        
+        self._recent: Set[str] = set()
+        self._pending: Set[str] = set()
+        self._bloom: Optional[BloomFilter] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._snapshot_handle = None
+        
+        self._load_log()
+        self._load_bloom()
+    
+    def __contains__(self, paper_id: str) -> bool:
+        if paper_id in self._pending or paper_id in self._recent:
+            return True
+        if self._bloom is None or paper_id not in self._bloom:
+            return False
+        return self._snapshot_contains(paper_id)
+    
+    def __len__(self) -> int:
+        snapshot_count = self._bloom.count if self._bloom is not None else 0
+        return snapshot_count + len(self._recent) + len(self._pending)
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from self._iter_snapshot()
+        yield from self._recent
+        yield from self._pending
+    
+    def add(self, paper_id: str) -> None:
+        """標記論文為已處理（呼叫 flush 後才會寫入磁碟）"""
+        if paper_id not in self:
+            self._pending.add(paper_id)
+    
+    def update(self, paper_ids: Iterable[str]) -> None:
+        """批次標記論文為已處理"""
+        for paper_id in paper_ids:
+            self.add(paper_id)
+    
+    def flush(self) -> int:
+        """
+        將尚未寫入的ID附加到日誌檔，必要時進行壓縮
+        
+        Returns:
+            新寫入的ID數量
+        
+        Raises:
+            StorageError: 寫入失敗時拋出
+        """
+        if not self._pending:
+            return 0
+        
+        pending = sorted(self._pending)
+        
+        try:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write("".join(f"{paper_id}\n" for paper_id in pending))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            error_msg = f"寫入已處理ID日誌失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        self._recent.update(pending)
+        self._pending.clear()
+        
+        if len(self._recent) >= self.compact_threshold:
+            self.compact()
+        
+        return len(pending)
+    
+    def compact(self) -> None:
+        """
+        將日誌合併進排序快照並重建布隆過濾器
+        
+        Raises:
+            StorageError: 壓縮失敗時拋出
+        """
+        self._recent.update(self._pending)
+        self._pending.clear()
+        tmp_file = self.snapshot_file.with_suffix(self.snapshot_file.suffix + ".tmp")
+        bloom = BloomFilter(capacity=max(10000, 2 * len(self)))
+        
+        try:
+            self.snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            previous = None
+            with open(tmp_file, "w", encoding="utf-8", newline="\n") as f:
+                for paper_id in heapq.merge(self._iter_snapshot(), sorted(self._recent)):
+                    if paper_id == previous:
+                        continue
+                    f.write(paper_id + "\n")
+                    bloom.add(paper_id)
+                    previous = paper_id
+            
+            self._close_snapshot()
+            os.replace(tmp_file, self.snapshot_file)
+            
+            # 快照已包含日誌內容，清空日誌
+            with open(self.log_file, "w", encoding="utf-8"):
+                pass
+        
+        except OSError as e:
+            error_msg = f"壓縮已處理ID失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        self._recent.clear()
+        self._bloom = bloom
+        self._save_bloom()
+        logger.info(f"已壓縮已處理ID快照，共 {bloom.count} 個ID")
+    
+    def close(self) -> None:
+        """釋放快照的記憶體映射"""
+        self._close_snapshot()
+    
+    def _load_log(self) -> None:
+        if not self.log_file.exists():
+            return
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            self._recent = set(line.strip() for line in f if line.strip())
+    
+    def _snapshot_stamp(self) -> Tuple[int, int]:
+        """以快照大小與內容雜湊標記快照（不用修改時間，checkout 後的快照仍對應同一個過濾器）"""
+        if not self.snapshot_file.exists():
+            return (0, 0)
+        digest = hashlib.blake2b(digest_size=8)
+        with open(self.snapshot_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return (self.snapshot_file.stat().st_size, int.from_bytes(digest.digest(), "little", signed=True))
+    
+    def _load_bloom(self) -> None:
+        """載入布隆過濾器，若與快照不符則重建"""
+        stamp = self._snapshot_stamp()
+        
+        if self.bloom_file.exists():
+            try:
+                bloom, saved_stamp = BloomFilter.load(self.bloom_file)
+                if saved_stamp == stamp:
+                    self._bloom = bloom
+                    return
+            except (OSError, ValueError) as e:
+                logger.warning(f"布隆過濾器無法使用，將重建: {str(e)}")
+        
+        if stamp == (0, 0):
+            self._bloom = BloomFilter()
+            return
+        
+        # 逐行串流重建，不需將快照整個載入記憶體
+        count = sum(1 for _ in self._iter_snapshot())
+        bloom = BloomFilter(capacity=max(10000, 2 * count))
+        bloom.update(self._iter_snapshot())
+        self._bloom = bloom
+        self._save_bloom()
+        logger.debug(f"已重建已處理ID布隆過濾器，共 {count} 個ID")
+    
+    def _save_bloom(self) -> None:
+        try:
+            self._bloom.save(self.bloom_file, self._snapshot_stamp())
+        except OSError as e:
+            # 布隆過濾器可隨時重建，寫入失敗只影響下次啟動速度
+            logger.warning(f"寫入布隆過濾器失敗: {str(e)}")
+    
+    def _iter_snapshot(self) -> Iterator[str]:
+        if not self.snapshot_file.exists():
+            return
+        with open(self.snapshot_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+    
+    def _open_snapshot(self) -> Optional[mmap.mmap]:
+        if self._mmap is None:
+            if not self.snapshot_file.exists() or self.snapshot_file.stat().st_size == 0:
+                return None
+            self._snapshot_handle = open(self.snapshot_file, "rb")
+            self._mmap = mmap.mmap(self._snapshot_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+    
+    def _close_snapshot(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._snapshot_handle is not None:
+            self._snapshot_handle.close()
+            self._snapshot_handle = None
+    
+    def _snapshot_contains(self, paper_id: str) -> bool:
+        """在排序快照中以二分搜尋查找ID"""
+        mm = self._open_snapshot()
+        if mm is None:
+            return False
+        
+        target = paper_id.encode("utf-8")
+        lo, hi = 0, len(mm)
+        
+        # lo 永遠指向某一行的開頭，hi 為搜尋範圍的結尾
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mm.rfind(b"\n", lo, mid) + 1 or lo
+            end = mm.find(b"\n", start, hi)
+            if end == -1:
+                end = hi
+            
+            line = mm[start:end].strip()
+            if line == target:
+                return True
+            if line < target:
+                lo = end + 1
+            else:
+                hi = start
+        
+        return False
@@ -0,0 +1,238 @@
+"""
+論文相關度排序服務
+
+以 BM25 對候選論文評分：查詢為興趣設定（Config.RANKING_PROFILE），
+詞的 IDF 與平均文件長度來自既有的論文資料。翻譯與語音合成是最昂貴的步驟，
+只把分數最高的論文送去處理。
+
+模型（文件頻率、文件數與總長度）保存在磁碟上並以增量方式更新；
+安裝 NumPy 時以矩陣運算評分，否則改用純 Python 計算相同的分數。
+"""
+
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..core.models import Paper
+from ..utils.file_utils import atomic_write_json, safe_read_json
+from ..utils.logging_utils import get_logger
+from ..utils.text_utils import tokenize
+from .storage_service import StorageService
+
+logger = get_logger(__name__)
+
+
+class RankingService:
+    """BM25 相關度排序"""
+    
+    MODEL_VERSION = 1
+    # BM25 參數
+    K1 = 1.2
+    B = 0.75
+    
+    def __init__(self, config: Config = None, storage: Optional[StorageService] = None):
+        self.config = config or Config()
+        self.storage = storage or StorageService(self.config)
+        self.model_file = self.config.RANKING_MODEL_FILE
+        self.query = Counter(token for phrase in self.config.RANKING_PROFILE for token in tokenize(phrase))
+        self._model: Optional[Dict] = None
+    
+    def rank(self, papers: List[Paper], top_k: Optional[int] = None) -> List[Paper]:
+        """
+        依相關度由高到低排序候選論文
+        
+        Args:
+            papers: 候選論文
+            top_k: 只保留前幾篇（None 表示全部保留）
+        
+        Returns:
+            排序後的論文
+        """
+        if not papers:
+            return []
+        
+        scores = self.score(papers)
+        # 同分時依各查詢內的順序（由新到舊）輪流排列，避免集中在第一個查詢
+        positions, seen = [], Counter()
+        for paper in papers:
+            positions.append(seen[paper.query])
+            seen[paper.query] += 1
+        order = sorted(range(len(papers)), key=lambda i: (-scores[i], positions[i]))
+        if top_k is not None:
+            order = order[:top_k]
+        
+        logger.info(
+            "相關度排序：候選 %d 篇，選出 %d 篇（最高分 %.2f，最低入選分 %.2f）",
+            len(papers), len(order), scores[order[0]] if order else 0.0,
+            scores[order[-1]] if order else 0.0
+        )
+        return [papers[i] for i in order]
+    
+    def score(self, papers: List[Paper]) -> List[float]:
+        """
+        計算候選論文對興趣設定的 BM25 分數
+        
+        Args:
+            papers: 候選論文
+        
+        Returns:
+            與 papers 順序相同的分數
+        """
+        if self._model is None and not self.model_file.exists():
+            # 第一次使用時以既有資料建立模型
+            self.sync()
+        model = self._load_model()
+        terms = list(self.query)
+        if not terms:
+            return [0.0] * len(papers)
+        
+        columns = {term: j for j, term in enumerate(terms)}
+        counts, lengths = [], []
+        for paper in papers:
+            tokens = Counter(tokenize(self._text(paper)))
+            lengths.append(sum(tokens.values()))
+            counts.append([(columns[term], count) for term, count in tokens.items() if term in columns])
+        
+        n_docs = model["docs"]
+        average_length = model["length"] / n_docs if n_docs else (sum(lengths) / len(lengths) or 1.0)
+        weights = [self.query[term] * self._idf(model["df"].get(term, 0), n_docs) for term in terms]
+        
+        if np is not None:
+            return self._score_numpy(counts, lengths, weights, average_length)
+        return self._score_python(counts, lengths, weights, average_length)
+    
+    def update(self, papers: Iterable) -> int:
+        """
+        將新儲存的論文加入模型；尚未建立模型時改為處理全部資料
+        
+        Args:
+            papers: 論文（Paper、PaperRecord 或 dict）
+        
+        Returns:
+            新加入的論文數量
+        """
+        if not self.model_file.exists():
+            return self.sync()
+        return self.add_papers(papers)
+    
+    def sync(self) -> int:
+        """
+        掃描全部資料，加入尚未計入模型的論文
+        
+        Returns:
+            新加入的論文數量
+        """
+        return self.add_papers(self.storage.iter_records())
+    
+    def rebuild(self) -> int:
+        """
+        刪除現有模型並重新建立
+        
+        Returns:
+            計入模型的論文數量
+        """
+        self.model_file.unlink(missing_ok=True)
+        self._model = None
+        return self.sync()
+    
+    def add_papers(self, papers: Iterable) -> int:
+        """
+        將論文的詞頻加入模型（已計入的論文會略過）
+        
+        Args:
+            papers: 論文（Paper、PaperRecord 或 dict）
+        
+        Returns:
+            新加入的論文數量
+        
+        Raises:
+            StorageError: 寫入模型失敗時拋出
+        """
+        model = self._load_model()
+        known = model["ids"]
+        df = model["df"]
+        added = 0
+        
+        for paper in papers:
+            paper_id = paper.get("id") if isinstance(paper, dict) else paper.id
+            if not paper_id or paper_id in known:
+                continue
+            
+            tokens = list(tokenize(self._text(paper)))
+            for term in set(tokens):
+                df[term] = df.get(term, 0) + 1
+            model["docs"] += 1
+            model["length"] += len(tokens)
+            known.add(paper_id)
+            added += 1
+        
+        if added:
+            try:
+                atomic_write_json(self.model_file, {
+                    "version": self.MODEL_VERSION,
+                    "docs": model["docs"],
+                    "length": model["length"],
+                    "ids": sorted(known),
+                    "df": df,
+                }, indent=None)
+            except OSError as e:
+                error_msg = f"寫入排序模型失敗: {str(e)}"
+                logger.error(error_msg)
+                raise StorageError(error_msg, str(e))
+            logger.info("排序模型已加入 %d 篇論文，共 %d 篇", added, model["docs"])
+        
+        return added
+    
+    def _score_numpy(self, counts: List[List[Tuple[int, int]]], lengths: List[int],
+                     weights: List[float], average_length: float) -> List[float]:
+        tf = np.zeros((len(counts), len(weights)), dtype=np.float64)
+        for row, entries in enumerate(counts):
+            for column, count in entries:
+                tf[row, column] = count
+        
+        norm = self.K1 * (1 - self.B + self.B * np.asarray(lengths, dtype=np.float64) / average_length)
+        saturated = tf * (self.K1 + 1) / (tf + norm[:, None])
+        return (saturated @ np.asarray(weights, dtype=np.float64)).tolist()
+    
+    def _score_python(self, counts: List[List[Tuple[int, int]]], lengths: List[int],
+                      weights: List[float], average_length: float) -> List[float]:
+        scores = []
+        for entries, length in zip(counts, lengths):
+            norm = self.K1 * (1 - self.B + self.B * length / average_length)
+            scores.append(sum((
+                weights[column] * count * (self.K1 + 1) / (count + norm)
+                for column, count in entries
+            ), 0.0))
+        return scores
+    
+    @staticmethod
+    def _idf(df: int, n_docs: int) -> float:
+        """BM25 的 IDF（加 1 避免常見詞得到負分）"""
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    
+    @staticmethod
+    def _text(paper) -> str:
+        if isinstance(paper, dict):
+            return f"{paper.get('title') or ''} {paper.get('summary') or ''}"
+        return f"{paper.title or ''} {paper.summary or ''}"
+    
+    def _load_model(self) -> Dict:
+        if self._model is None:
+            model = None
+            if self.model_file.exists():
+                try:
+                    model = safe_read_json(self.model_file)
+                except Exception as e:
+                    logger.warning(f"排序模型無法讀取，將重新建立: {str(e)}")
+            if not model or model.get("version") != self.MODEL_VERSION:
+                model = {"docs": 0, "length": 0, "ids": [], "df": {}}
+            model["ids"] = set(model["ids"])
+            self._model = model
+        return self._model
@@ -0,0 +1,283 @@
+"""
+既有論文重新處理服務
+
+修改翻譯提示詞、GEMINI_MODEL 或語音設定後，依篩選條件重新翻譯及（或）重新合成既有論文：
+- 論文記錄了產生內容的模型與提示詞版本，預設只處理版本過時的論文
+- 多篇論文同時處理，並依 RunScheduler 的時限與 token／請求預算停止接受新工作
+- 每完成一批就透過 update_records 以原子方式寫回資料，並記錄進度；中斷後以相同條件再執行即可續傳
+
+更新流程先發布只有文字的論文，也以此服務為 AudioBackfillQueue 選出的論文補上語音；
+補上的音訊以附加新紀錄的方式寫入（append=True），不改寫既有資料檔。
+"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from ..core.config import Config
+from ..core.exceptions import StorageError, TranslationError
+from ..core.models import Paper, PaperRecord, PaperTranslation
+from ..utils.file_utils import atomic_write_json, safe_read_json
+from ..utils.logging_utils import get_logger, log_context
+from ..utils.metrics import get_run_metrics
+from .audio_service import AudioService
+from .run_scheduler import RunScheduler
+from .storage_service import StorageService
+from .translation_service import TranslationService
+
+logger = get_logger(__name__)
+
+
+class ReprocessService:
+    """重新翻譯或重新合成既有論文"""
+    
+    def __init__(self, config: Config = None, storage: Optional[StorageService] = None,
+                 translation: Optional[TranslationService] = None, audio: Optional[AudioService] = None):
+        self.config = config or Config()
+        self.storage = storage or StorageService(self.config)
+        self._translation = translation
+        self._audio = audio
+        self.state_file = self.config.REPROCESS_STATE_FILE
+        self.batch_size = max(1, self.config.REPROCESS_BATCH_SIZE)
+    
+    @property
+    def translation(self) -> TranslationService:
+        if self._translation is None:
+            self._translation = TranslationService(self.config)
+        return self._translation
+    
+    @property
+    def audio(self) -> AudioService:
+        if self._audio is None:
+            self._audio = AudioService(self.config)
+        return self._audio
+    
+    def select(self, since: Optional[str] = None, until: Optional[str] = None, query: Optional[str] = None,
+               model: Optional[str] = None, translate: bool = True, audio: bool = True,
+               force: bool = False) -> List[PaperRecord]:
+        """
+        選出要重新處理的論文
+        
+        Args:
+            since: 只處理此日期（YYYY-MM-DD，含）之後發布的論文
+            until: 只處理此日期（YYYY-MM-DD，含）之前發布的論文
+            query: 只處理此查詢抓取的論文
+            model: 只處理以此模型翻譯或合成的論文（"none" 表示沒有記錄版本的舊資料）
+            translate: 是否重新翻譯
+            audio: 是否重新合成語音
+            force: 忽略版本，符合條件的論文全部重新處理
+        
+        Returns:
+            論文紀錄（重複ID以最後寫入的紀錄為準，由舊到新）
+        """
+        selected = []
+        for record in self._latest_records():
+            if not record.title_zh:
+                continue
+            if since and (record.published_date or "") < since:
+                continue
+            if until and (record.published_date or "") > until:
+                continue
+            if query and record.query != query:
+                continue
+            if model and not self._matches_model(record, model):
+                continue
+            if force or self._is_stale(record, translate, audio):
+                selected.append(record)
+        
+        return selected
+    
+    def run(self, records: List[PaperRecord], translate: bool = True, audio: bool = True,
+            workers: Optional[int] = None, scheduler: Optional[RunScheduler] = None,
+            run_key: Optional[Dict[str, Any]] = None,
+            stop_event: Optional[threading.Event] = None, append: bool = False) -> Dict[str, Any]:
+        """
+        重新處理論文並寫回資料
+        
+        Args:
+            records: select() 選出的論文
+            translate: 是否重新翻譯（重新翻譯時一併重新合成語音）
+            audio: 是否重新合成語音
+            workers: 同時處理的論文數，預設為 Config.REPROCESS_WORKERS
+            scheduler: 時限與預算排程，預設依 Config 建立
+            run_key: 識別本次執行條件的資料，條件相同時略過上次已完成的論文（None 表示不記錄進度）
+            stop_event: 設定後不再開始處理新論文，已完成的論文仍會寫回
+            append: 以附加完整新紀錄的方式寫回（讀取時以最後寫入的紀錄為準），
+                不改寫既有資料檔，資料檔的索引與增量備份仍可沿用
+        
+        Returns:
+            統計資料：已更新、失敗、略過（上次已完成）與未處理（時限或預算不足）的論文數，
+            以及已更新與失敗的論文ID（ids、failed_ids）
+        
+        Raises:
+            StorageError: 寫回資料失敗時拋出
+        """
+        scheduler = scheduler or RunScheduler(self.config)
+        # 重新翻譯時一併重新合成語音；只合成語音（例如補上音訊）時以音訊的估計排程
+        jobs = ("paper", "audio") if translate else ("audio",)
+        workers = max(1, workers or self.config.REPROCESS_WORKERS)
+        
+        key = self._run_key(run_key, translate, audio) if run_key is not None else None
+        done = self._load_progress(key) if key else set()
+        pending = [record for record in records if record.id not in done]
+        stats = {
+            "updated": 0, "failed": 0, "skipped": len(records) - len(pending), "remaining": 0,
+            "ids": [], "failed_ids": [],
+        }
+        if stats["skipped"]:
+            logger.info("續傳上次的重新處理，略過 %d 篇已完成的論文", stats["skipped"])
+        
+        changes: Dict[str, Dict[str, Any]] = {}
+        by_id = {record.id: record for record in pending}
+        
+        def flush():
+            if changes:
+                if append:
+                    with self.storage.writer() as writer:
+                        for paper_id, fields in changes.items():
+                            writer.write(Paper(**{**by_id[paper_id].to_dict(), **fields}))
+                else:
+                    self.storage.update_records(changes)
+                done.update(changes)
+                stats["ids"].extend(changes)
+                changes.clear()
+            if key:
+                self._save_progress(key, done)
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reprocess") as executor:
+            running = set()
+            queue = list(reversed(pending))
+            
+            while queue or running:
+                # 依時限與預算決定是否再開始新的論文
+                while queue and len(running) < workers:
+                    if (stop_event is not None and stop_event.is_set()) or not scheduler.can_start(*jobs):
+                        stats["remaining"] = len(queue)
+                        queue.clear()
+                        break
+                    record = queue.pop()
+                    running.add(executor.submit(self._process_one, record, translate, audio))
+                
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                
+                for future in finished:
+                    paper_id, result, error = future.result()
+                    if error is not None:
+                        stats["failed"] += 1
+                        stats["failed_ids"].append(paper_id)
+                        logger.error("重新處理論文 %s 失敗: %s", paper_id, error)
+                        continue
+                    changes[paper_id] = result
+                    stats["updated"] += 1
+                    if len(changes) >= self.batch_size:
+                        flush()
+        
+        flush()
+        if key and not stats["remaining"] and not stats["failed"]:
+            # 全部完成，下次執行不需要續傳
+            self.state_file.unlink(missing_ok=True)
+        
+        logger.info(
+            "重新處理完成：更新 %d 篇、失敗 %d 篇、略過 %d 篇、留待下次 %d 篇",
+            stats["updated"], stats["failed"], stats["skipped"], stats["remaining"]
+        )
+        return stats
+    
+    def _process_one(self, record: PaperRecord, translate: bool, audio: bool):
+        """處理單篇論文，返回 (論文ID, 要更新的欄位, 錯誤)"""
+        with log_context(paper_id=record.id):
+            try:
+                return record.id, self._reprocess(record, translate, audio), None
+            except Exception as e:
+                return record.id, None, e
+    
+    def _reprocess(self, record: PaperRecord, translate: bool, audio: bool) -> Dict[str, Any]:
+        """重新翻譯及（或）合成單篇論文，返回要更新的欄位"""
+        metrics = get_run_metrics()
+        usage = []
+        changes: Dict[str, Any] = {}
+        
+        if translate:
+            with metrics.stage("translate"):
+                translation = self.translation.translate_paper(record.title, record.summary, usage=usage)
+            if not usage or not usage[-1].success:
+                # 不以回退結果覆蓋既有的翻譯
+                raise TranslationError("翻譯失敗，保留原本的翻譯")
+            changes.update(translation.model_dump())
+            changes.update(self.translation.versions())
+        else:
+            translation = PaperTranslation(
+                title_zh=record.title_zh, summary_zh=record.summary_zh,
+                applications=record.applications, pitch=record.pitch
+            )
+        
+        if audio or translate:
+            with metrics.stage("audio"):
+                paths = self.audio.generate_variants(translation.get_audio_content(), record.id, usage=usage)
+            changes["audio"] = self.config.to_web_path(paths.pop(None))
+            changes["audio_variants"] = {name: self.config.to_web_path(path) for name, path in paths.items()} or None
+            changes.update(self.audio.versions())
+        
+        changes["usage"] = list(record.usage or []) + [item.model_dump() for item in usage]
+        return changes
+    
+    def _latest_records(self) -> List[PaperRecord]:
+        """依寫入順序取得論文，重複ID以最後寫入的紀錄為準"""
+        latest: Dict[str, PaperRecord] = {}
+        for record in self.storage.iter_records():
+            latest.pop(record.id, None)
+            latest[record.id] = record
+        return list(latest.values())
+    
+    def _is_stale(self, record: PaperRecord, translate: bool, audio: bool) -> bool:
+        """論文的內容是否由不同於目前設定的模型或提示詞產生"""
+        if translate and self.translation.versions() != {
+            "translation_model": record.translation_model, "prompt_version": record.prompt_version
+        }:
+            return True
+        if audio:
+            if self.audio.versions() != {"tts_model": record.tts_model, "tts_voice": record.tts_voice}:
+                return True
+            if set(record.audio_variants or {}) != set(self.config.TTS_VARIANTS):
+                return True
+        return False
+    
+    @staticmethod
+    def _matches_model(record: PaperRecord, model: str) -> bool:
+        if model == "none":
+            return record.translation_model is None and record.tts_model is None
+        return model in (record.translation_model, record.tts_model)
+    
+    def _run_key(self, run_key: Dict[str, Any], translate: bool, audio: bool) -> str:
+        """以執行條件與目前版本識別一次重新處理（條件或版本改變時不沿用舊進度）"""
+        versions = {}
+        if translate:
+            versions.update(self.translation.versions())
+        if translate or audio:
+            versions.update(self.audio.versions())
+            versions["tts_variants"] = sorted(self.config.TTS_VARIANTS)
+        payload = json.dumps({"run": run_key, "translate": translate, "audio": audio, "versions": versions},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _load_progress(self, key: str) -> set:
+        if not self.state_file.exists():
+            return set()
+        try:
+            state = safe_read_json(self.state_file)
+        except Exception as e:
+            logger.warning(f"重新處理進度無法讀取，將從頭開始: {str(e)}")
+            return set()
+        return set(state.get("done", [])) if state.get("key") == key else set()
+    
+    def _save_progress(self, key: str, done: set) -> None:
+        try:
+            atomic_write_json(self.state_file, {"key": key, "done": sorted(done)}, indent=None)
+        except OSError as e:
+            error_msg = f"寫入重新處理進度失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
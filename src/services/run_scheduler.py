@@ -0,0 +1,254 @@
+"""
+執行排程服務
+
+依執行時限與 token／請求預算決定本次處理哪些論文：
+- 以近期執行紀錄（MetricsService 的歷史）分別估計翻譯一篇新論文與補上一篇論文音訊的
+  耗時、token 數與請求數，執行中再以本次已完成工作的實際數值修正
+- 候選論文依查詢輪流挑選，避免單一查詢佔滿預算
+- 預估剩餘時間不足以完成下一篇論文並保存結果時就不再開始新工作
+"""
+
+import statistics
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from ..core.config import Config
+from ..core.models import Paper
+from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
+from .metrics_service import MetricsService
+
+logger = get_logger(__name__)
+
+
+class RunScheduler:
+    """時限與預算感知的論文排程"""
+    
+    # 沒有歷史紀錄時使用的保守估計
+    DEFAULT_SECONDS_PER_PAPER = 30.0
+    DEFAULT_TOKENS_PER_PAPER = 2000.0
+    DEFAULT_REQUESTS_PER_PAPER = 1.0
+    DEFAULT_SECONDS_PER_AUDIO = 40.0
+    DEFAULT_TOKENS_PER_AUDIO = 1000.0
+    DEFAULT_REQUESTS_PER_AUDIO = 1.0
+    # 估計時參考的近期執行次數
+    HISTORY_RUNS = 20
+    # 處理每篇新論文（翻譯並保存）的階段，以 translate 階段的次數計算篇數
+    PAPER_STAGES = ("translate", "save")
+    # 補上音訊的階段，以 audio 階段的次數計算篇數
+    AUDIO_STAGES = ("audio",)
+    # 各類工作的階段、計入的用量種類（UsageRecord.kind）與預設估計
+    JOBS = {
+        "paper": {
+            "stages": PAPER_STAGES, "usage": "translation",
+            "default": {
+                "seconds": DEFAULT_SECONDS_PER_PAPER, "tokens": DEFAULT_TOKENS_PER_PAPER,
+                "requests": DEFAULT_REQUESTS_PER_PAPER,
+            },
+        },
+        "audio": {
+            "stages": AUDIO_STAGES, "usage": "tts",
+            "default": {
+                "seconds": DEFAULT_SECONDS_PER_AUDIO, "tokens": DEFAULT_TOKENS_PER_AUDIO,
+                "requests": DEFAULT_REQUESTS_PER_AUDIO,
+            },
+        },
+    }
+    
+    def __init__(self, config: Config = None, started_at: Optional[float] = None,
+                 deadline_seconds: Optional[int] = None, token_budget: Optional[int] = None,
+                 request_budget: Optional[int] = None):
+        """
+        Args:
+            config: 配置
+            started_at: 執行開始時間（time.monotonic()），預設為現在
+            deadline_seconds: 從開始起算的執行時限，預設為 Config.RUN_DEADLINE_SECONDS（0 表示不限制）
+            token_budget: token 預算，預設為 Config.RUN_TOKEN_BUDGET（0 表示不限制）
+            request_budget: API 請求預算，預設為 Config.RUN_REQUEST_BUDGET（0 表示不限制）
+        """
+        self.config = config or Config()
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self.deadline_seconds = self._or_default(deadline_seconds, self.config.RUN_DEADLINE_SECONDS)
+        self.token_budget = self._or_default(token_budget, self.config.RUN_TOKEN_BUDGET)
+        self.request_budget = self._or_default(request_budget, self.config.RUN_REQUEST_BUDGET)
+        self.finalize_seconds = self.config.RUN_FINALIZE_SECONDS
+        self.estimate = {job: self._estimate_from_history(job) for job in self.JOBS}
+    
+    @property
+    def limited(self) -> bool:
+        """是否有任何時限或預算限制"""
+        return bool(self.deadline_seconds or self.token_budget or self.request_budget)
+    
+    @property
+    def max_per_query(self) -> int:
+        """每個查詢要抓取的候選論文數；有限制時多抓一些讓排程挑選"""
+        if self.limited:
+            return max(self.config.PAPERS_PER_QUERY, self.config.SCHEDULER_MAX_PER_QUERY)
+        return self.config.PAPERS_PER_QUERY
+    
+    def time_left(self) -> Optional[float]:
+        """距離時限的剩餘秒數（沒有時限時返回 None）"""
+        if not self.deadline_seconds:
+            return None
+        return self.deadline_seconds - (time.monotonic() - self.started_at)
+    
+    def plan(self, papers: List[Paper], ranked: bool = False) -> List[Paper]:
+        """
+        選出本次要處理的論文
+        
+        Args:
+            papers: 候選論文（各查詢內由新到舊）
+            ranked: 候選論文是否已依相關度排序（是則維持原本順序，不依查詢輪流挑選）
+        
+        Returns:
+            依處理順序排列的論文；沒有限制時返回原本的列表
+        """
+        if not self.limited:
+            return papers
+        
+        ordered = papers if ranked else self._interleave(papers)
+        capacity = self._capacity()
+        selected = ordered[:capacity]
+        
+        logger.info(
+            "排程：候選 %d 篇，預估每篇 %.1f 秒、%.0f tokens、%.1f 個請求，本次處理 %d 篇",
+            len(papers), self.estimate["paper"]["seconds"], self.estimate["paper"]["tokens"],
+            self.estimate["paper"]["requests"], len(selected)
+        )
+        return selected
+    
+    def can_start(self, *jobs: str) -> bool:
+        """
+        是否還能開始處理下一篇論文
+        
+        預估完成下一篇論文並保存所有結果後仍在時限與預算內時返回 True。
+        
+        Args:
+            jobs: 這篇論文要做的工作：paper（翻譯並保存新論文）及（或）audio（合成語音），
+                預設為 paper
+        """
+        jobs = jobs or ("paper",)
+        estimates = [self._current_estimate(job) for job in jobs]
+        estimate = {field: sum(item[field] for item in estimates) for field in ("seconds", "tokens", "requests")}
+        
+        time_left = self.time_left()
+        if time_left is not None and time_left < estimate["seconds"] + self.finalize_seconds:
+            logger.warning("剩餘時間 %.0f 秒不足以再處理一篇論文，停止接受新工作", time_left)
+            return False
+        
+        used = self._used()
+        if self.token_budget and used["tokens"] + estimate["tokens"] > self.token_budget:
+            logger.warning("token 預算即將用盡（已使用 %d / %d），停止接受新工作", used["tokens"], self.token_budget)
+            return False
+        if self.request_budget and used["requests"] + estimate["requests"] > self.request_budget:
+            logger.warning("請求預算即將用盡（已使用 %d / %d），停止接受新工作", used["requests"], self.request_budget)
+            return False
+        
+        return True
+    
+    def _capacity(self) -> int:
+        """依時限與預算估計可處理的論文數"""
+        limits = []
+        
+        time_left = self.time_left()
+        if time_left is not None:
+            limits.append((time_left - self.finalize_seconds) / self.estimate["paper"]["seconds"])
+        if self.token_budget:
+            limits.append(self.token_budget / self.estimate["paper"]["tokens"])
+        if self.request_budget:
+            limits.append(self.request_budget / self.estimate["paper"]["requests"])
+        
+        return max(0, int(min(limits)))
+    
+    @staticmethod
+    def _interleave(papers: List[Paper]) -> List[Paper]:
+        """依查詢輪流排列，每個查詢優先處理最新的論文"""
+        groups: "OrderedDict[str, List[Paper]]" = OrderedDict()
+        for paper in papers:
+            groups.setdefault(paper.query, []).append(paper)
+        
+        ordered = []
+        for rank in range(max((len(group) for group in groups.values()), default=0)):
+            ordered.extend(group[rank] for group in groups.values() if rank < len(group))
+        return ordered
+    
+    def _used(self, usage_kind: Optional[str] = None) -> Dict[str, float]:
+        """本次執行已使用的 token 與請求數（指定 usage_kind 時只計入該種類）"""
+        return self._usage_totals(get_run_metrics().snapshot()["usage"], usage_kind)
+    
+    @staticmethod
+    def _usage_totals(usage: Dict[str, Dict], usage_kind: Optional[str] = None) -> Dict[str, float]:
+        """加總用量（鍵為 "種類:模型"），指定 usage_kind 時只計入該種類"""
+        selected = [
+            totals for key, totals in usage.items()
+            if usage_kind is None or key.split(":", 1)[0] == usage_kind
+        ]
+        return {
+            "tokens": sum(totals.get("total_tokens", 0) for totals in selected),
+            "requests": sum(totals.get("calls", 0) + totals.get("retries", 0) for totals in selected),
+        }
+    
+    def _current_estimate(self, job: str) -> Dict[str, float]:
+        """本次已完成同類工作時改用實際的平均值（取與歷史估計的較大值，保守估計）"""
+        estimate = self.estimate[job]
+        snapshot = get_run_metrics().snapshot()
+        stages = self.JOBS[job]["stages"]
+        done = snapshot["stages"].get(stages[0], {}).get("count", 0)
+        if not done:
+            return estimate
+        
+        seconds = sum(snapshot["stages"].get(stage, {}).get("sum", 0.0) for stage in stages)
+        used = self._usage_totals(snapshot["usage"], self.JOBS[job]["usage"])
+        return {
+            "seconds": max(estimate["seconds"], seconds / done),
+            "tokens": max(estimate["tokens"], used["tokens"] / done),
+            "requests": max(estimate["requests"], used["requests"] / done),
+        }
+    
+    def _estimate_from_history(self, job: str) -> Dict[str, float]:
+        """
+        以近期執行的中位數估計單項工作的成本
+        
+        每次執行的耗時與用量除以該類工作第一個階段的次數，只有補上音訊的執行仍計入音訊的估計。
+        
+        Args:
+            job: paper（翻譯並保存新論文）或 audio（合成語音）
+        
+        Returns:
+            每項工作的秒數、token 數與請求數
+        """
+        stages = self.JOBS[job]["stages"]
+        seconds, tokens, requests = [], [], []
+        
+        try:
+            runs = MetricsService(self.config).recent_runs(self.HISTORY_RUNS)
+        except Exception as e:
+            logger.warning(f"無法讀取執行歷史，使用預設估計: {str(e)}")
+            runs = []
+        
+        for run in runs:
+            run_stages = run.get("stage_latency") or {}
+            done = run_stages.get(stages[0], {}).get("count", 0)
+            if not done:
+                continue
+            
+            stage_seconds = sum(run_stages.get(stage, {}).get("sum", 0.0) for stage in stages)
+            if stage_seconds:
+                seconds.append(stage_seconds / done)
+            
+            used = self._usage_totals(run.get("usage") or {}, self.JOBS[job]["usage"])
+            if used["requests"]:
+                tokens.append(used["tokens"] / done)
+                requests.append(used["requests"] / done)
+        
+        default = self.JOBS[job]["default"]
+        return {
+            "seconds": (statistics.median(seconds) if seconds else 0) or default["seconds"],
+            "tokens": (statistics.median(tokens) if tokens else 0) or default["tokens"],
+            "requests": (statistics.median(requests) if requests else 0) or default["requests"],
+        }
+    
+    @staticmethod
+    def _or_default(value: Optional[int], default: int) -> int:
+        return default if value is None else value
@@ -0,0 +1,293 @@
+"""
+前端搜尋索引服務
+
+在更新時為 title、title_zh、summary_zh 與 authors 建立倒排索引，
+英文以單字、中文以 bigram 斷詞，並依詞的第一個字元切分為多個分片檔案，
+瀏覽器只需下載查詢詞所在的分片。文件表依文件編號切分為固定大小的頁面。
+``manifest.json`` 列出各分片與文件頁的內容版本，前端以 ``?v=<版本>`` 取得，檔案可長期快取。
+
+索引以增量方式更新：新論文只會改寫它的詞所在的分片與它所在的文件頁，
+內容沒有變動的論文不會重新索引。
+"""
+
+import hashlib
+import json
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..utils.file_utils import atomic_write_json, safe_read_json, write_precompressed
+from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
+from ..utils.text_utils import tokenize
+from .storage_service import StorageService
+
+logger = get_logger(__name__)
+
+
+class SearchIndexService:
+    """增量更新的分片倒排索引"""
+    
+    INDEX_VERSION = 3
+    # 每個文件頁的文件數（前端使用相同的值）
+    DOCS_PAGE_SIZE = 1000
+    # 各欄位的詞頻權重
+    FIELD_WEIGHTS = {"title": 3, "title_zh": 3, "authors": 2, "summary_zh": 1}
+    
+    def __init__(self, config: Config = None, storage: Optional[StorageService] = None):
+        self.config = config or Config()
+        self.storage = storage or StorageService(self.config)
+        self.index_dir = self.config.SEARCH_INDEX_DIR
+        self.state_file = self.config.SEARCH_STATE_FILE
+        
+        self._state: Optional[Dict] = None
+        self._docs: Optional[List[Dict]] = None
+        self._shards: Dict[str, Dict[str, List[List[int]]]] = {}
+        self._dirty = set()
+        self._dirty_pages = set()
+    
+    @staticmethod
+    def shard_key(token: str) -> str:
+        """
+        取得詞所屬的分片鍵
+        
+        ASCII 字元以該字元為鍵，其他字元以 Unicode 碼位為鍵（例如 ``u4e2d``），
+        每次更新只改寫新論文的詞的第一個字元所在的小分片；
+        前端使用相同的規則決定要下載的分片。
+        """
+        first = token[0]
+        if first.isascii():
+            return first
+        return f"u{ord(first):04x}"
+    
+    def shard_path(self, key: str) -> Path:
+        """取得分片檔案路徑"""
+        return self.index_dir / f"terms-{key}.json"
+    
+    def docs_page_path(self, page: int) -> Path:
+        """取得文件頁檔案路徑（第 page 頁包含編號 page * DOCS_PAGE_SIZE 起的文件）"""
+        return self.index_dir / f"docs-{page}.json"
+    
+    @property
+    def manifest_path(self) -> Path:
+        """列出各分片與文件頁版本的 manifest 路徑"""
+        return self.index_dir / "manifest.json"
+    
+    def update(self, papers: Iterable) -> int:
+        """
+        將新儲存的論文加入索引；尚未建立索引時改為索引全部資料
+        
+        Args:
+            papers: 論文（Paper、PaperRecord 或 dict）
+        
+        Returns:
+            新增或重新索引的論文數量
+        """
+        if not self._load_state()["docs"]:
+            return self.sync()
+        return self.add_papers(papers)
+    
+    def sync(self) -> int:
+        """
+        掃描全部資料，索引新增或內容有變動的論文
+        
+        Returns:
+            新增或重新索引的論文數量
+        """
+        return self.add_papers(self.storage.iter_records())
+    
+    def rebuild(self) -> int:
+        """
+        刪除現有索引並重新建立
+        
+        Returns:
+            索引的論文數量
+        """
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+        self.state_file.unlink(missing_ok=True)
+        self._state, self._docs = None, None
+        self._shards.clear()
+        self._dirty.clear()
+        self._dirty_pages.clear()
+        return self.sync()
+    
+    def add_papers(self, papers: Iterable) -> int:
+        """
+        將論文加入索引（內容沒有變動的論文會略過）
+        
+        Args:
+            papers: 論文（Paper、PaperRecord 或 dict）
+        
+        Returns:
+            新增或重新索引的論文數量
+        
+        Raises:
+            StorageError: 寫入索引失敗時拋出
+        """
+        state = self._load_state()
+        docs = self._load_docs()
+        # 文件頁已寫出但狀態檔尚未寫入時（程序中斷），沿用文件頁中的編號，避免同一論文有兩個編號
+        recorded = {doc["id"]: number for number, doc in enumerate(docs) if doc}
+        indexed = 0
+        
+        for paper in papers:
+            data = self._as_dict(paper)
+            paper_id = data.get("id")
+            if not paper_id:
+                continue
+            
+            fields = {field: self._field_text(data.get(field)) for field in self.FIELD_WEIGHTS}
+            digest = hashlib.sha1("\x1f".join(fields.values()).encode("utf-8")).hexdigest()[:12]
+            
+            entry = state["docs"].get(paper_id)
+            unchanged = entry is not None and entry[1] == digest
+            get_run_metrics().cache("search_index", hit=unchanged)
+            if unchanged:
+                continue
+            
+            if entry is not None:
+                doc = entry[0]
+                self._remove_doc(doc, entry[2])
+            elif paper_id in recorded:
+                doc = recorded[paper_id]
+            else:
+                doc = len(docs)
+                docs.append(None)
+            
+            docs[doc] = {
+                "id": paper_id,
+                "t": data.get("title_zh") or data.get("title") or "",
+                "d": data.get("published_date") or "",
+                "u": data.get("url") or "",
+            }
+            self._dirty_pages.add(doc // self.DOCS_PAGE_SIZE)
+            
+            weights = Counter()
+            for field, text in fields.items():
+                for token in tokenize(text):
+                    weights[token] += self.FIELD_WEIGHTS[field]
+            
+            keys = set()
+            for token, weight in weights.items():
+                key = self.shard_key(token)
+                postings = self._load_shard(key).setdefault(token, [])
+                if postings and postings[-1][0] == doc:
+                    # 上次寫入中斷時可能已留下同一文件的紀錄
+                    postings[-1] = [doc, weight]
+                else:
+                    postings.append([doc, weight])
+                keys.add(key)
+            self._dirty.update(keys)
+            
+            state["docs"][paper_id] = [doc, digest, sorted(keys)]
+            indexed += 1
+        
+        if indexed:
+            self._save()
+            logger.info(
+                f"搜尋索引已更新 {indexed} 篇論文，改寫 {len(self._dirty)} 個分片與 {len(self._dirty_pages)} 個文件頁"
+            )
+        
+        self._dirty.clear()
+        self._dirty_pages.clear()
+        return indexed
+    
+    def _remove_doc(self, doc: int, keys: List[str]) -> None:
+        """從指定分片中移除文件的所有詞"""
+        for key in keys:
+            terms = self._load_shard(key)
+            for token in list(terms):
+                postings = [posting for posting in terms[token] if posting[0] != doc]
+                if postings:
+                    terms[token] = postings
+                else:
+                    del terms[token]
+            self._dirty.add(key)
+    
+    @staticmethod
+    def _as_dict(paper) -> Dict:
+        if isinstance(paper, dict):
+            return paper
+        if hasattr(paper, "to_dict"):
+            return paper.to_dict()
+        return paper.model_dump()
+    
+    @staticmethod
+    def _field_text(value) -> str:
+        if isinstance(value, list):
+            return " ".join(str(item) for item in value)
+        return value or ""
+    
+    def _load_state(self) -> Dict:
+        if self._state is None:
+            state = None
+            if self.state_file.exists():
+                try:
+                    state = safe_read_json(self.state_file)
+                except Exception as e:
+                    logger.warning(f"搜尋索引狀態無法讀取，將重新建立: {str(e)}")
+            if state and state.get("version") != self.INDEX_VERSION:
+                # 分片與文件頁的格式不同，移除舊版本的檔案後重新建立
+                logger.info("搜尋索引版本不符，重新建立")
+                shutil.rmtree(self.index_dir, ignore_errors=True)
+                state = None
+            if not state:
+                state = {"version": self.INDEX_VERSION, "docs": {}}
+            self._state = state
+        return self._state
+    
+    def _load_docs(self) -> List[Dict]:
+        if self._docs is None:
+            docs = []
+            if self._load_state()["docs"]:
+                page = 0
+                while self.docs_page_path(page).exists():
+                    docs.extend(safe_read_json(self.docs_page_path(page)).get("docs", []))
+                    page += 1
+            self._docs = docs
+        return self._docs
+    
+    def _load_shard(self, key: str) -> Dict[str, List[List[int]]]:
+        terms = self._shards.get(key)
+        if terms is None:
+            path = self.shard_path(key)
+            terms = safe_read_json(path).get("terms", {}) if path.exists() and self._load_state()["docs"] else {}
+            self._shards[key] = terms
+        return terms
+    
+    def _save(self) -> None:
+        """寫出有變動的分片、文件頁、manifest 與狀態檔"""
+        versions = self._state.setdefault("files", {})
+        
+        def write(path: Path, payload: Dict) -> None:
+            data = self._dumps(payload)
+            write_precompressed(path, data)
+            versions[path.name] = hashlib.sha1(data).hexdigest()[:10]
+        
+        try:
+            for key in sorted(self._dirty):
+                write(self.shard_path(key), {"v": self.INDEX_VERSION, "terms": self._shards[key]})
+            
+            for page in sorted(self._dirty_pages):
+                start = page * self.DOCS_PAGE_SIZE
+                write(self.docs_page_path(page),
+                      {"v": self.INDEX_VERSION, "docs": self._docs[start:start + self.DOCS_PAGE_SIZE]})
+            
+            manifest = {"v": self.INDEX_VERSION, "docs_page_size": self.DOCS_PAGE_SIZE,
+                        "files": dict(sorted(versions.items()))}
+            write_precompressed(self.manifest_path, self._dumps(manifest))
+            
+            # 狀態檔最後寫入，中斷時下次執行會重新索引尚未記錄的論文
+            atomic_write_json(self.state_file, self._state, indent=None)
+        
+        except OSError as e:
+            error_msg = f"寫入搜尋索引失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+    
+    @staticmethod
+    def _dumps(payload: Dict) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,394 @@
+"""
+分片資料儲存服務
+
+依論文發布日期將資料切分為每月（或每週）一個 JSONL 分片，
+並以一個小型 manifest 記錄各分片的ID範圍、筆數與校驗碼。
+附加資料只會改動對應的分片，限定日期範圍的讀取也只需開啟需要的分片。
+"""
+
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..core.config import Config
+from ..core.models import Paper
+from ..core.exceptions import StorageError
+from ..utils.date_utils import parse_date, to_date_string
+from ..utils.file_utils import atomic_write_json, safe_read_json
+from ..utils.json_utils import fast_loads, JSONDecodeError
+from ..utils.logging_utils import get_logger
+from .jsonl_writer import JsonlWriter, compact_jsonl
+from .storage_service import DateLike, StorageService
+
+logger = get_logger(__name__)
+
+
+UNKNOWN_SHARD = "unknown"
+
+
+class ShardedStorageService(StorageService):
+    """依發布日期分片的資料儲存服務"""
+    
+    MANIFEST_VERSION = 1
+    
+    def __init__(self, config: Config = None):
+        super().__init__(config)
+        self.shards_dir = self.config.SHARDS_DIR
+        self.period = self.config.SHARD_PERIOD
+        self.manifest_file = self.shards_dir / "manifest.json"
+        self._manifest: Optional[Dict] = None
+    
+    def shard_key(self, published_date: str) -> str:
+        """
+        取得發布日期對應的分片鍵
+        
+        Args:
+            published_date: 發布日期（YYYY-MM-DD）
+        
+        Returns:
+            每月分片為 ``YYYY-MM``，每週分片為 ``YYYY-Www``
+        """
+        try:
+            date = parse_date(published_date[:10])
+        except (TypeError, ValueError):
+            return UNKNOWN_SHARD
+        
+        if self.period == "week":
+            year, week, _ = date.isocalendar()
+            return f"{year}-W{week:02d}"
+        return date.strftime("%Y-%m")
+    
+    def shard_path(self, key: str) -> Path:
+        """取得分片檔案路徑"""
+        return self.shards_dir / f"news-{key}.jsonl"
+    
+    @property
+    def manifest(self) -> Dict:
+        """分片 manifest（延遲載入）"""
+        if self._manifest is None:
+            self._manifest = self._load_manifest()
+        return self._manifest
+    
+    def _load_manifest(self) -> Dict:
+        if self.manifest_file.exists():
+            try:
+                manifest = safe_read_json(self.manifest_file)
+                if manifest.get("version") == self.MANIFEST_VERSION and manifest.get("period") == self.period:
+                    self._manifest = manifest
+                    self._reconcile_manifest()
+                    return manifest
+                logger.warning("分片 manifest 版本或週期不符，重新建立")
+            except Exception as e:
+                logger.warning(f"分片 manifest 無法讀取，重新建立: {str(e)}")
+        
+        manifest = {"version": self.MANIFEST_VERSION, "period": self.period, "shards": {}}
+        self._manifest = manifest
+        self.refresh_manifest(self._existing_keys())
+        return manifest
+    
+    def _reconcile_manifest(self) -> None:
+        """
+        更新與現有分片不一致的 manifest 項目
+        
+        寫入器自動寫出緩衝資料時不會更新 manifest，若程序在更新前中斷，
+        新建立的分片不在 manifest 中、既有分片的大小也與紀錄不同。
+        """
+        shards = self._manifest["shards"]
+        existing = self._existing_keys()
+        stale = [
+            key for key in existing
+            if key not in shards or shards[key].get("size") != self.shard_path(key).stat().st_size
+        ]
+        stale.extend(key for key in shards if key not in existing)
+        
+        if stale:
+            logger.warning("分片 manifest 與現有分片不一致，更新 %d 個分片", len(stale))
+            self.refresh_manifest(stale)
+    
+    def _existing_keys(self) -> List[str]:
+        if not self.shards_dir.exists():
+            return []
+        return sorted(path.stem[len("news-"):] for path in self.shards_dir.glob("news-*.jsonl"))
+    
+    def refresh_manifest(self, keys: Optional[List[str]] = None) -> None:
+        """
+        重新計算指定分片的統計資料並寫入 manifest
+        
+        Args:
+            keys: 要更新的分片鍵，預設為全部分片
+        """
+        manifest = self._manifest if self._manifest is not None else self.manifest
+        shards = manifest["shards"]
+        
+        for key in (keys if keys is not None else self._existing_keys()):
+            path = self.shard_path(key)
+            if not path.exists():
+                shards.pop(key, None)
+                continue
+            shards[key] = self._shard_stats(path)
+        
+        manifest["shards"] = dict(sorted(shards.items()))
+        manifest["updated_at"] = datetime.now().isoformat()
+        atomic_write_json(self.manifest_file, manifest)
+    
+    def _shard_stats(self, path: Path) -> Dict:
+        """掃描單一分片，計算筆數、ID範圍、日期範圍與校驗碼"""
+        digest = hashlib.sha256()
+        ids, dates = [], []
+        
+        with open(path, "rb") as f:
+            for line in f:
+                digest.update(line)
+                if not line.strip():
+                    continue
+                try:
+                    data = fast_loads(line)
+                except JSONDecodeError:
+                    continue
+                ids.append(data.get("id", ""))
+                dates.append(data.get("published_date", ""))
+        
+        return {
+            "file": path.name,
+            "count": len(ids),
+            "min_id": min(ids) if ids else None,
+            "max_id": max(ids) if ids else None,
+            "start_date": min(dates) if dates else None,
+            "end_date": max(dates) if dates else None,
+            "size": path.stat().st_size,
+            "sha256": digest.hexdigest(),
+        }
+    
+    def _data_files(self) -> List[Path]:
+        return [self.shard_path(key) for key in self.manifest["shards"]]
+    
+    def shards_between(self, start_date: str, end_date: str) -> List[Path]:
+        """
+        取得與日期範圍重疊的分片
+        
+        Args:
+            start_date: 起始日期（含），YYYY-MM-DD
+            end_date: 結束日期（含），YYYY-MM-DD
+        
+        Returns:
+            依時間排序的分片路徑列表
+        """
+        paths = []
+        
+        for key, stats in self.manifest["shards"].items():
+            if not stats.get("count"):
+                continue
+            if stats["end_date"] < start_date or stats["start_date"] > end_date:
+                continue
+            paths.append(self.shard_path(key))
+        
+        return paths
+    
+    def papers_between(self, start: DateLike, end: DateLike) -> List[Paper]:
+        """
+        取得發布日期在指定範圍內的論文（只讀取涵蓋該範圍的分片）
+        
+        Args:
+            start: 起始日期（含）
+            end: 結束日期（含）
+        
+        Returns:
+            依發布日期由舊到新排列的論文列表
+        """
+        start_date, end_date = to_date_string(start), to_date_string(end)
+        latest: Dict[str, tuple] = {}
+        
+        for position, line in self._iter_data_lines(files=self.shards_between(start_date, end_date)):
+            try:
+                data = fast_loads(line)
+            except JSONDecodeError as e:
+                logger.warning(f"解析{position} 行失敗: {str(e)}")
+                continue
+            if start_date <= (data.get("published_date") or "") <= end_date:
+                # 同一ID以最後寫入的紀錄為準
+                latest[data.get("id")] = (data.get("published_date"), line)
+        
+        records = [line for _, line in sorted(latest.values(), key=lambda item: item[0])]
+        return self._records_to_papers(records)
+    
+    def writer(self, batch_size: Optional[int] = None) -> "ShardedWriter":
+        """
+        建立分片寫入器，論文依發布日期寫入對應分片
+        
+        Args:
+            batch_size: 每批寫入的紀錄數量，預設為 Config.WRITE_BATCH_SIZE
+        
+        Returns:
+            需以 with 語法使用的寫入器
+        """
+        return ShardedWriter(self, batch_size or self.config.WRITE_BATCH_SIZE)
+    
+    def get_paper_by_id(self, paper_id: str) -> Optional[Paper]:
+        """
+        根據ID取得特定論文（只掃描ID範圍涵蓋該ID的分片）
+        
+        Args:
+            paper_id: 論文ID
+        
+        Returns:
+            論文物件或None
+        """
+        candidates = [
+            self.shard_path(key)
+            for key, stats in self.manifest["shards"].items()
+            if stats.get("count") and stats["min_id"] <= paper_id <= stats["max_id"]
+        ]
+        
+        for position, line in self._iter_data_lines(reverse=True, files=candidates):
+            try:
+                if fast_loads(line).get("id") == paper_id:
+                    return Paper.model_validate_json(line)
+            except Exception as e:
+                logger.warning(f"建立論文物件失敗 ({position} 行): {str(e)}")
+        
+        return None
+    
+    def compact(self) -> int:
+        """
+        移除各分片中重複的論文ID，每個ID只保留最新的一筆紀錄
+        
+        同一篇論文的發布日期固定，重複紀錄必然落在同一個分片，
+        因此可以逐一分片壓縮，只重寫有重複的分片。
+        
+        Returns:
+            移除的紀錄數量
+        """
+        removed_total = 0
+        changed = []
+        
+        for key in list(self.manifest["shards"]):
+            kept, removed = compact_jsonl(self.shard_path(key))
+            if removed:
+                removed_total += removed
+                changed.append(key)
+        
+        if changed:
+            self.refresh_manifest(changed)
+        
+        logger.info(f"分片壓縮完成，共移除 {removed_total} 筆重複紀錄")
+        return removed_total
+    
+    def import_jsonl(self, source: Optional[Path] = None) -> int:
+        """
+        將單一 JSONL 檔案切分為分片
+        
+        Args:
+            source: JSONL 檔案路徑，預設為 Config.NEWS_FILE
+        
+        Returns:
+            匯入的論文數量
+        """
+        source = source or self.config.NEWS_FILE
+        
+        with self.writer() as writer:
+            for position, line in self._iter_data_lines(files=[source]):
+                try:
+                    writer.write(Paper.model_validate_json(line))
+                except Exception as e:
+                    logger.warning(f"略過 {position} 行: {str(e)}")
+        
+        logger.info(f"已將 {writer.records_written} 篇論文匯入分片")
+        return writer.records_written
+    
+    def export_jsonl(self, output: Optional[Path] = None) -> int:
+        """
+        將所有分片依時間順序合併為單一 JSONL 檔案
+        
+        Args:
+            output: 輸出檔案路徑，預設為 Config.NEWS_FILE
+        
+        Returns:
+            匯出的論文數量
+        """
+        output = output or self.config.NEWS_FILE
+        tmp_file = output.with_name(output.name + ".tmp")
+        count = 0
+        
+        try:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                for _, line in self._iter_data_lines():
+                    f.write(line + b"\n")
+                    count += 1
+            tmp_file.replace(output)
+        except OSError as e:
+            error_msg = f"匯出 JSONL 失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        if output == self.config.NEWS_FILE:
+            self.index.invalidate()
+        
+        logger.info(f"已匯出 {count} 篇論文到: {output}")
+        return count
+    
+    def _may_have_duplicates(self) -> bool:
+        """位移索引只涵蓋 news.jsonl，分片一律逐行檢查"""
+        return True
+    
+    def _after_rewrite(self, files: List[Path]) -> None:
+        """分片被改寫後更新對應的 manifest 項目"""
+        super()._after_rewrite(files)
+        self.refresh_manifest([path.stem[len("news-"):] for path in files])
+    
+    def _after_restore(self) -> None:
+        """還原備份後依現有分片重建 manifest"""
+        super()._after_restore()
+        if self.manifest_file.exists():
+            self.manifest_file.unlink()
+        self._manifest = self._load_manifest()
+
+
+class ShardedWriter:
+    """分片寫入器，為每個分片維護一個 JsonlWriter"""
+    
+    def __init__(self, storage: ShardedStorageService, batch_size: int = 32):
+        self.storage = storage
+        self.batch_size = batch_size
+        self._writers: Dict[str, JsonlWriter] = {}
+        self._touched = set()
+    
+    @property
+    def records_written(self) -> int:
+        return sum(writer.records_written for writer in self._writers.values())
+    
+    def __enter__(self) -> "ShardedWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self.flush()
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+    
+    def write(self, paper: Paper) -> None:
+        """將論文寫入對應的分片"""
+        key = self.storage.shard_key(paper.published_date)
+        
+        writer = self._writers.get(key)
+        if writer is None:
+            writer = JsonlWriter(
+                self.storage.shard_path(key),
+                batch_size=self.batch_size,
+                fsync=self.storage.config.FSYNC_WRITES
+            )
+            self._writers[key] = writer
+        
+        writer.write(paper)
+        self._touched.add(key)
+    
+    def flush(self) -> None:
+        """寫出所有分片的緩衝資料並更新 manifest"""
+        for writer in self._writers.values():
+            writer.flush()
+        
+        if self._touched:
+            self.storage.refresh_manifest(sorted(self._touched))
+            self._touched.clear()
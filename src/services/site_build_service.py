@@ -0,0 +1,220 @@
+"""
+網站建置服務
+
+將 docs/ 建置到部署用的輸出目錄：
+- CSS／JS 以內容雜湊命名（例如 ``index.3f2a9c1b7d.js``），可讓瀏覽器與 CDN 永久快取
+- 輸出 ``asset-manifest.json`` 記錄每個檔案的雜湊與實際檔名，
+  資料的進入點（分頁索引、搜尋索引 manifest、訂閱源與完整資料檔）的版本內嵌到 index.html，
+  前端以 ``?v=<hash>`` 取得最新內容；分頁與搜尋分片的版本由這些進入點列出
+- 只重寫內容有變動的檔案，並移除來源中已不存在的檔案
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..utils.file_utils import atomic_write_bytes, atomic_write_json, safe_read_json
+from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
+
+logger = get_logger(__name__)
+
+
+class SiteBuildService:
+    """以內容雜湊為基礎的增量網站建置"""
+    
+    STATE_VERSION = 1
+    MANIFEST_NAME = "asset-manifest.json"
+    # 以雜湊命名的靜態資源副檔名
+    HASHED_SUFFIXES = {".css", ".js"}
+    HASH_LENGTH = 10
+    
+    def __init__(self, config: Config = None):
+        self.config = config or Config()
+        self.source_dir = self.config.DATA_DIR.parent
+        self.output_dir = self.config.SITE_BUILD_DIR
+        self.state_file = self.config.SITE_BUILD_STATE_FILE
+        # 放在 docs/ 底下但不應部署的內部檔案
+        self.excluded = {self.config.PROCESSED_IDS_FILE, self.config.PROCESSED_IDS_LOG_FILE}
+        # 內嵌版本到 index.html 的資料進入點，其他資料檔的版本由進入點列出，index.html 不隨資料量增長
+        self.entry_points = {
+            self._relative(path) for path in (
+                self.config.SITE_PAGES_DIR / "index.json",
+                self.config.SEARCH_INDEX_DIR / "manifest.json",
+                self.config.FEED_FILE,
+                self.config.NEWS_FILE,
+            )
+        }
+    
+    def build(self) -> Dict:
+        """
+        建置網站
+        
+        Returns:
+            建置統計：寫入、未變動與移除的檔案數，以及寫入的位元組數
+        
+        Raises:
+            StorageError: 建置失敗時拋出
+        """
+        state = self._load_state()
+        sources = state["sources"]
+        outputs = state["outputs"]
+        new_sources, new_outputs, manifest = {}, {}, {}
+        stats = {"written": 0, "unchanged": 0, "removed": 0, "bytes": 0}
+        
+        try:
+            html_files = []
+            
+            for path in sorted(self._iter_source_files()):
+                rel = path.relative_to(self.source_dir).as_posix()
+                digest = self._cached_hash(path, sources.get(rel))
+                stat = path.stat()
+                new_sources[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+                
+                if path.suffix == ".html":
+                    html_files.append((rel, path))
+                    continue
+                
+                output_rel = self._output_name(rel, digest)
+                manifest[rel] = {"file": output_rel, "sha256": digest, "size": stat.st_size}
+                self._emit(output_rel, digest, outputs, new_outputs, stats, source=path)
+            
+            # HTML 最後處理，才能改寫為雜湊後的資源檔名
+            for rel, path in html_files:
+                content = self._render_html(path.read_text(encoding="utf-8"), manifest).encode("utf-8")
+                digest = hashlib.sha256(content).hexdigest()
+                manifest[rel] = {"file": rel, "sha256": digest, "size": len(content)}
+                self._emit(rel, digest, outputs, new_outputs, stats, data=content)
+            
+            manifest_data = json.dumps(
+                {"version": self.STATE_VERSION, "files": manifest}, ensure_ascii=False, indent=2
+            ).encode("utf-8")
+            self._emit(self.MANIFEST_NAME, hashlib.sha256(manifest_data).hexdigest(),
+                       outputs, new_outputs, stats, data=manifest_data)
+            
+            for output_rel in set(outputs) - set(new_outputs):
+                target = self.output_dir / output_rel
+                if target.exists():
+                    target.unlink()
+                    stats["removed"] += 1
+            
+            atomic_write_json(self.state_file, {
+                "version": self.STATE_VERSION,
+                "sources": new_sources,
+                "outputs": new_outputs,
+            }, indent=None)
+        
+        except OSError as e:
+            error_msg = f"網站建置失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        get_run_metrics().incr("bytes_written", stats["bytes"])
+        logger.info(
+            f"網站建置完成：寫入 {stats['written']} 個檔案（{stats['bytes']} bytes），"
+            f"未變動 {stats['unchanged']} 個，移除 {stats['removed']} 個"
+        )
+        return stats
+    
+    def _iter_source_files(self):
+        for root, dirs, files in os.walk(self.source_dir):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                path = Path(root) / name
+                if name.startswith(".") or name.endswith(".tmp") or path in self.excluded:
+                    continue
+                yield path
+    
+    def _relative(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.source_dir).as_posix()
+        except ValueError:
+            return path.as_posix()
+    
+    def _output_name(self, rel: str, digest: str) -> str:
+        """CSS／JS 以內容雜湊命名，其他檔案維持原路徑"""
+        path = Path(rel)
+        if path.suffix not in self.HASHED_SUFFIXES:
+            return rel
+        return path.with_name(f"{path.stem}.{digest[:self.HASH_LENGTH]}{path.suffix}").as_posix()
+    
+    def _emit(self, output_rel: str, digest: str, outputs: Dict, new_outputs: Dict, stats: Dict,
+              source: Optional[Path] = None, data: Optional[bytes] = None) -> None:
+        """內容有變動時才寫入輸出檔案"""
+        target = self.output_dir / output_rel
+        new_outputs[output_rel] = digest
+        
+        unchanged = outputs.get(output_rel) == digest and target.exists()
+        get_run_metrics().cache("site_build", hit=unchanged)
+        if unchanged:
+            stats["unchanged"] += 1
+            return
+        
+        if data is not None:
+            atomic_write_bytes(target, data)
+            stats["bytes"] += len(data)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = target.with_name(target.name + ".tmp")
+            shutil.copyfile(source, tmp_file)
+            os.replace(tmp_file, target)
+            stats["bytes"] += target.stat().st_size
+        
+        stats["written"] += 1
+    
+    def _render_html(self, html: str, manifest: Dict) -> str:
+        """將 HTML 中的資源參照改為雜湊檔名，並內嵌資料進入點的版本"""
+        for rel, entry in manifest.items():
+            if Path(rel).suffix in self.HASHED_SUFFIXES and entry["file"] != rel:
+                html = re.sub(
+                    r'(["\'])(\./)?' + re.escape(rel) + r'\1',
+                    lambda match: f"{match.group(1)}{match.group(2) or ''}{entry['file']}{match.group(1)}",
+                    html,
+                )
+        
+        versions = {
+            rel: entry["sha256"][:self.HASH_LENGTH]
+            for rel, entry in manifest.items()
+            if rel in self.entry_points
+        }
+        script = (
+            "<script>window.ASSET_VERSIONS = "
+            + json.dumps(versions, ensure_ascii=False, separators=(",", ":"))
+            + ";</script>\n"
+        )
+        
+        position = html.find("<script")
+        if position == -1:
+            position = html.find("</body>")
+        if position == -1:
+            return html + script
+        return html[:position] + script + "    " + html[position:]
+    
+    @staticmethod
+    def _cached_hash(path: Path, cached: Optional[Dict]) -> str:
+        """檔案大小與修改時間未變時沿用上次的雜湊"""
+        stat = path.stat()
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_state(self) -> Dict:
+        if self.state_file.exists():
+            try:
+                state = safe_read_json(self.state_file)
+                if state.get("version") == self.STATE_VERSION:
+                    return state
+            except Exception as e:
+                logger.warning(f"網站建置狀態無法讀取，將完整建置: {str(e)}")
+        return {"version": self.STATE_VERSION, "sources": {}, "outputs": {}}
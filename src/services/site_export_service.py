@@ -0,0 +1,174 @@
+"""
+網站靜態資料匯出服務
+
+將論文資料匯出為前端使用的分頁 JSON：
+- ``latest.json``：最新的少量論文（由新到舊），用於首屏渲染
+- ``page-NNNN.json``：依寫入順序由舊到新編號的分頁，已寫滿的分頁內容固定不變
+- ``index.json``：總筆數、每頁筆數與各分頁的網址（網址帶有內容版本 ``?v=<hash>``，分頁可長期快取）
+
+每個檔案都會預先壓縮出 ``.gz``（安裝 brotli 時另有 ``.br``），
+內容沒有變動的檔案不會重寫。
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..core.config import Config
+from ..core.exceptions import StorageError
+from ..utils.file_utils import write_precompressed
+from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
+from .storage_service import StorageService
+
+logger = get_logger(__name__)
+
+
+class SiteExportService:
+    """網站分頁資料匯出服務"""
+    
+    # 不輸出到前端的欄位
+    INTERNAL_FIELDS = ("usage", "translation_model", "prompt_version", "tts_model", "tts_voice")
+    
+    def __init__(self, config: Config = None, storage: Optional[StorageService] = None):
+        self.config = config or Config()
+        self.storage = storage or StorageService(self.config)
+        self.pages_dir = self.config.SITE_PAGES_DIR
+        self.page_size = max(1, self.config.SITE_PAGE_SIZE)
+        self.latest_count = max(1, self.config.SITE_LATEST_COUNT)
+    
+    def export(self) -> Dict:
+        """
+        匯出分頁資料
+        
+        Returns:
+            匯出統計，包含總筆數、分頁數與實際重寫的檔案數
+        
+        Raises:
+            StorageError: 寫入失敗時拋出
+        """
+        articles = self._collect_articles()
+        pages = [articles[i:i + self.page_size] for i in range(0, len(articles), self.page_size)]
+        
+        try:
+            written = 0
+            page_entries = []
+            
+            for number, page in enumerate(pages, 1):
+                name = self.page_name(number)
+                payload = {"page": number, "count": len(page), "articles": page[::-1]}
+                written += self._write_if_changed(self.pages_dir / name, payload)
+                page_entries.append({
+                    "page": number,
+                    "url": self._url(name, payload),
+                    "count": len(page),
+                    "start_date": min(article.get("published_date") or "" for article in page),
+                    "end_date": max(article.get("published_date") or "" for article in page),
+                })
+            
+            latest = articles[-self.latest_count:][::-1]
+            latest_payload = {"count": len(latest), "articles": latest}
+            written += self._write_if_changed(self.pages_dir / "latest.json", latest_payload)
+            
+            index = {
+                "total": len(articles),
+                "page_size": self.page_size,
+                "latest": {"url": self._url("latest.json", latest_payload), "count": len(latest)},
+                # 由新到舊排列，前端依序延遲載入
+                "pages": page_entries[::-1],
+            }
+            written += self._write_if_changed(self.pages_dir / "index.json", index, stamp=True)
+            
+            self._remove_stale_pages(len(pages))
+        
+        except OSError as e:
+            error_msg = f"匯出網站分頁資料失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(f"網站分頁資料匯出完成：{len(articles)} 篇論文、{len(pages)} 個分頁，重寫 {written} 個檔案")
+        return {"total": len(articles), "pages": len(pages), "written": written}
+    
+    @staticmethod
+    def page_name(number: int) -> str:
+        """取得分頁檔名"""
+        return f"page-{number:04d}.json"
+    
+    def _url(self, name: str, payload: Dict) -> str:
+        """取得相對於網站根目錄、帶有內容版本的網址"""
+        version = hashlib.sha256(self._dumps(payload)).hexdigest()[:10]
+        try:
+            relative = (self.pages_dir / name).relative_to(self.config.DATA_DIR.parent).as_posix()
+        except ValueError:
+            relative = name
+        return f"{relative}?v={version}"
+    
+    def _collect_articles(self) -> List[Dict]:
+        """依寫入順序（由舊到新）取得論文，重複ID以最後寫入的紀錄為準"""
+        latest: Dict[str, Dict] = {}
+        
+        for record in self.storage.iter_records():
+            data = record.to_dict()
+            # API 用量與產生內容的版本只供內部使用，不輸出到前端
+            for field in self.INTERNAL_FIELDS:
+                data.pop(field, None)
+            # 重新插入讓重複的論文移到最後寫入的位置，與 compact 的結果一致
+            latest.pop(data["id"], None)
+            latest[data["id"]] = data
+        
+        return list(latest.values())
+    
+    def _write_if_changed(self, path: Path, payload: Dict, stamp: bool = False) -> bool:
+        """
+        內容有變動時才寫入 JSON 及其預先壓縮版本
+        
+        Args:
+            path: 檔案路徑
+            payload: JSON 內容
+            stamp: 是否加入更新時間（只在內容變動時更新）
+        
+        Returns:
+            是否重寫了檔案
+        """
+        data = self._dumps(payload)
+        digest = hashlib.sha256(data).hexdigest()
+        metrics = get_run_metrics()
+        
+        if stamp:
+            payload = dict(payload, content_sha256=digest)
+            if path.exists():
+                try:
+                    if json.loads(path.read_bytes()).get("content_sha256") == digest:
+                        metrics.cache("site_pages", hit=True)
+                        return False
+                except ValueError:
+                    pass
+            payload["updated_at"] = datetime.now().isoformat()
+            data = self._dumps(payload)
+        elif path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+            metrics.cache("site_pages", hit=True)
+            return False
+        
+        metrics.cache("site_pages", hit=False)
+        write_precompressed(path, data)
+        metrics.incr("bytes_written", len(data))
+        return True
+    
+    def _remove_stale_pages(self, page_count: int) -> None:
+        """移除超出目前分頁數的舊分頁檔案（例如壓縮資料後）"""
+        if not self.pages_dir.exists():
+            return
+        
+        for path in self.pages_dir.glob("page-*.json*"):
+            try:
+                number = int(path.name[len("page-"):].split(".", 1)[0])
+            except ValueError:
+                continue
+            if number > page_count:
+                path.unlink()
+    
+    @staticmethod
+    def _dumps(payload: Dict) -> bytes:
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
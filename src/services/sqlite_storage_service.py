@@ -0,0 +1,538 @@
+"""
+SQLite 資料儲存服務
+
+以標準函式庫 sqlite3（WAL 模式）實作的 StorageService 後端，
+論文資料與已處理ID存放在同一個資料庫中，寫入具備交易保證。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from ..core.config import Config
+from ..core.models import Paper, PaperRecord
+from ..core.exceptions import StorageError
+from ..utils.date_utils import to_date_string
+from ..utils.json_utils import fast_loads, JSONDecodeError
+from ..utils.logging_utils import get_logger
+from .storage_service import DateLike, StorageService
+
+logger = get_logger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    query TEXT NOT NULL,
+    published_date TEXT NOT NULL,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_published_date ON papers(published_date);
+CREATE INDEX IF NOT EXISTS idx_papers_query ON papers(query);
+CREATE TABLE IF NOT EXISTS processed_ids (
+    id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStorageService(StorageService):
+    """SQLite 資料儲存服務"""
+    
+    def __init__(self, config: Config = None, db_path: Optional[Path] = None):
+        super().__init__(config)
+        self.db_path = db_path or self.config.SQLITE_DB_FILE
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """開啟資料庫連線並建立資料表"""
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            return conn
+        
+        except sqlite3.Error as e:
+            error_msg = f"開啟 SQLite 資料庫失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+    
+    def close(self) -> None:
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
+    
+    def open_processed_ids(self) -> Set[str]:
+        """
+        開啟已處理論文ID集合
+        
+        Returns:
+            已處理的論文ID集合
+        """
+        return self.load_processed_ids()
+    
+    def load_processed_ids(self) -> Set[str]:
+        """
+        載入已處理的論文ID
+        
+        Returns:
+            已處理的論文ID集合
+        """
+        try:
+            with self._lock:
+                rows = self._conn.execute("SELECT id FROM processed_ids").fetchall()
+            
+            ids = {row[0] for row in rows}
+            logger.info(f"載入 {len(ids)} 個已處理的論文ID")
+            return ids
+        
+        except sqlite3.Error as e:
+            logger.error(f"載入已處理ID失敗: {str(e)}")
+            return set()
+    
+    def save_processed_ids(self, ids: Iterable[str]) -> None:
+        """
+        儲存已處理的論文ID（只會新增，不會刪除既有ID）
+        
+        Args:
+            ids: 論文ID集合
+        
+        Raises:
+            StorageError: 儲存失敗時拋出
+        """
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO processed_ids (id) VALUES (?)",
+                    ((paper_id,) for paper_id in ids)
+                )
+            
+            logger.info("已儲存已處理的論文ID")
+        
+        except sqlite3.Error as e:
+            error_msg = f"儲存已處理ID失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+    
+    def writer(self, batch_size: Optional[int] = None) -> "SQLiteBatchWriter":
+        """
+        建立批次寫入器，每批論文以單一交易寫入
+        
+        Args:
+            batch_size: 每批寫入的紀錄數量，預設為 Config.WRITE_BATCH_SIZE
+        
+        Returns:
+            需以 with 語法使用的寫入器
+        """
+        return SQLiteBatchWriter(self, batch_size or self.config.WRITE_BATCH_SIZE)
+    
+    def save_paper(self, paper: Paper) -> None:
+        """
+        儲存論文資料，並在同一交易中標記為已處理
+        
+        Args:
+            paper: 論文物件
+        
+        Raises:
+            StorageError: 儲存失敗時拋出
+        """
+        self.save_papers([paper])
+        logger.debug(f"論文資料已儲存: {paper.id}")
+    
+    def save_papers(self, papers: List[Paper]) -> None:
+        """
+        以單一交易批次儲存多篇論文
+        
+        Args:
+            papers: 論文列表
+        
+        Raises:
+            StorageError: 儲存失敗時拋出
+        """
+        rows = [
+            (
+                paper.id,
+                paper.query,
+                paper.published_date,
+                paper.timestamp,
+                json.dumps(paper.model_dump(), ensure_ascii=False)
+            )
+            for paper in papers
+        ]
+        
+        try:
+            with self._lock, self._conn:
+                # REPLACE 會刪除舊紀錄再插入，使更新過的論文排到最新
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO papers (id, query, published_date, timestamp, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO processed_ids (id) VALUES (?)",
+                    ((row[0],) for row in rows)
+                )
+        
+        except sqlite3.Error as e:
+            error_msg = f"儲存論文資料失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+    
+    def iter_papers(self, reverse: bool = False, page_size: int = 256) -> Iterator[Paper]:
+        """
+        逐頁串流讀取論文資料
+        
+        Args:
+            reverse: 是否由最新往最舊讀取
+            page_size: 每次查詢的筆數
+        
+        Returns:
+            論文迭代器
+        """
+        for data in self._iter_data(reverse, page_size):
+            try:
+                yield Paper.model_validate_json(data)
+            except Exception as e:
+                logger.warning(f"建立論文物件失敗: {str(e)}")
+                continue
+    
+    def _iter_data(self, reverse: bool, page_size: int) -> Iterator[str]:
+        """以 seq 做鍵集分頁讀取 JSON 資料，不會長時間持有連線鎖"""
+        if reverse:
+            sql = "SELECT seq, data FROM papers WHERE seq < ? ORDER BY seq DESC LIMIT ?"
+            cursor = float("inf")
+        else:
+            sql = "SELECT seq, data FROM papers WHERE seq > ? ORDER BY seq LIMIT ?"
+            cursor = 0
+        
+        while True:
+            try:
+                with self._lock:
+                    rows = self._conn.execute(sql, (cursor, page_size)).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"載入論文資料失敗: {str(e)}")
+                return
+            
+            if not rows:
+                return
+            
+            cursor = rows[-1][0]
+            for _, data in rows:
+                yield data
+    
+    def iter_records(self, reverse: bool = False, page_size: int = 1024) -> Iterator[PaperRecord]:
+        """
+        以快速解碼逐筆讀取論文紀錄（不經過 pydantic 驗證）
+        
+        Args:
+            reverse: 是否由最新往最舊讀取
+            page_size: 每次查詢的筆數
+        
+        Returns:
+            輕量論文紀錄迭代器
+        """
+        for data in self._iter_data(reverse, page_size):
+            try:
+                yield PaperRecord.from_dict(fast_loads(data))
+            except (JSONDecodeError, TypeError) as e:
+                logger.warning(f"解析論文紀錄失敗: {str(e)}")
+                continue
+    
+    def load_papers(self, limit: Optional[int] = None, newest_first: bool = False) -> List[Paper]:
+        """
+        載入論文資料
+        
+        Args:
+            limit: 限制載入的論文數量
+            newest_first: 是否由最新的論文開始載入
+        
+        Returns:
+            論文列表
+        """
+        order = "DESC" if newest_first else "ASC"
+        sql = f"SELECT data FROM papers ORDER BY seq {order}"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
+        
+        try:
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"載入論文資料失敗: {str(e)}")
+            return []
+        
+        papers = self._rows_to_papers(rows)
+        logger.info(f"載入 {len(papers)} 篇論文")
+        return papers
+    
+    def get_paper_by_id(self, paper_id: str) -> Optional[Paper]:
+        """
+        根據ID取得特定論文
+        
+        Args:
+            paper_id: 論文ID
+        
+        Returns:
+            論文物件或None
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data FROM papers WHERE id = ?", (paper_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"查詢論文失敗 ({paper_id}): {str(e)}")
+            return None
+        
+        if row is None:
+            return None
+        
+        papers = self._rows_to_papers([row])
+        return papers[0] if papers else None
+    
+    def papers_between(self, start: DateLike, end: DateLike) -> List[Paper]:
+        """
+        取得發布日期在指定範圍內的論文（使用 published_date 索引）
+        
+        Args:
+            start: 起始日期（含）
+            end: 結束日期（含）
+        
+        Returns:
+            依發布日期由舊到新排列的論文列表
+        """
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT data FROM papers WHERE published_date BETWEEN ? AND ? "
+                    "ORDER BY published_date, seq",
+                    (to_date_string(start), to_date_string(end))
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"日期範圍查詢失敗: {str(e)}")
+            return []
+        
+        return self._rows_to_papers(rows)
+    
+    def update_records(self, changes: Dict[str, Dict[str, Any]]) -> int:
+        """
+        在單一交易中更新既有論文紀錄的欄位（保留原本的排列順序）
+        
+        Args:
+            changes: 論文ID對應要更新的欄位
+        
+        Returns:
+            更新的紀錄數量
+        
+        Raises:
+            StorageError: 更新失敗時拋出
+        """
+        if not changes:
+            return 0
+        
+        try:
+            with self._lock, self._conn:
+                rows = []
+                for paper_id, fields in changes.items():
+                    row = self._conn.execute("SELECT data FROM papers WHERE id = ?", (paper_id,)).fetchone()
+                    if row is None:
+                        continue
+                    data = json.loads(row[0])
+                    data.update(fields)
+                    rows.append((
+                        data.get("query", ""),
+                        data.get("published_date", ""),
+                        data.get("timestamp"),
+                        json.dumps(data, ensure_ascii=False),
+                        paper_id,
+                    ))
+                self._conn.executemany(
+                    "UPDATE papers SET query = ?, published_date = ?, timestamp = ?, data = ? WHERE id = ?",
+                    rows
+                )
+        
+        except sqlite3.Error as e:
+            error_msg = f"更新論文紀錄失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(f"已更新 {len(rows)} 筆論文紀錄")
+        return len(rows)
+    
+    def backup_data(self, backup_path: Optional[Path] = None) -> Path:
+        """
+        使用 SQLite 線上備份 API 備份資料庫
+        
+        Args:
+            backup_path: 備份檔案路徑
+        
+        Returns:
+            備份檔案路徑
+        """
+        if backup_path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = self.db_path.parent / f"backup_{timestamp}.db"
+        
+        try:
+            target = sqlite3.connect(str(backup_path))
+            try:
+                with self._lock:
+                    self._conn.backup(target)
+            finally:
+                target.close()
+            
+            logger.info(f"資料已備份到: {backup_path}")
+            return backup_path
+        
+        except sqlite3.Error as e:
+            error_msg = f"資料備份失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+    
+    def compact(self) -> int:
+        """
+        整理資料庫檔案（id 欄位具唯一性，不會有重複紀錄）
+        
+        Returns:
+            移除的紀錄數量（恆為 0）
+        """
+        try:
+            with self._lock:
+                self._conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            error_msg = f"整理資料庫失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info("資料庫整理完成")
+        return 0
+    
+    def import_jsonl(self, source: Optional[Path] = None, processed_ids_file: Optional[Path] = None) -> int:
+        """
+        從 JSONL 檔案匯入論文與已處理ID
+        
+        Args:
+            source: JSONL 檔案路徑，預設為 Config.NEWS_FILE
+            processed_ids_file: 已處理ID檔案，預設為 Config.PROCESSED_IDS_FILE
+        
+        Returns:
+            匯入的論文數量
+        """
+        source = source or self.config.NEWS_FILE
+        papers = []
+        
+        try:
+            with open(source, "r", encoding="utf-8") as f:
+                for line_num, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        papers.append(Paper(**json.loads(line)))
+                    except Exception as e:
+                        logger.warning(f"略過第 {line_num} 行: {str(e)}")
+        except OSError as e:
+            error_msg = f"讀取 JSONL 檔案失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        self.save_papers(papers)
+        
+        ids_file = processed_ids_file or self.config.PROCESSED_IDS_FILE
+        if ids_file.exists():
+            with open(ids_file, "r", encoding="utf-8") as f:
+                self.save_processed_ids(line.strip() for line in f if line.strip())
+        
+        logger.info(f"已從 JSONL 匯入 {len(papers)} 篇論文")
+        return len(papers)
+    
+    def export_jsonl(self, output: Optional[Path] = None) -> int:
+        """
+        將資料庫內容匯出為 JSONL 檔案（依寫入順序）
+        
+        Args:
+            output: 輸出檔案路徑，預設為 Config.NEWS_FILE
+        
+        Returns:
+            匯出的論文數量
+        """
+        output = output or self.config.NEWS_FILE
+        tmp_file = output.with_suffix(output.suffix + ".tmp")
+        count = 0
+        
+        try:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            
+            with self._lock:
+                rows = self._conn.execute("SELECT data FROM papers ORDER BY seq").fetchall()
+            
+            with open(tmp_file, "w", encoding="utf-8", newline="\n") as f:
+                for (data,) in rows:
+                    f.write(data + "\n")
+                    count += 1
+            
+            os.replace(tmp_file, output)
+            if output == self.config.NEWS_FILE:
+                self.index.invalidate()
+        
+        except (OSError, sqlite3.Error) as e:
+            error_msg = f"匯出 JSONL 失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(f"已匯出 {count} 篇論文到: {output}")
+        return count
+    
+    def _rows_to_papers(self, rows: list) -> List[Paper]:
+        """將資料列轉換為論文物件，略過無法解析的紀錄"""
+        papers = []
+        
+        for (data,) in rows:
+            try:
+                papers.append(Paper.model_validate_json(data))
+            except Exception as e:
+                logger.warning(f"建立論文物件失敗: {str(e)}")
+                continue
+        
+        return papers
+
+
+class SQLiteBatchWriter:
+    """SQLite 批次寫入器，介面與 JsonlWriter 相同"""
+    
+    def __init__(self, storage: SQLiteStorageService, batch_size: int = 32):
+        self.storage = storage
+        self.batch_size = max(1, batch_size)
+        self._buffer: List[Paper] = []
+        self.records_written = 0
+    
+    def __enter__(self) -> "SQLiteBatchWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+    
+    def write(self, paper: Paper) -> None:
+        """將論文加入寫入緩衝，緩衝滿時自動寫出"""
+        self._buffer.append(paper)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> None:
+        """以單一交易寫出所有緩衝的論文"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self.storage.save_papers(batch)
+        self.records_written += len(batch)
@@ -4,23 +4,59 @@
 負責處理論文資料的讀取、儲存和管理。
 """
 
+import gzip
 import json
-from typing import Set, List, Optional
+import os
+import re
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Set, List, Optional, Union
 from pathlib import Path
 
 from ..core.config import Config
-from ..core.models import Paper
+from ..core.models import Paper, PaperRecord
 from ..core.exceptions import StorageError
+from ..utils.date_utils import days_ago, to_date_string
+from ..utils.file_utils import atomic_write_bytes, iter_lines_reverse
+from ..utils.json_utils import fast_loads, JSONDecodeError
 from ..utils.logging_utils import get_logger
+from .paper_index import PaperIndex
+from .jsonl_writer import JsonlWriter, compact_jsonl
+from .processed_id_store import ProcessedIdStore
 
 logger = get_logger(__name__)
 
+# 資料行中的論文ID欄位（字串中的引號會被跳脫，不會誤判）
+_ID_PATTERN = re.compile(rb'"id"\s*:\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+
+DateLike = Union[str, date, datetime]
+
 
 class StorageService:
     """資料儲存服務"""
     
     def __init__(self, config: Config = None):
         self.config = config or Config()
+        self.index = PaperIndex(self.config.NEWS_FILE, self.config.NEWS_INDEX_FILE)
+        self._processed_ids: Optional[ProcessedIdStore] = None
+    
+    def open_processed_ids(self) -> ProcessedIdStore:
+        """
+        開啟已處理論文ID集合（不會將全部ID載入記憶體）
+        
+        Returns:
+            與 set 介面相容的已處理ID集合
+        """
+        if self._processed_ids is None:
+            self._processed_ids = ProcessedIdStore(
+                self.config.PROCESSED_IDS_FILE,
+                self.config.PROCESSED_IDS_LOG_FILE,
+                self.config.PROCESSED_IDS_BLOOM_FILE,
+                compact_threshold=self.config.PROCESSED_IDS_COMPACT_THRESHOLD
+            )
+            logger.info(f"載入 {len(self._processed_ids)} 個已處理的論文ID")
+        
+        return self._processed_ids
     
     def load_processed_ids(self) -> Set[str]:
         """
@@ -30,43 +66,46 @@ class StorageService:
             已處理的論文ID集合
         """
         try:
-            if not self.config.PROCESSED_IDS_FILE.exists():
-                logger.info("已處理ID檔案不存在，返回空集合")
-                return set()
-            
-            with open(self.config.PROCESSED_IDS_FILE, "r", encoding="utf-8") as f:
-                ids = set(line.strip() for line in f.readlines() if line.strip())
-            
-            logger.info(f"載入 {len(ids)} 個已處理的論文ID")
-            return ids
-            
+            return set(self.open_processed_ids())
+        
         except Exception as e:
             logger.error(f"載入已處理ID失敗: {str(e)}")
             return set()
     
-    def save_processed_ids(self, ids: Set[str]) -> None:
+    def save_processed_ids(self, ids: Iterable[str]) -> None:
         """
-        儲存已處理的論文ID
+        儲存已處理的論文ID（只附加新ID到日誌檔）
         
         Args:
-            ids: 論文ID集合
-            
+            ids: 論文ID集合，或 open_processed_ids 取得的集合
+        
         Raises:
             StorageError: 儲存失敗時拋出
         """
-        try:
-            # 確保目錄存在
-            self.config.PROCESSED_IDS_FILE.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.config.PROCESSED_IDS_FILE, "w", encoding="utf-8") as f:
-                f.write("\n".join(sorted(ids)))
-            
-            logger.info(f"已儲存 {len(ids)} 個論文ID")
-            
-        except Exception as e:
-            error_msg = f"儲存已處理ID失敗: {str(e)}"
-            logger.error(error_msg)
-            raise StorageError(error_msg, str(e))
+        store = self.open_processed_ids()
+        
+        if ids is not store:
+            store.update(ids)
+        
+        added = store.flush()
+        logger.info(f"已儲存 {added} 個新論文ID，共 {len(store)} 個")
+    
+    def writer(self, batch_size: Optional[int] = None) -> JsonlWriter:
+        """
+        建立群組提交的論文寫入器
+        
+        Args:
+            batch_size: 每批寫入的紀錄數量，預設為 Config.WRITE_BATCH_SIZE
+        
+        Returns:
+            需以 with 語法使用的寫入器
+        """
+        return JsonlWriter(
+            self.config.NEWS_FILE,
+            index=self.index,
+            batch_size=batch_size or self.config.WRITE_BATCH_SIZE,
+            fsync=self.config.FSYNC_WRITES
+        )
     
     def save_paper(self, paper: Paper) -> None:
         """
@@ -74,111 +113,532 @@ class StorageService:
         
         Args:
             paper: 論文物件
-            
+        
         Raises:
             StorageError: 儲存失敗時拋出
         """
-        try:
-            # 確保目錄存在
-            self.config.NEWS_FILE.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 將論文資料附加到檔案末尾
-            with open(self.config.NEWS_FILE, "a", encoding="utf-8") as f:
-                paper_data = paper.model_dump()
-                f.write(json.dumps(paper_data, ensure_ascii=False) + "\n")
-            
-            logger.debug(f"論文資料已儲存: {paper.id}")
+        with self.writer(batch_size=1) as writer:
+            writer.write(paper)
+        
+        logger.debug(f"論文資料已儲存: {paper.id}")
+    
+    def iter_papers(self, reverse: bool = False) -> Iterator[Paper]:
+        """
+        逐篇串流讀取論文資料（完整 pydantic 驗證）
+        
+        同一論文有多筆紀錄時（例如補上音訊時附加的新紀錄），只返回最後寫入的一筆。
+        
+        Args:
+            reverse: 是否由最新（檔案結尾）往最舊讀取
+        
+        Returns:
+            論文迭代器，記憶體中只保留論文ID
+        """
+        for position, line in self._iter_latest_lines(reverse):
+            try:
+                # 直接由 JSON 位元組驗證，省去 json.loads 再建構的中間步驟
+                yield Paper.model_validate_json(line)
+            except Exception as e:
+                logger.warning(f"建立論文物件失敗 ({position} 行): {str(e)}")
+                continue
+    
+    def iter_records(self, reverse: bool = False) -> Iterator[PaperRecord]:
+        """
+        以快速解碼逐筆讀取論文紀錄（不經過 pydantic 驗證）
+        
+        適用於大量讀取自行寫入的可信資料，需要驗證時呼叫 PaperRecord.to_paper()。
+        同一論文有多筆紀錄時只返回最後寫入的一筆。
+        
+        Args:
+            reverse: 是否由最新（檔案結尾）往最舊讀取
+        
+        Returns:
+            輕量論文紀錄迭代器
+        """
+        for position, line in self._iter_latest_lines(reverse):
+            try:
+                yield PaperRecord.from_dict(fast_loads(line))
+            except (JSONDecodeError, TypeError) as e:
+                logger.warning(f"解析{position} 行失敗: {str(e)}")
+                continue
+    
+    def _data_files(self) -> List[Path]:
+        """依時間順序列出存放論文資料的檔案"""
+        return [self.config.NEWS_FILE]
+    
+    def _iter_data_lines(self, reverse: bool = False, files: Optional[List[Path]] = None) -> Iterator[tuple]:
+        """逐行讀取資料檔，返回 (位置描述, 內容)，略過空行"""
+        files = [path for path in (files if files is not None else self._data_files()) if path.exists()]
+        
+        if not files:
+            logger.info("新聞檔案不存在，返回空列表")
+            return
+        
+        for file_path in (reversed(files) if reverse else files):
+            if reverse:
+                lines = iter_lines_reverse(file_path)
+                prefix = f"{file_path.name} 倒數第"
+            else:
+                lines = self._iter_lines(file_path)
+                prefix = f"{file_path.name} 第"
             
+            for line_num, line in enumerate(lines, 1):
+                line = line.strip()
+                if line:
+                    yield f"{prefix} {line_num}", line
+    
+    def _iter_latest_lines(self, reverse: bool = False) -> Iterator[tuple]:
+        """
+        逐行讀取資料檔，同一論文ID只返回最後寫入的一行（與 PaperIndex、compact 的結果一致）
+        
+        由新到舊讀取時略過已出現過的ID；由舊到新讀取時先掃描一次找出各ID最後寫入的位置，
+        論文出現在最後寫入的位置。
+        """
+        if reverse:
+            seen = set()
+            for position, line in self._iter_data_lines(reverse=True):
+                paper_id = self._line_id(line)
+                if paper_id is not None:
+                    if paper_id in seen:
+                        continue
+                    seen.add(paper_id)
+                yield position, line
+            return
+        
+        if not self._may_have_duplicates():
+            yield from self._iter_data_lines()
+            return
+        
+        last: Dict[str, str] = {}
+        duplicated = False
+        for position, line in self._iter_data_lines():
+            paper_id = self._line_id(line)
+            if paper_id is not None:
+                duplicated = duplicated or paper_id in last
+                last[paper_id] = position
+        
+        for position, line in self._iter_data_lines():
+            if duplicated:
+                paper_id = self._line_id(line)
+                if paper_id is not None and last.get(paper_id) != position:
+                    continue
+            yield position, line
+    
+    def _may_have_duplicates(self) -> bool:
+        """資料檔是否可能有同一ID的多筆紀錄（由位移索引判斷，不需掃描資料）"""
+        try:
+            return self.index.has_superseded_records()
         except Exception as e:
-            error_msg = f"儲存論文資料失敗: {str(e)}"
-            logger.error(error_msg)
-            raise StorageError(error_msg, str(e))
+            logger.warning(f"索引無法使用，逐行檢查重複紀錄: {str(e)}")
+            return True
+    
+    @staticmethod
+    def _line_id(line: bytes) -> Optional[str]:
+        """取得資料行的論文ID，無法解析時返回 None"""
+        # 紀錄的 id 欄位位於開頭附近，直接比對比完整解碼快得多
+        match = _ID_PATTERN.search(line)
+        if match is not None and b"\\" not in match.group(1):
+            return match.group(1).decode("utf-8")
+        try:
+            return fast_loads(line).get("id")
+        except (JSONDecodeError, AttributeError):
+            return None
+    
+    @staticmethod
+    def _iter_lines(file_path: Path) -> Iterator[bytes]:
+        with open(file_path, "rb") as f:
+            yield from f
     
-    def load_papers(self, limit: Optional[int] = None) -> List[Paper]:
+    def load_papers(self, limit: Optional[int] = None, newest_first: bool = False) -> List[Paper]:
         """
         載入論文資料
         
         Args:
             limit: 限制載入的論文數量
-            
+            newest_first: 是否由最新的論文開始載入
+        
         Returns:
             論文列表
         """
         papers = []
         
         try:
-            if not self.config.NEWS_FILE.exists():
-                logger.info("新聞檔案不存在，返回空列表")
-                return papers
-            
-            with open(self.config.NEWS_FILE, "r", encoding="utf-8") as f:
-                for line_num, line in enumerate(f, 1):
-                    if limit and len(papers) >= limit:
-                        break
-                    
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        paper_data = json.loads(line)
-                        paper = Paper(**paper_data)
-                        papers.append(paper)
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"解析第 {line_num} 行失敗: {str(e)}")
-                        continue
-                    except Exception as e:
-                        logger.warning(f"建立論文物件失敗 (第 {line_num} 行): {str(e)}")
-                        continue
-            
+            papers.extend(islice(self.iter_papers(reverse=newest_first), limit or None))
             logger.info(f"載入 {len(papers)} 篇論文")
             return papers
-            
+        
         except Exception as e:
             logger.error(f"載入論文資料失敗: {str(e)}")
             return papers
     
+    def load_records(self, limit: Optional[int] = None, newest_first: bool = False) -> List[PaperRecord]:
+        """
+        大量載入輕量論文紀錄（快速解碼，不做 pydantic 驗證）
+        
+        Args:
+            limit: 限制載入的論文數量
+            newest_first: 是否由最新的論文開始載入
+        
+        Returns:
+            論文紀錄列表
+        """
+        records = []
+        
+        try:
+            records.extend(islice(self.iter_records(reverse=newest_first), limit or None))
+            logger.info(f"載入 {len(records)} 筆論文紀錄")
+            return records
+        
+        except Exception as e:
+            logger.error(f"載入論文資料失敗: {str(e)}")
+            return records
+    
+    def latest_papers(self, count: int) -> List[Paper]:
+        """
+        取得最新的幾篇論文（只讀取檔案結尾所需的區塊）
+        
+        Args:
+            count: 論文數量
+        
+        Returns:
+            由新到舊排列的論文列表
+        """
+        return self.load_papers(limit=count, newest_first=True)
+    
+    def papers_between(self, start: DateLike, end: DateLike) -> List[Paper]:
+        """
+        取得發布日期在指定範圍內的論文（以日期索引二分搜尋）
+        
+        Args:
+            start: 起始日期（含）
+            end: 結束日期（含）
+        
+        Returns:
+            依發布日期由舊到新排列的論文列表
+        """
+        start_date, end_date = to_date_string(start), to_date_string(end)
+        
+        try:
+            records = self.index.between(start_date, end_date)
+        except Exception as e:
+            logger.warning(f"日期索引查詢失敗，改為完整掃描: {str(e)}")
+            papers = [
+                paper for paper in self.iter_papers()
+                if start_date <= paper.published_date <= end_date
+            ]
+            return sorted(papers, key=lambda paper: paper.published_date)
+        
+        return self._records_to_papers(records)
+    
+    def recent(self, days: int) -> List[Paper]:
+        """
+        取得最近幾天內發布的論文
+        
+        Args:
+            days: 天數
+        
+        Returns:
+            依發布日期由新到舊排列的論文列表
+        """
+        papers = self.papers_between(days_ago(days), datetime.now())
+        papers.reverse()
+        return papers
+    
+    @staticmethod
+    def _records_to_papers(records: Iterable[bytes]) -> List[Paper]:
+        """將 JSON 紀錄轉換為論文物件，略過無法解析的紀錄"""
+        papers = []
+        
+        for raw in records:
+            try:
+                papers.append(Paper.model_validate_json(raw))
+            except Exception as e:
+                logger.warning(f"建立論文物件失敗: {str(e)}")
+        
+        return papers
+    
     def get_paper_by_id(self, paper_id: str) -> Optional[Paper]:
         """
         根據ID取得特定論文
         
         Args:
             paper_id: 論文ID
-            
+        
         Returns:
             論文物件或None
         """
-        papers = self.load_papers()
+        if not self.config.NEWS_FILE.exists():
+            return None
         
-        for paper in papers:
+        try:
+            raw = self.index.lookup(paper_id)
+        except Exception as e:
+            logger.warning(f"索引查詢失敗，改為完整掃描: {str(e)}")
+            return self._scan_for_paper(paper_id)
+        
+        if raw is None:
+            return None
+        
+        try:
+            return Paper.model_validate_json(raw)
+        except Exception as e:
+            logger.warning(f"建立論文物件失敗 ({paper_id}): {str(e)}")
+            return None
+    
+    def _scan_for_paper(self, paper_id: str) -> Optional[Paper]:
+        """完整掃描資料檔尋找論文（索引無法使用時的後備方案）"""
+        for paper in self.iter_papers(reverse=True):
             if paper.id == paper_id:
                 return paper
         
         return None
     
+    def compact(self) -> int:
+        """
+        移除重複的論文ID，每個ID只保留最新（最後寫入）的一筆紀錄
+        
+        Returns:
+            移除的紀錄數量
+        
+        Raises:
+            StorageError: 壓縮失敗時拋出
+        """
+        if not self.config.NEWS_FILE.exists():
+            return 0
+        
+        kept, removed = compact_jsonl(self.config.NEWS_FILE)
+        if removed:
+            self.index.invalidate()
+        
+        logger.info(f"資料壓縮完成，保留 {kept} 筆，移除 {removed} 筆重複紀錄")
+        return removed
+    
+    def update_records(self, changes: Dict[str, Dict[str, Any]]) -> int:
+        """
+        更新既有論文紀錄的欄位（逐檔串流改寫，並以原子方式取代原檔）
+        
+        Args:
+            changes: 論文ID對應要更新的欄位
+        
+        Returns:
+            更新的紀錄數量
+        
+        Raises:
+            StorageError: 改寫失敗時拋出
+        """
+        if not changes:
+            return 0
+        
+        updated = 0
+        changed_files = []
+        
+        for file_path in self._data_files():
+            if not file_path.exists():
+                continue
+            
+            tmp_file = file_path.with_name(file_path.name + ".tmp")
+            file_updated = 0
+            
+            try:
+                with open(file_path, "rb") as src, open(tmp_file, "wb") as dst:
+                    for line in src:
+                        try:
+                            data = fast_loads(line) if line.strip() else None
+                        except JSONDecodeError:
+                            data = None
+                        if data is not None and data.get("id") in changes:
+                            data.update(changes[data["id"]])
+                            line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+                            file_updated += 1
+                        dst.write(line)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                
+                if file_updated:
+                    os.replace(tmp_file, file_path)
+                    changed_files.append(file_path)
+                    updated += file_updated
+                else:
+                    tmp_file.unlink()
+            
+            except OSError as e:
+                tmp_file.unlink(missing_ok=True)
+                error_msg = f"更新論文紀錄失敗: {str(e)}"
+                logger.error(error_msg)
+                raise StorageError(error_msg, str(e))
+        
+        if changed_files:
+            self._after_rewrite(changed_files)
+        
+        logger.info(f"已更新 {updated} 筆論文紀錄")
+        return updated
+    
+    def _after_rewrite(self, files: List[Path]) -> None:
+        """資料檔被改寫後重設衍生的索引"""
+        self.index.invalidate()
+    
+    def prune_audio(self, keep_days: Optional[int] = None, keep_latest: Optional[int] = None,
+                    dry_run: bool = False) -> Dict[str, Any]:
+        """
+        依保留政策將較舊論文的音訊移到壓縮封存區，並更新論文的音訊路徑
+        
+        最近 keep_days 天內處理的論文，或最新的 keep_latest 篇論文會保留音訊，
+        其餘論文的 WAV 檔會以 gzip 壓縮移到 Config.AUDIO_ARCHIVE_DIR。
+        
+        Args:
+            keep_days: 保留最近幾天的音訊，預設為 Config.AUDIO_KEEP_DAYS
+            keep_latest: 保留最新幾篇論文的音訊，預設為 Config.AUDIO_KEEP_LATEST
+            dry_run: 只計算會封存的檔案，不實際搬移
+        
+        Returns:
+            統計資料：封存的檔案數、釋放的位元組數與封存後的位元組數，
+            以及音訊被封存的論文ID（ids）
+        
+        Raises:
+            StorageError: 封存失敗時拋出
+        """
+        keep_days = self.config.AUDIO_KEEP_DAYS if keep_days is None else keep_days
+        keep_latest = self.config.AUDIO_KEEP_LATEST if keep_latest is None else keep_latest
+        cutoff = days_ago(keep_days).isoformat()
+        audio_dir = self.config.AUDIO_DIR.resolve()
+        archive_dir = self.config.AUDIO_ARCHIVE_DIR
+        
+        # 同一ID以最後寫入的紀錄為準，由新到舊判斷是否保留
+        seen = set()
+        candidates = []
+        for record in self.iter_records(reverse=True):
+            if record.id in seen:
+                continue
+            seen.add(record.id)
+            
+            recent = (record.timestamp or record.published_date or "") >= cutoff
+            if len(seen) <= keep_latest or recent or not record.audio:
+                continue
+            
+            # 預設語音（variant 為 None）與各語音版本的音訊一起封存
+            audio_files = [(None, record.audio)] + list((record.audio_variants or {}).items())
+            for variant, audio in audio_files:
+                path = self.config.BASE_DIR / audio
+                if path.exists() and path.resolve().parent == audio_dir:
+                    candidates.append((record, variant, path))
+        
+        stats = {"archived": 0, "bytes_reclaimed": 0, "archive_bytes": 0, "ids": []}
+        changes = {}
+        
+        try:
+            for record, variant, path in candidates:
+                size = path.stat().st_size
+                stats["archived"] += 1
+                stats["bytes_reclaimed"] += size
+                if dry_run:
+                    continue
+                
+                archive_path = archive_dir / f"{path.name}.gz"
+                with open(path, "rb") as f:
+                    atomic_write_bytes(archive_path, gzip.compress(f.read(), compresslevel=9))
+                stats["archive_bytes"] += archive_path.stat().st_size
+                
+                change = changes.setdefault(record.id, {})
+                if variant is None:
+                    change["audio"] = self._relative_path(archive_path)
+                else:
+                    variants = change.setdefault("audio_variants", dict(record.audio_variants))
+                    variants[variant] = self._relative_path(archive_path)
+            
+            # 先更新論文紀錄，再刪除公開目錄中的音訊，避免紀錄指向不存在的檔案
+            self.update_records(changes)
+            for record, variant, path in candidates:
+                if record.id in changes:
+                    path.unlink()
+            stats["ids"] = list(changes)
+        
+        except OSError as e:
+            error_msg = f"封存音訊失敗: {str(e)}"
+            logger.error(error_msg)
+            raise StorageError(error_msg, str(e))
+        
+        logger.info(
+            f"音訊封存{'（試算）' if dry_run else ''}完成：{stats['archived']} 個檔案，"
+            f"釋放 {stats['bytes_reclaimed']} bytes，封存後 {stats['archive_bytes']} bytes"
+        )
+        return stats
+    
+    def _relative_path(self, path: Path) -> str:
+        """取得相對於專案根目錄的路徑（使用正斜線）"""
+        try:
+            return path.resolve().relative_to(self.config.BASE_DIR.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+    
     def backup_data(self, backup_path: Optional[Path] = None) -> Path:
         """
         備份資料檔案
         
+        未指定路徑時建立增量備份（只保存上次備份後新增的紀錄），
+        指定路徑時將資料檔完整複製到該路徑。
+        
         Args:
-            backup_path: 備份檔案路徑
-            
+            backup_path: 完整備份的檔案路徑
+        
         Returns:
-            備份檔案路徑
+            備份檔案路徑（增量備份時為備份 manifest 路徑）
         """
         import shutil
-        from datetime import datetime
         
         if backup_path is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = self.config.DATA_DIR / f"backup_{timestamp}.jsonl"
+            from .backup_service import BackupService
+            
+            backup_service = BackupService(self)
+            backup_service.create_backup()
+            return backup_service.manifest_file
         
         try:
             shutil.copy2(self.config.NEWS_FILE, backup_path)
             logger.info(f"資料已備份到: {backup_path}")
             return backup_path
-            
+        
         except Exception as e:
             error_msg = f"資料備份失敗: {str(e)}"
             logger.error(error_msg)
-            raise StorageError(error_msg, str(e)) 
\ No newline at end of file
+            raise StorageError(error_msg, str(e)) 
+    
+    def _backup_files(self) -> List[Path]:
+        """需要納入增量備份的檔案"""
+        return self._data_files() + [self.config.PROCESSED_IDS_FILE, self.config.PROCESSED_IDS_LOG_FILE]
+    
+    def _after_restore(self) -> None:
+        """還原備份後重設衍生的狀態（索引與已處理ID快取）"""
+        self.index.invalidate()
+        if self._processed_ids is not None:
+            self._processed_ids.close()
+            self._processed_ids = None
+
+
+def create_storage_service(config: Config = None) -> StorageService:
+    """
+    依配置建立儲存服務
+    
+    Args:
+        config: 專案配置
+    
+    Returns:
+        對應 Config.STORAGE_BACKEND 的儲存服務
+    
+    Raises:
+        StorageError: 未知的儲存後端
+    """
+    config = config or Config()
+    backend = config.STORAGE_BACKEND.lower()
+    
+    if backend == "jsonl":
+        return StorageService(config)
+    
+    if backend == "sqlite":
+        from .sqlite_storage_service import SQLiteStorageService
+        return SQLiteStorageService(config)
+    
+    if backend == "sharded":
+        from .sharded_storage_service import ShardedStorageService
+        return ShardedStorageService(config)
+    
+    raise StorageError(f"未知的儲存後端: {config.STORAGE_BACKEND}")
@@ -4,14 +4,19 @@ Gemini 翻譯服務
 使用 Google Gemini API 進行論文翻譯，支援結構化輸出和錯誤重試機制。
 """
 
+import hashlib
+import json
 import time
-from google import genai
+from typing import Dict, List, Optional
 from google.genai import types
 
 from ..core.config import Config
-from ..core.models import PaperTranslation
+from ..core.models import PaperTranslation, UsageRecord
 from ..core.exceptions import TranslationError, ConfigurationError
+from ..utils.cassette import open_cassette
+from .gemini_client import get_gemini_client
 from ..utils.logging_utils import get_logger
+from ..utils.metrics import get_run_metrics
 
 logger = get_logger(__name__)
 
@@ -22,14 +27,17 @@ class TranslationService:
     def __init__(self, config: Config = None):
         self.config = config or Config()
         self._validate_config()
-        self.client = genai.Client(api_key=self.config.GEMINI_API_KEY)
+        self.client = get_gemini_client(self.config)
+        self.cassette = open_cassette(self.config.CASSETTE_DIR, self.config.CASSETTE_MODE,
+                                      self.config.CASSETTE_REALTIME)
     
     def _validate_config(self):
         """驗證配置"""
         if not self.config.GEMINI_API_KEY:
             raise ConfigurationError("GEMINI_API_KEY 未設定")
     
-    def translate_paper(self, title: str, summary: str, max_retries: int = 3) -> PaperTranslation:
+    def translate_paper(self, title: str, summary: str, max_retries: int = 3,
+                        usage: Optional[List[UsageRecord]] = None) -> PaperTranslation:
         """
         翻譯論文標題和摘要
         
@@ -37,48 +45,108 @@ class TranslationService:
             title: 英文標題
             summary: 英文摘要
             max_retries: 最大重試次數
-            
+            usage: 若提供，將本次呼叫的用量紀錄（包含重試）附加到此列表
+        
         Returns:
             翻譯結果
-            
+        
         Raises:
             TranslationError: 翻譯失敗時拋出
         """
         prompt = self._build_translation_prompt(title, summary)
+        record = UsageRecord(kind="translation", model=self.config.GEMINI_MODEL, input_chars=len(prompt))
         
         for attempt in range(max_retries):
             try:
-                logger.info(f"正在翻譯論文: {title[:50]}...")
+                logger.info("正在翻譯論文: %s...", title[:50])
                 
-                response = self.client.models.generate_content(
-                    model=self.config.GEMINI_MODEL,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        response_mime_type='application/json',
-                        response_schema=PaperTranslation,
-                        temperature=self.config.TEMPERATURE,
-                        max_output_tokens=self.config.MAX_OUTPUT_TOKENS,
-                    ),
-                )
+                record.retries = attempt
+                started = time.perf_counter()
+                try:
+                    response = self._generate(prompt)
+                finally:
+                    record.latency_seconds += time.perf_counter() - started
+                record.add_response(response)
                 
                 translation = response.parsed
                 self._validate_translation(translation)
                 
-                logger.info(f"翻譯成功: {translation.title_zh}")
+                logger.info("翻譯成功: %s", translation.title_zh)
+                self._record_usage(record, usage)
                 return translation
-                
+            
             except Exception as e:
-                logger.warning(f"翻譯嘗試 {attempt + 1} 失敗: {str(e)}")
+                logger.warning("翻譯嘗試 %d 失敗: %s", attempt + 1, e)
                 
                 if attempt < max_retries - 1:
                     # 延遲重試
+                    get_run_metrics().incr("translation_retries")
                     time.sleep(2 ** attempt)
                     continue
                 else:
                     # 最後一次嘗試失敗，返回回退結果
+                    get_run_metrics().incr("translation_fallbacks")
                     logger.error(f"翻譯最終失敗: {str(e)}")
+                    record.success = False
+                    self._record_usage(record, usage)
                     return self._create_fallback_translation(title, summary, str(e))
     
+    @property
+    def prompt_version(self) -> str:
+        """提示詞範本與輸出結構的雜湊，修改 _build_translation_prompt 或 PaperTranslation 時會改變"""
+        template = self._build_translation_prompt("{title}", "{summary}")
+        schema = json.dumps(PaperTranslation.model_json_schema(), sort_keys=True)
+        return hashlib.sha256(f"{template}\n{schema}".encode("utf-8")).hexdigest()[:12]
+    
+    def versions(self) -> Dict[str, str]:
+        """目前的翻譯模型與提示詞版本（記錄在 Paper 上）"""
+        return {"translation_model": self.config.GEMINI_MODEL, "prompt_version": self.prompt_version}
+    
+    def _generate(self, prompt: str) -> types.GenerateContentResponse:
+        """呼叫 Gemini 產生結構化翻譯（啟用卡帶時錄製或重播）"""
+        request = {
+            "model": self.config.GEMINI_MODEL,
+            "prompt": prompt,
+            "temperature": self.config.TEMPERATURE,
+            "max_output_tokens": self.config.MAX_OUTPUT_TOKENS,
+        }
+        return self.cassette.call(
+            "translation", request,
+            lambda: self.client.models.generate_content(
+                model=self.config.GEMINI_MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_mime_type='application/json',
+                    response_schema=PaperTranslation,
+                    temperature=self.config.TEMPERATURE,
+                    max_output_tokens=self.config.MAX_OUTPUT_TOKENS,
+                ),
+            ),
+            encode=lambda response: (
+                response.model_dump(mode="json", exclude_none=True, exclude={"parsed", "sdk_http_response"}),
+                None
+            ),
+            decode=self._decode_response,
+        )
+    
+    @staticmethod
+    def _decode_response(payload: dict, blob: Optional[bytes]) -> types.GenerateContentResponse:
+        """由錄製內容還原回應，並如 SDK 一樣解析結構化結果"""
+        response = types.GenerateContentResponse.model_validate(payload)
+        try:
+            response.parsed = PaperTranslation.model_validate_json(response.text or "")
+        except ValueError:
+            response.parsed = None
+        return response
+    
+    @staticmethod
+    def _record_usage(record: UsageRecord, usage: Optional[List[UsageRecord]]) -> None:
+        """彙總到本次執行的指標，並附加到呼叫端的用量列表"""
+        record.latency_seconds = round(record.latency_seconds, 3)
+        get_run_metrics().record_usage(record.kind, record.model, record.totals())
+        if usage is not None:
+            usage.append(record)
+    
     def _build_translation_prompt(self, title: str, summary: str) -> str:
         """建構翻譯提示詞"""
         return (
@@ -123,14 +191,14 @@ class TranslationService:
         
         Args:
             papers: 論文列表
-            
+        
         Returns:
             翻譯結果列表
         """
         results = []
         
         for i, paper in enumerate(papers):
-            logger.info(f"正在處理第 {i+1}/{len(papers)} 篇論文")
+            logger.info("正在處理第 %d/%d 篇論文", i + 1, len(papers))
             
             try:
                 translation = self.translate_paper(paper.title, paper.summary)
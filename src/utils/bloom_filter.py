@@ -0,0 +1,104 @@
+"""
+布隆過濾器
+
+提供可序列化到磁碟的布隆過濾器，用於快速判斷元素「一定不存在」。
+"""
+
+import hashlib
+import math
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+
+class BloomFilter:
+    """以 bytearray 實作的布隆過濾器"""
+    
+    MAGIC = b"BLM1"
+    # 檔頭：魔術字、位元數、雜湊次數、元素數量、附加標記（兩個 64 位元整數）
+    HEADER_FORMAT = "<4sQIQqq"
+    
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.01,
+                 num_bits: Optional[int] = None, num_hashes: Optional[int] = None):
+        capacity = max(1, capacity)
+        
+        if num_bits is None:
+            num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = num_hashes
+        self.count = 0
+        self.bits = bytearray((self.num_bits + 7) // 8)
+    
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def add(self, item: str) -> None:
+        """加入元素"""
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def update(self, items: Iterable[str]) -> None:
+        """批次加入元素"""
+        for item in items:
+            self.add(item)
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+    
+    def save(self, file_path: Path, stamp: Tuple[int, int] = (0, 0)) -> None:
+        """
+        以原子方式寫入檔案
+        
+        Args:
+            file_path: 檔案路徑
+            stamp: 來源資料的標記（例如檔案大小與內容雜湊），用於判斷是否過期
+        """
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = file_path.with_suffix(file_path.suffix + ".tmp")
+        
+        with open(tmp_file, "wb") as f:
+            f.write(struct.pack(self.HEADER_FORMAT, self.MAGIC, self.num_bits,
+                                self.num_hashes, self.count, stamp[0], stamp[1]))
+            f.write(self.bits)
+        
+        os.replace(tmp_file, file_path)
+    
+    @classmethod
+    def load(cls, file_path: Path) -> Tuple["BloomFilter", Tuple[int, int]]:
+        """
+        從檔案載入布隆過濾器
+        
+        Args:
+            file_path: 檔案路徑
+        
+        Returns:
+            (布隆過濾器, 來源資料標記)
+        
+        Raises:
+            ValueError: 檔案格式不正確
+        """
+        header_size = struct.calcsize(cls.HEADER_FORMAT)
+        
+        with open(file_path, "rb") as f:
+            header = f.read(header_size)
+            if len(header) != header_size:
+                raise ValueError("布隆過濾器檔案不完整")
+            magic, num_bits, num_hashes, count, stamp_a, stamp_b = struct.unpack(cls.HEADER_FORMAT, header)
+            if magic != cls.MAGIC:
+                raise ValueError("布隆過濾器檔案格式不正確")
+            bits = f.read()
+        
+        bloom = cls(num_bits=num_bits, num_hashes=num_hashes)
+        if len(bits) != len(bloom.bits):
+            raise ValueError("布隆過濾器檔案大小不符")
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        return bloom, (stamp_a, stamp_b)
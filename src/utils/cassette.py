@@ -0,0 +1,217 @@
+"""
+外部呼叫錄製／重播工具
+
+將 arXiv、Gemini 翻譯與語音合成的呼叫錄製到磁碟上的卡帶（cassette），
+之後可在沒有網路的環境重播同一批實際流量，比較效能調整前後的差異。
+
+卡帶目錄的內容：
+- ``interactions.jsonl``：每次呼叫一行，包含類型、請求指紋、原始耗時與回應（或錯誤訊息）
+- ``blobs/<sha256>.gz``：音訊等二進位回應，以內容雜湊命名並以 gzip 壓縮
+
+重播時依請求指紋找到錄製的回應，同一指紋的多次呼叫（例如重試）依錄製順序回放；
+可選擇立即返回或依原始耗時等待。
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from ..core.exceptions import CassetteError
+from .file_utils import atomic_write_bytes
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class Cassette:
+    """錄製與重播外部呼叫"""
+    
+    def __init__(self, directory: Path, mode: str = "off", realtime: bool = False):
+        """
+        Args:
+            directory: 卡帶目錄
+            mode: off（直接呼叫）、record（呼叫並錄製）或 replay（只從卡帶回放）
+            realtime: 重播時是否依錄製的耗時等待
+        """
+        if mode not in MODES:
+            raise CassetteError(f"未知的卡帶模式: {mode}")
+        
+        self.directory = Path(directory)
+        self.mode = mode
+        self.realtime = realtime
+        self.interactions_file = self.directory / "interactions.jsonl"
+        self.blobs_dir = self.directory / "blobs"
+        
+        self._lock = threading.Lock()
+        self._queues: Dict[Tuple[str, str], Deque[Dict]] = defaultdict(deque)
+        
+        if mode == "record":
+            # 每次錄製都從新的卡帶開始（二進位內容以雜湊命名，可沿用）
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.interactions_file.write_bytes(b"")
+            logger.info("錄製外部呼叫到 %s", self.directory)
+        elif mode == "replay":
+            self._load()
+            logger.info("從 %s 重播外部呼叫（%s）", self.directory, "依原始耗時" if realtime else "立即返回")
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+    
+    @staticmethod
+    def fingerprint(kind: str, request: Dict[str, Any]) -> str:
+        """以請求內容計算指紋"""
+        payload = json.dumps({"kind": kind, "request": request}, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def call(self, kind: str, request: Dict[str, Any], func: Callable[[], Any],
+             encode: Callable[[Any], Tuple[Any, Optional[bytes]]],
+             decode: Callable[[Any, Optional[bytes]], Any]) -> Any:
+        """
+        執行（或重播）一次外部呼叫
+        
+        Args:
+            kind: 呼叫類型，例如 arxiv、translation、tts
+            request: 決定回應的請求參數，用於計算指紋
+            func: 實際執行呼叫的函式
+            encode: 將回應轉為 (可序列化為 JSON 的內容, 二進位內容或 None)
+            decode: 由錄製內容還原回應
+        
+        Returns:
+            呼叫結果
+        
+        Raises:
+            CassetteError: 重播時找不到錄製紀錄，或重播錄製時發生的錯誤
+        """
+        if self.mode == "replay":
+            response, blob = self.replay(kind, request)
+            return decode(response, blob)
+        
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            if self.mode == "record":
+                self.record(kind, request, latency=time.perf_counter() - started, error=str(e))
+            raise
+        
+        if self.mode == "record":
+            latency = time.perf_counter() - started
+            response, blob = encode(result)
+            self.record(kind, request, response, latency, blob)
+        
+        return result
+    
+    def record(self, kind: str, request: Dict[str, Any], response: Any = None, latency: float = 0.0,
+               blob: Optional[bytes] = None, error: Optional[str] = None) -> None:
+        """
+        寫入一筆錄製紀錄
+        
+        Args:
+            kind: 呼叫類型
+            request: 請求參數
+            response: 可序列化為 JSON 的回應內容
+            latency: 原始耗時（秒）
+            blob: 二進位回應內容
+            error: 呼叫失敗時的錯誤訊息
+        """
+        entry = {"kind": kind, "fingerprint": self.fingerprint(kind, request), "latency": round(latency, 4)}
+        if error is not None:
+            entry["error"] = error
+        else:
+            entry["response"] = response
+            if blob is not None:
+                entry["blob"] = self._write_blob(blob)
+        self._append(entry)
+    
+    def replay(self, kind: str, request: Dict[str, Any]) -> Tuple[Any, Optional[bytes]]:
+        """
+        取出下一筆符合請求的錄製紀錄
+        
+        Args:
+            kind: 呼叫類型
+            request: 請求參數
+        
+        Returns:
+            (回應內容, 二進位內容或 None)
+        
+        Raises:
+            CassetteError: 找不到錄製紀錄，或錄製時呼叫失敗
+        """
+        entry = self._next(kind, self.fingerprint(kind, request))
+        if self.realtime:
+            time.sleep(entry["latency"])
+        if "error" in entry:
+            raise CassetteError("重播錄製時發生的錯誤", entry["error"])
+        blob = self._read_blob(entry["blob"]) if entry.get("blob") else None
+        return entry["response"], blob
+    
+    def _next(self, kind: str, fingerprint: str) -> Dict:
+        with self._lock:
+            queue = self._queues.get((kind, fingerprint))
+            if not queue:
+                raise CassetteError(f"卡帶中沒有對應的 {kind} 呼叫: {fingerprint[:12]}")
+            # 最後一筆保留，讓多出的相同請求重複回放
+            return queue.popleft() if len(queue) > 1 else queue[0]
+    
+    def _append(self, entry: Dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self.interactions_file, "a", encoding="utf-8") as f:
+                f.write(line)
+    
+    def _load(self) -> None:
+        if not self.interactions_file.exists():
+            raise CassetteError(f"找不到卡帶: {self.interactions_file}")
+        
+        count = 0
+        with open(self.interactions_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._queues[(entry["kind"], entry["fingerprint"])].append(entry)
+                count += 1
+        logger.info("已載入 %d 筆錄製的呼叫", count)
+    
+    def _write_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blobs_dir / f"{digest}.gz"
+        if not path.exists():
+            atomic_write_bytes(path, gzip.compress(data, mtime=0))
+        return digest
+    
+    def _read_blob(self, digest: str) -> bytes:
+        return gzip.decompress((self.blobs_dir / f"{digest}.gz").read_bytes())
+
+
+_cassettes: Dict[Tuple[Path, str], Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(directory: Path, mode: str = "off", realtime: bool = False) -> Cassette:
+    """
+    取得共用的卡帶（同一目錄與模式的服務共用同一個實例）
+    
+    Args:
+        directory: 卡帶目錄
+        mode: off、record 或 replay
+        realtime: 重播時是否依錄製的耗時等待
+    
+    Returns:
+        卡帶
+    """
+    key = (Path(directory).resolve(), mode)
+    with _cassettes_lock:
+        cassette = _cassettes.get(key)
+        if cassette is None:
+            cassette = Cassette(directory, mode, realtime)
+            _cassettes[key] = cassette
+        return cassette
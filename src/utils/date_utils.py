@@ -4,8 +4,8 @@
 提供日期和時間相關的工具函式。
 """
 
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import date, datetime, timezone
+from typing import Optional, Union
 
 
 def format_timestamp(dt: Optional[datetime] = None, format_str: str = "%Y-%m-%d %H:%M:%S") -> str:
@@ -39,6 +39,25 @@ def parse_date(date_str: str, format_str: str = "%Y-%m-%d") -> datetime:
     return datetime.strptime(date_str, format_str)
 
 
+def to_date_string(value: Union[str, date, datetime]) -> str:
+    """
+    將日期轉換為 YYYY-MM-DD 字串
+    
+    Args:
+        value: 日期字串、date 或 datetime 物件
+        
+    Returns:
+        YYYY-MM-DD 格式的日期字串
+        
+    Raises:
+        ValueError: 字串不是有效日期時拋出
+    """
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    
+    return parse_date(value[:10]).strftime("%Y-%m-%d")
+
+
 def get_current_timestamp() -> str:
     """
     取得當前時間戳（ISO格式）
@@ -4,13 +4,19 @@
 提供安全的檔案操作功能。
 """
 
+import gzip
 import os
 import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, Optional
 
 from .logging_utils import get_logger
 
+try:
+    import brotli
+except ImportError:  # brotli 為選用依賴
+    brotli = None
+
 logger = get_logger(__name__)
 
 
@@ -119,6 +125,63 @@ def safe_read_json(file_path: Path) -> Dict[str, Any]:
         raise
 
 
+def atomic_write_bytes(file_path: Path, data: bytes) -> None:
+    """
+    以原子方式寫入檔案（先寫入暫存檔再取代）
+    
+    讀取者只會看到完整的舊內容或完整的新內容。
+    
+    Args:
+        file_path: 檔案路徑
+        data: 檔案內容
+    """
+    ensure_dir_exists(file_path.parent)
+    tmp_file = file_path.with_name(file_path.name + ".tmp")
+    
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, file_path)
+    except Exception as e:
+        logger.error(f"檔案寫入失敗: {file_path} - {str(e)}")
+        try:
+            tmp_file.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write_json(file_path: Path, data: Any, indent: Optional[int] = 2) -> None:
+    """
+    以原子方式寫入JSON檔案
+    
+    Args:
+        file_path: 檔案路徑
+        data: 要寫入的資料
+        indent: 縮排空格數，None 表示輸出精簡格式
+    """
+    separators = None if indent is not None else (",", ":")
+    content = json.dumps(data, ensure_ascii=False, indent=indent, separators=separators)
+    atomic_write_bytes(file_path, content.encode("utf-8"))
+
+
+def write_precompressed(file_path: Path, data: bytes) -> None:
+    """
+    以原子方式寫入檔案，並一併產生預先壓縮的 .gz（安裝 brotli 時另有 .br）版本
+    
+    Args:
+        file_path: 檔案路徑
+        data: 檔案內容
+    """
+    atomic_write_bytes(file_path, data)
+    # mtime=0 讓相同內容產生相同的壓縮檔
+    atomic_write_bytes(file_path.with_name(file_path.name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        atomic_write_bytes(file_path.with_name(file_path.name + ".br"), brotli.compress(data))
+
+
 def get_file_size(file_path: Path) -> int:
     """
     取得檔案大小
@@ -146,4 +209,40 @@ def is_file_empty(file_path: Path) -> bool:
     Returns:
         檔案是否為空
     """
-    return not file_path.exists() or get_file_size(file_path) == 0 
\ No newline at end of file
+    return not file_path.exists() or get_file_size(file_path) == 0 
+
+
+def iter_lines_reverse(file_path: Path, block_size: int = 65536) -> Iterator[bytes]:
+    """
+    從檔案結尾開始逐行反向讀取
+    
+    以固定大小的區塊由後往前讀取，只需保留目前區塊與一行殘餘資料，
+    記憶體用量與檔案大小無關。
+    
+    Args:
+        file_path: 檔案路徑
+        block_size: 每次讀取的區塊大小（位元組）
+        
+    Returns:
+        由最後一行到第一行的位元組迭代器（不含換行字元）
+    """
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            
+            lines = block.split(b"\n")
+            # 第一段可能是被區塊切斷的行，留待下一輪合併
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        
+        if remainder:
+            yield remainder
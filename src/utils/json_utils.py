@@ -0,0 +1,38 @@
+"""
+JSON 解碼工具
+
+提供大量讀取時使用的快速 JSON 解碼。若安裝了 orjson 會優先使用，
+否則退回標準函式庫 json。
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用依賴
+    orjson = None
+
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+# 兩種後端解析失敗時拋出的例外（orjson.JSONDecodeError 也是 ValueError 的子類別）
+JSONDecodeError = ValueError
+
+
+def fast_loads(data: Union[bytes, str]) -> Any:
+    """
+    解析 JSON 字串或位元組
+    
+    Args:
+        data: JSON 內容
+    
+    Returns:
+        解析後的資料
+    
+    Raises:
+        ValueError: JSON 格式錯誤時拋出
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
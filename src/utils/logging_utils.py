@@ -2,18 +2,76 @@
 日誌管理工具
 
 提供統一的日誌配置和管理功能。
+
+日誌紀錄先放入佇列，由背景執行緒格式化並寫到控制台與檔案，
+呼叫端不會因為 I/O 而阻塞；訊息也在背景執行緒才格式化。
 """
 
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+# 結構化欄位（可由 extra 或 log_context 提供）
+CONTEXT_FIELDS = ("paper_id", "stage", "duration")
+
+_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每筆日誌輸出為一行 JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """在呼叫端的執行緒補上 log_context 設定的欄位"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field, value in _context.get().items():
+            if getattr(record, field, None) is None:
+                setattr(record, field, value)
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    不在呼叫端格式化訊息的 QueueHandler
+    
+    標準的 QueueHandler 會先格式化訊息再放入佇列；佇列只在同一個程序內使用，
+    因此直接傳遞原始紀錄，由背景執行緒呼叫 getMessage 與格式器。
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 def setup_logging(
     level: int = logging.INFO,
     log_file: Optional[Path] = None,
-    format_string: Optional[str] = None
+    format_string: Optional[str] = None,
+    json_format: bool = False
 ) -> None:
     """
     設置日誌系統
@@ -21,11 +79,17 @@ def setup_logging(
     Args:
         level: 日誌等級
         log_file: 日誌檔案路徑
-        format_string: 日誌格式字串
+        format_string: 日誌格式字串（json_format 為 True 時不使用）
+        json_format: 是否以 JSON lines 格式輸出（包含 paper_id、stage、duration 欄位）
     """
+    global _listener
+    
     if format_string is None:
         format_string = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
+    # 停止先前的背景執行緒，確保佇列中的紀錄都已寫出
+    shutdown_logging()
+    
     # 設置根日誌器
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
@@ -35,13 +99,13 @@ def setup_logging(
         root_logger.removeHandler(handler)
     
     # 建立格式器
-    formatter = logging.Formatter(format_string)
+    formatter = JsonLinesFormatter() if json_format else logging.Formatter(format_string)
     
     # 控制台處理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # 檔案處理器（如果指定）
     if log_file:
@@ -49,7 +113,49 @@ def setup_logging(
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # 呼叫端只把紀錄放入佇列，實際輸出由背景執行緒處理
+    log_queue = queue.SimpleQueue()
+    queue_handler = _LazyQueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+    root_logger.addHandler(queue_handler)
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """停止背景日誌執行緒並寫出佇列中剩餘的紀錄"""
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """
+    在區塊內的日誌紀錄加上結構化欄位
+    
+    Args:
+        **fields: 例如 paper_id、stage
+    
+    Example:
+        with log_context(paper_id=paper.id, stage="translate"):
+            translation_service.translate_paper(...)
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -58,7 +164,7 @@ def get_logger(name: str) -> logging.Logger:
     
     Args:
         name: 日誌器名稱
-        
+    
     Returns:
         配置好的日誌器
     """
@@ -71,4 +177,4 @@ class LoggerMixin:
     @property
     def logger(self) -> logging.Logger:
         """取得當前類別的日誌器"""
-        return get_logger(self.__class__.__name__) 
\ No newline at end of file
+        return get_logger(self.__class__.__name__)
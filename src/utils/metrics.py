@@ -0,0 +1,146 @@
+"""
+執行指標收集工具
+
+收集單次更新的各階段延遲分佈、計數器與快取命中率，
+供 MetricsService 輸出為 JSON 與 Prometheus 文字格式。
+"""
+
+import bisect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from .logging_utils import log_context
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組
+    resource = None
+
+
+# 各階段延遲直方圖的上界（秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class RunMetrics:
+    """單次執行的指標收集器（執行緒安全）"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.started_at = time.time()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Dict] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        self.usage: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def incr(self, name: str, value: float = 1) -> None:
+        """增加計數器"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def observe(self, stage: str, seconds: float) -> None:
+        """記錄一次階段耗時"""
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self.histograms[stage] = histogram
+            histogram["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """計時區塊，結束時（包含發生例外時）記錄耗時；區塊內的日誌會帶有 stage 欄位"""
+        start = time.perf_counter()
+        try:
+            with log_context(stage=name):
+                yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+    
+    def cache(self, name: str, hit: bool, count: int = 1) -> None:
+        """記錄快取命中或未命中"""
+        with self._lock:
+            stats = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += count
+    
+    def record_usage(self, kind: str, model: str, values: Dict[str, float]) -> None:
+        """
+        彙總一次 API 呼叫的用量
+        
+        Args:
+            kind: 呼叫類型（translation、tts）
+            model: 模型名稱
+            values: 數值欄位，例如 prompt_tokens、output_tokens、audio_seconds
+        """
+        with self._lock:
+            totals = self.usage.setdefault(f"{kind}:{model}", {"calls": 0})
+            totals["calls"] += 1
+            for name, value in values.items():
+                totals[name] = totals.get(name, 0) + value
+    
+    def counter(self, name: str) -> float:
+        """取得計數器的值"""
+        return self.counters.get(name, 0)
+    
+    @staticmethod
+    def peak_memory_bytes() -> Optional[int]:
+        """取得程序的記憶體使用峰值（不支援的平台返回 None）"""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 為單位，macOS 以 bytes 為單位
+        return peak if sys.platform == "darwin" else peak * 1024
+    
+    def snapshot(self) -> Dict:
+        """
+        輸出目前的指標
+        
+        Returns:
+            包含計數器、各階段延遲直方圖（累積計數）與快取命中率的字典
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative, total = [], 0
+                for count in histogram["counts"]:
+                    total += count
+                    cumulative.append(total)
+                bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+                stages[stage] = {
+                    "count": histogram["count"],
+                    "sum": round(histogram["sum"], 6),
+                    "buckets": dict(zip(bounds, cumulative)),
+                }
+            
+            caches = {}
+            for name, stats in sorted(self.caches.items()):
+                total = stats["hits"] + stats["misses"]
+                caches[name] = dict(stats, hit_rate=round(stats["hits"] / total, 4) if total else None)
+            
+            return {
+                "counters": dict(sorted(self.counters.items())),
+                "stages": stages,
+                "caches": caches,
+                "usage": {key: dict(totals) for key, totals in sorted(self.usage.items())},
+                "peak_memory_bytes": self.peak_memory_bytes(),
+            }
+
+
+_current = RunMetrics()
+
+
+def get_run_metrics() -> RunMetrics:
+    """取得目前執行的指標收集器"""
+    return _current
+
+
+def reset_run_metrics() -> RunMetrics:
+    """開始新的一次執行，重設指標收集器"""
+    global _current
+    _current = RunMetrics()
+    return _current
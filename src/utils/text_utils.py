@@ -0,0 +1,36 @@
+"""
+文字處理工具
+
+提供搜尋索引與排序共用的斷詞功能：英文以單字為單位，中文以相鄰兩字（bigram）為單位。
+"""
+
+import re
+from typing import Iterator
+
+# 英數字詞，或連續的中日韓統一表意文字
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """
+    將文字切分為搜尋用的詞
+    
+    英文轉為小寫並忽略單一字元，中文連續字串切分為 bigram
+    （只有一個字的字串保留單字）。
+    
+    Args:
+        text: 原始文字
+        
+    Returns:
+        詞的迭代器（可能重複）
+    """
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        run = match.group()
+        if run.isascii():
+            if len(run) >= 2:
+                yield run
+        elif len(run) == 1:
+            yield run
+        else:
+            for i in range(len(run) - 1):
+                yield run[i:i + 2]